@@ -1,27 +1,73 @@
-from flask import Flask, send_from_directory
+from flask import Flask, current_app, request
 from flask_cors import CORS
+from werkzeug.exceptions import NotFound
 
 from settings import Config 
 from routes import api
 from utils.db import db
+from utils.image import IMAGE_SIZES, find_derivative
+from utils.locations import init_locations
+from utils.response import res_error
+from utils.sqlite import init_sqlite
+from utils.static import send_upload
+from utils.upload_jobs import INCOMING_FOLDER, UPLOAD_JOBS_HEADER, init_upload_jobs
 
-# create the Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
+# send static file from the folder, cached and conditional (see utils/static.py)
+# ?size=thumb|card|full sends the resized copy, WebP if the client accepts it
+def send_file(filename):
+    # files not processed yet are not served
+    if filename.startswith(f'{INCOMING_FOLDER}/'):
+        raise NotFound()
+    size = request.args.get('size')
+    if not size:
+        return send_upload(filename)
+    if size not in IMAGE_SIZES:
+        return res_error(400, 'Invalid Image Size')
 
-# register the db and api
-db.init_app(app)
-api.init_app(app)
+    accept_webp = any(
+        mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes
+    )
+    derived = find_derivative(current_app.config['UPLOAD_FOLDER'], filename, size, accept_webp)
+    # the image has no resized copy yet, fall back to the original until it has
+    response = send_upload(derived or filename, immutable=derived is not None)
+    response.vary.add('Accept')
+    return response
 
-# cors
-CORS(app)
+def create_app(config: object = Config) -> Flask:
+    """
+    Create the Flask app with the config object.
+    Nothing is written to the database, so every worker process can call it;
+    the database is created once before the workers start (utils/init_db.py, utils/migrate.py).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
 
-# send static file from the folder
-@app.route('/uploads/<path:filename>')
-def send_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # register the db and api
+    db.init_app(app)
+    api.init_app(app)
+
+    # WAL and the other pragmas of the SQLite database, see utils/sqlite.py
+    init_sqlite(app)
+
+    # uploads processed in background threads, see utils/upload_jobs.py
+    init_upload_jobs(app)
+
+    # driver location pings kept in memory and saved in batches, see utils/locations.py
+    init_locations(app)
+
+    # a known key would let anyone sign a quote at any price
+    if not app.config['SECRET_KEY']:
+        app.logger.warning('SECRET_KEY is not set, the order quotes are disabled')
+
+    # cors, the browser may read the ids of the upload jobs
+    CORS(app, expose_headers=[UPLOAD_JOBS_HEADER])
+
+    app.add_url_rule('/uploads/<path:filename>', view_func=send_file)
+    return app
 
+# the app of the scripts and the tests, served by wsgi.py
+app = create_app()
 
-# run the app
+# run the development server, wsgi.py is the production entry point
 if __name__ == '__main__':
-    app.run(port=11000, debug=True, host='0.0.0.0')
+    app.run(port=11000, debug=app.config['DEBUG'], host='0.0.0.0', threaded=True)
@@ -9,5 +9,11 @@ from .menu.item import MenuItem
 from .order.cart import CartItem
 from .order.order import Order, OrderItem
 from .order.review import DriverReview, RestaurantReview
-from .chat import Chat
+from .order.event import OrderEvent
+from .chat import Chat, Conversation
 from .favourites import Favourites
+from .session import UserSession
+from .upload_job import UploadJob
+from .dispatch import DriverState, DispatchOffer
+from .prep_time import PrepTimeStat
+from . import search_index
@@ -1,4 +1,5 @@
 """Base DB Model that Every Schema is built upon"""
+from datetime import time
 from enum import Enum
 from abc import ABCMeta
 from utils.db import db
@@ -14,6 +15,8 @@ class BaseMixin:
                 continue
             if col.name == 'card_number':
                 val = '****-****-****-****'
+            elif isinstance(val, time):
+                val = val.strftime("%H:%M")
             elif (col.name == "created_at" or
                    col.name == "updated_at" or 'time' in col.name) and val:
                 val = val.strftime("%Y-%m-%d %H:%M:%S")
@@ -1,13 +1,14 @@
 """Chat DB"""
-from typing import Union, TypedDict
+from typing import Tuple, Union, TypedDict
 from datetime import datetime
-from utils.db import db
+from utils.db import db, enum_type
 from db_model import Customer, Driver, Restaurant
 from db_model.base import BaseModel
 from db_model.db_enum import ChatSupportUserType
 
 class ChatLog(TypedDict):
     """Type for Chat log"""
+    id: int
     message_type: str
     message: str
     time: str
@@ -19,27 +20,105 @@ class Chat(BaseModel):
     """
     __tablename__ = 'chat'
     id = db.Column(db.Integer, primary_key=True)
-    from_type = db.Column(db.Enum(ChatSupportUserType), nullable=True)
-    to_type = db.Column(db.Enum(ChatSupportUserType), nullable=True)
+    from_type = db.Column(enum_type(ChatSupportUserType), nullable=True)
+    to_type = db.Column(enum_type(ChatSupportUserType), nullable=True)
     from_id = db.Column(db.Integer, nullable=True)
     to_id = db.Column(db.Integer, nullable=True)
 
     message = db.Column(db.String(500), nullable=False)
     time = db.Column(db.DateTime, default=datetime.now)
 
+    # chats are searched by the sender and by the receiver
+    __table_args__ = (
+        db.Index('ix_chat_from', 'from_type', 'from_id'),
+        db.Index('ix_chat_to', 'to_type', 'to_id'),
+    )
+
     def format_chat(self, me: Union[Customer, Driver, Restaurant]) -> ChatLog:
         """Format list of chat into redable format"""
         my_type = ChatSupportUserType(type(me).__name__.upper())
         my_id = me.id
         if self.from_id == my_id and self.from_type == my_type:
             return {
+                'id': self.id,
                 'message_type': 'sent',
                 'message': self.message,
                 'time': self.time.strftime("%Y-%m-%d %H:%M:%S")
             }
         else:
             return {
+                    'id': self.id,
                     'message_type': 'received',
                     'message': self.message,
                     'time': self.time.strftime("%Y-%m-%d %H:%M:%S")
             }
+
+class Conversation(BaseModel):
+    """
+    Class of Conversation DB, the summary of the chats between two users.
+    One row per pair of users; user1 is the user that sorts first (see order_users),
+    so the pair is found with one index lookup whoever sends.
+    """
+    __tablename__ = 'conversations'
+    id = db.Column(db.Integer, primary_key=True)
+    user1_type = db.Column(enum_type(ChatSupportUserType), nullable=False)
+    user1_id = db.Column(db.Integer, nullable=False)
+    user2_type = db.Column(enum_type(ChatSupportUserType), nullable=False)
+    user2_id = db.Column(db.Integer, nullable=False)
+
+    # the newest chat
+    last_chat_id = db.Column(db.Integer, nullable=False)
+    last_message = db.Column(db.String(500), nullable=False)
+    last_time = db.Column(db.DateTime, nullable=False)
+    last_from_user1 = db.Column(db.Boolean, nullable=False)
+
+    # chats not read yet by each user
+    user1_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    user2_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # conversations are searched by the pair, and by either user for the inbox
+    __table_args__ = (
+        db.UniqueConstraint(
+            'user1_type', 'user1_id', 'user2_type', 'user2_id', name='uq_conversation_users'
+        ),
+        db.Index('ix_conversation_user2', 'user2_type', 'user2_id'),
+    )
+
+    @staticmethod
+    def order_users(
+        type_a: ChatSupportUserType, id_a: int,
+        type_b: ChatSupportUserType, id_b: int
+    ) -> Tuple[ChatSupportUserType, int, ChatSupportUserType, int]:
+        """(user1_type, user1_id, user2_type, user2_id) of the pair, in either order"""
+        if (type_a.value, id_a) <= (type_b.value, id_b):
+            return type_a, id_a, type_b, id_b
+        return type_b, id_b, type_a, id_a
+
+    def is_user1(self, user_type: ChatSupportUserType, user_id: int) -> bool:
+        """Whether the user is user1 of the conversation"""
+        return self.user1_type == user_type and self.user1_id == user_id
+
+    def other_user(
+        self, user_type: ChatSupportUserType, user_id: int
+    ) -> Tuple[ChatSupportUserType, int]:
+        """(type, id) of the other user of the conversation"""
+        if self.is_user1(user_type, user_id):
+            return self.user2_type, self.user2_id
+        return self.user1_type, self.user1_id
+
+    def unread_of(self, user_type: ChatSupportUserType, user_id: int) -> int:
+        """Number of chats the user has not read"""
+        if self.is_user1(user_type, user_id):
+            return self.user1_unread
+        return self.user2_unread
+
+    def format_last_chat(self, me: Union[Customer, Driver, Restaurant]) -> ChatLog:
+        """Format the newest chat like Chat.format_chat"""
+        my_type = ChatSupportUserType(type(me).__name__.upper())
+        sent = self.last_from_user1 == self.is_user1(my_type, me.id)
+        return {
+            'id': self.last_chat_id,
+            'message_type': 'sent' if sent else 'received',
+            'message': self.last_message,
+            'time': self.last_time.strftime("%Y-%m-%d %H:%M:%S")
+        }
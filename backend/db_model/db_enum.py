@@ -18,6 +18,7 @@ class OrderStatus(Enum):
     Customer orders item -> PENDING -> Restaurant confirms -> RESTAURANT_ACCEPTED
     -> Restaurant notify food ready -> READY_FOR_PICKUP -> Driver pick up order
     -> PICKED_UP -> Driver completes delivery -> DELIVERED
+    The restaurant may reject (CANCELLED) the order until it is ready.
     """
     PENDING = 'PENDING'
     RESTAURANT_ACCEPTED = 'RESTAURANT_ACCEPTED'
@@ -26,6 +27,23 @@ class OrderStatus(Enum):
     DELIVERED = 'DELIVERED'
     CANCELLED = 'CANCELLED'
 
+    def can_move_to(self, new_status: 'OrderStatus') -> bool:
+        """Whether the order can go from this status to new_status"""
+        return new_status in ORDER_STATUS_TRANSITIONS[self]
+
+# status -> the statuses an order can move to
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.RESTAURANT_ACCEPTED, OrderStatus.CANCELLED},
+    OrderStatus.RESTAURANT_ACCEPTED: {OrderStatus.READY_FOR_PICKUP, OrderStatus.CANCELLED},
+    OrderStatus.READY_FOR_PICKUP: {OrderStatus.PICKED_UP},
+    OrderStatus.PICKED_UP: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+# a driver can take an order once the restaurant accepted it, until it is picked up
+DRIVER_CLAIMABLE_STATUSES = [OrderStatus.RESTAURANT_ACCEPTED, OrderStatus.READY_FOR_PICKUP]
+
 class RegistrationStatus(Enum):
     """
     Class for Enum of Registration Status of Driver and Restaurant
@@ -60,3 +78,34 @@ class UserType(Enum):
     CUSTOMER = 'CUSTOMER'
     RESTAURANT = 'RESTAURANT'
     DRIVER = 'DRIVER'
+
+class UploadKind(Enum):
+    """
+    Enum of the uploaded file kinds, each is checked and processed differently
+    - IMAGE: resized copies are created
+    - DOCUMENT: PDF or image, a gzip copy is created for PDF
+    """
+    IMAGE = 'IMAGE'
+    DOCUMENT = 'DOCUMENT'
+
+class UploadJobStatus(Enum):
+    """
+    Enum of the status of an upload job
+    PENDING -> PROCESSING -> DONE, or FAILED when the file is not valid
+    """
+    PENDING = 'PENDING'
+    PROCESSING = 'PROCESSING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+class OfferStatus(Enum):
+    """
+    Enum of the status of an order offered to a driver by the dispatch
+    OFFERED -> ACCEPTED (the driver took the order), DECLINED (by the driver),
+    EXPIRED (no answer in time) or WITHDRAWN (another driver took the order)
+    """
+    OFFERED = 'OFFERED'
+    ACCEPTED = 'ACCEPTED'
+    DECLINED = 'DECLINED'
+    EXPIRED = 'EXPIRED'
+    WITHDRAWN = 'WITHDRAWN'
@@ -1,8 +1,14 @@
 """DB Query functions"""
+import secrets
 from collections import defaultdict
+from datetime import datetime, time, timedelta
 from typing import Optional, List, Union, Tuple, Dict
 
-from sqlalchemy import or_, and_
+from flask import current_app
+from sqlalchemy import bindparam, case, insert, or_, and_, func, update
+from utils.cache import TTLCache
+from utils.db import db
+from utils.pagination import Page, PageArgs, fetch
 from db_model import (
     Admin,
     Customer,
@@ -12,24 +18,120 @@ from db_model import (
     MenuItem,
     CartItem,
     Chat,
+    Conversation,
     Order,
     OrderItem,
+    OrderEvent,
     Favourites,
     RestaurantReview,
-    DriverReview
+    DriverReview,
+    UserSession,
+    UploadJob,
+    DriverState,
+    DispatchOffer,
+    PrepTimeStat
 )
-from .db_enum import ChatSupportUserType, OrderStatus
+from .db_enum import (
+    ChatSupportUserType, DRIVER_CLAIMABLE_STATUSES, OfferStatus, OrderStatus, UploadJobStatus,
+    UserType
+)
+from .search_index import is_search_index_supported, match_expression, match_subquery
 
 #--------------------------------------------------------#
 #---------------Functions related to Users---------------#
 #--------------------------------------------------------#
+USER_MODELS = {
+    UserType.ADMIN: Admin,
+    UserType.CUSTOMER: Customer,
+    UserType.DRIVER: Driver,
+    UserType.RESTAURANT: Restaurant,
+}
+
+# token -> (user_type, user_id, expires_at)
+# Only the location pings trust it (see resolve_session): a token logged out on another
+# worker may still send pings until the entry expires.
+session_cache = TTLCache(maxsize=10000, ttl=60)
+
+def create_session(user: Union[Admin, Customer, Driver, Restaurant]) -> str:
+    """
+    Issue a new token for the user and store it in the session table.
+    The user must already have an id (flush before calling). Caller commits.
+    """
+    token = secrets.token_urlsafe(16)
+    lifetime: timedelta = current_app.config.get('SESSION_LIFETIME', timedelta(days=7))
+    session = UserSession(
+        token=token,
+        user_type=UserType(type(user).__name__.upper()),
+        user_id=user.id,
+        expires_at=datetime.now() + lifetime
+    )
+    db.session.add(session)
+
+    # the latest token is still kept on the user row, so the login response contains it
+    user.token = token
+    return token
+
+def resolve_session(token: Optional[str], cached: bool = True) -> Optional[Tuple[UserType, int]]:
+    """
+    Find (user_type, user_id) of the token. Cache first, then one primary key lookup.
+    cached=False always reads the session table, so a token logged out or invalidated
+    through another worker is refused at once.
+    """
+    if not token:
+        return None
+
+    entry = session_cache.get(token) if cached else None
+    if entry is None:
+        session: Optional[UserSession] = db.session.get(UserSession, token)
+        if not session:
+            session_cache.pop(token)
+            return None
+        entry = (session.user_type, session.user_id, session.expires_at)
+        session_cache.set(token, entry)
+
+    user_type, user_id, expires_at = entry
+    if expires_at <= datetime.now():
+        session_cache.pop(token)
+        return None
+    return user_type, user_id
+
+def invalidate_session(token: Optional[str]) -> None:
+    """Remove the given token. Caller commits."""
+    if not token:
+        return
+    UserSession.query.filter_by(token=token).delete(synchronize_session=False)
+    session_cache.pop(token)
+
+def invalidate_user_sessions(
+    user: Union[Admin, Customer, Driver, Restaurant],
+    keep_token: Optional[str] = None
+) -> None:
+    """
+    Remove every token of the user except keep_token, e.g. after a password change.
+    Caller commits.
+    """
+    user_type = UserType(type(user).__name__.upper())
+    sessions = UserSession.query.filter_by(user_type=user_type, user_id=user.id).all()
+    for session in sessions:
+        if session.token == keep_token:
+            continue
+        session_cache.pop(session.token)
+        db.session.delete(session)
+
 def get_user_by_token(token: str) -> Optional[Union[Admin, Customer, Driver, Restaurant]]:
-    """Find Any User with matching token."""
-    for user_db in [Admin, Customer, Driver, Restaurant]:
-        user = user_db.query.filter_by(token=token).first()
-        if user:
-            return user
-    return None
+    """Find Any User with matching token, the session is read from the database."""
+    resolved = resolve_session(token, cached=False)
+    if not resolved:
+        return None
+    user_type, user_id = resolved
+    return db.session.get(USER_MODELS[user_type], user_id)
+
+def _get_user_of_type_by_token(token: str, user_type: UserType):
+    """Find the user of the token only if the user is of given type, read from the database"""
+    resolved = resolve_session(token, cached=False)
+    if not resolved or resolved[0] != user_type:
+        return None
+    return db.session.get(USER_MODELS[user_type], resolved[1])
 
 def get_user_by_type_and_id(
         user_type: str, user_id: int
@@ -48,24 +150,24 @@ def get_user_by_type_and_id(
 
 def get_admin_by_token(token: str) -> Optional[Admin]:
     """Find Admin with given token"""
-    return Admin.query.filter_by(token=token).first()
+    return _get_user_of_type_by_token(token, UserType.ADMIN)
 
 def get_customer_by_token(token: str) -> Optional[Customer]:
     """Find Customer with given token"""
-    return Customer.query.filter_by(token=token).first()
+    return _get_user_of_type_by_token(token, UserType.CUSTOMER)
 
 def get_driver_by_token(token: str) -> Optional[Driver]:
     """Find Driver with given token"""
-    return Driver.query.filter_by(token=token).first()
+    return _get_user_of_type_by_token(token, UserType.DRIVER)
 
 def get_restaurant_by_token(token: str) -> Optional[Restaurant]:
     """Find Restaurant with given token"""
-    return Restaurant.query.filter_by(token=token).first()
+    return _get_user_of_type_by_token(token, UserType.RESTAURANT)
 
 #--------------------------------------------------------#
 #---------------Functions related to Admin---------------#
 #--------------------------------------------------------#
-def filter_admins(**kwargs) -> List[Admin]:
+def filter_admins(**kwargs) -> Union[List[Admin], Page]:
     """
     Dynamically filters admin users based on provided fields.
 
@@ -75,6 +177,8 @@ def filter_admins(**kwargs) -> List[Admin]:
         - first_name
         - last_name
         - token
+
+    Pass page (PageArgs) to get one Page sorted by id instead of the full list.
     """
     filters = []
     for field in ['id', 'email', 'first_name', 'last_name', 'token']:
@@ -82,12 +186,15 @@ def filter_admins(**kwargs) -> List[Admin]:
         if value is not None:
             filters.append(getattr(Admin, field) == value)
 
-    return Admin.query.filter(and_(*filters)).all()
+    return fetch(
+        Admin.query.filter(and_(*filters)), [Admin.id],
+        kwargs.get('page'), descending=False
+    )
 
 #--------------------------------------------------------#
 #-------------Functions related to Restaurant-------------#
 #--------------------------------------------------------#
-def filter_restaurants(**kwargs) -> List[Restaurant]:
+def filter_restaurants(**kwargs) -> Union[List[Restaurant], Page]:
     """
     Dynamically filters restaurants based on provided fields.
 
@@ -102,6 +209,8 @@ def filter_restaurants(**kwargs) -> List[Restaurant]:
         - postcode
         - registration_status
         - token
+
+    Pass page (PageArgs) to get one Page sorted by id instead of the full list.
     """
     filters = []
     for field in [
@@ -112,7 +221,10 @@ def filter_restaurants(**kwargs) -> List[Restaurant]:
         if value is not None:
             filters.append(getattr(Restaurant, field) == value)
 
-    return Restaurant.query.filter(and_(*filters)).all()
+    return fetch(
+        Restaurant.query.filter(and_(*filters)), [Restaurant.id],
+        kwargs.get('page'), descending=False
+    )
 
 def get_restaurant_by_menu(menu_id: int) -> Optional[Restaurant]:
     """Get the restaurant that owns given menu"""
@@ -127,7 +239,7 @@ def get_restaurant_by_menu(menu_id: int) -> Optional[Restaurant]:
 #--------------------------------------------------------#
 #-------------Functions related to Customer-------------#
 #--------------------------------------------------------#
-def filter_customers(**kwargs) -> List[Customer]:
+def filter_customers(**kwargs) -> Union[List[Customer], Page]:
     """
     Dynamically filters customers based on provided fields.
     
@@ -144,6 +256,8 @@ def filter_customers(**kwargs) -> List[Customer]:
         - postcode
         - id
         - token
+
+    Pass page (PageArgs) to get one Page sorted by id instead of the full list.
     """
     filters = []
     for field in ['id', 'email', 'username', 'phone', 'suburb', 'state', 'postcode', 'token']:
@@ -151,12 +265,15 @@ def filter_customers(**kwargs) -> List[Customer]:
         if value is not None:
             filters.append(getattr(Customer, field) == value)
 
-    return Customer.query.filter(and_(*filters)).all()
+    return fetch(
+        Customer.query.filter(and_(*filters)), [Customer.id],
+        kwargs.get('page'), descending=False
+    )
 
 #--------------------------------------------------------#
 #--------------Functions related to Driver--------------#
 #--------------------------------------------------------#
-def filter_drivers(**kwargs) -> List[Driver]:
+def filter_drivers(**kwargs) -> Union[List[Driver], Page]:
     """
     Dynamically filters drivers based on provided fields.
 
@@ -170,6 +287,8 @@ def filter_drivers(**kwargs) -> List[Driver]:
         - car_plate
         - registration_status
         - token
+
+    Pass page (PageArgs) to get one Page sorted by id instead of the full list.
     """
     filters = []
     for field in [
@@ -180,7 +299,10 @@ def filter_drivers(**kwargs) -> List[Driver]:
         if value is not None:
             filters.append(getattr(Driver, field) == value)
 
-    return Driver.query.filter(and_(*filters)).all()
+    return fetch(
+        Driver.query.filter(and_(*filters)), [Driver.id],
+        kwargs.get('page'), descending=False
+    )
 
 #--------------------------------------------------------#
 #-----------Functions related to Customer Cart------------#
@@ -202,10 +324,56 @@ def filter_cart_items( **kwargs) -> List[CartItem]:
 
     return CartItem.query.filter(and_(*filters)).all()
 
+def get_cart_lines(
+        customer_id: int, restaurant_id: Optional[int] = None
+    ) -> List[Tuple[CartItem, MenuItem, MenuCategory, Restaurant]]:
+    """
+    Get the cart items of the customer together with their menu item, category and
+    restaurant, in one joined query. Sorted by restaurant, then menu item.
+
+    :param customer_id: Integer customer ID
+    :param restaurant_id: Only the items of this restaurant (optional)
+    :return: List of (CartItem, MenuItem, MenuCategory, Restaurant)
+    """
+    query = db.session.query(CartItem, MenuItem, MenuCategory, Restaurant) \
+        .join(MenuItem, MenuItem.id == CartItem.menu_id) \
+        .join(MenuCategory, MenuCategory.id == MenuItem.category_id) \
+        .join(Restaurant, Restaurant.id == MenuCategory.restaurant_id) \
+        .filter(CartItem.customer_id == customer_id)
+    if restaurant_id is not None:
+        query = query.filter(MenuCategory.restaurant_id == restaurant_id)
+    return query.order_by(Restaurant.id, MenuItem.id).all()
+
+def delete_cart_items(
+        customer_id: int,
+        restaurant_id: Optional[int] = None,
+        menu_ids: Optional[List[int]] = None
+    ) -> int:
+    """
+    Remove cart items of the customer with one DELETE, the caller commits.
+
+    :param restaurant_id: Only the items of this restaurant (optional)
+    :param menu_ids: Only these menu items (optional)
+    :return: Number of removed cart items
+    """
+    query = CartItem.query.filter(CartItem.customer_id == customer_id)
+    if restaurant_id is not None:
+        query = query.filter(CartItem.menu_id.in_(
+            db.session.query(MenuItem.id)
+            .join(MenuCategory, MenuCategory.id == MenuItem.category_id)
+            .filter(MenuCategory.restaurant_id == restaurant_id)
+        ))
+    if menu_ids is not None:
+        query = query.filter(CartItem.menu_id.in_(menu_ids))
+    return query.delete(synchronize_session=False)
+
 #--------------------------------------------------------#
 #---------------Functions related to Order---------------#
 #--------------------------------------------------------#
-def filter_orders(**kwargs) -> List[Order]:
+# newest orders first
+ORDER_PAGE_KEYS = [Order.order_time, Order.id]
+
+def filter_orders(**kwargs) -> Union[List[Order], Page]:
     """
     Dynamically filters orders based on provided fields.
 
@@ -221,6 +389,10 @@ def filter_orders(**kwargs) -> List[Order]:
         - order_time
         - pickup_time
         - delivery_time
+
+    A list value (e.g. of order_status) matches any of the values.
+    Pass page (PageArgs) to get one Page, newest first by (order_time, id),
+    instead of the full list.
     """
     filters = []
     for field in [
@@ -228,10 +400,12 @@ def filter_orders(**kwargs) -> List[Order]:
         'suburb', 'state', 'postcode', 'order_time', 'pickup_time', 'delivery_time'
     ]:
         value = kwargs.get(field)
-        if value is not None:
+        if isinstance(value, (list, tuple)):
+            filters.append(getattr(Order, field).in_(value))
+        elif value is not None:
             filters.append(getattr(Order, field) == value)
 
-    return Order.query.filter(and_(*filters)).all()
+    return fetch(Order.query.filter(and_(*filters)), ORDER_PAGE_KEYS, kwargs.get('page'))
 
 def get_orders_waiting_driver() -> List[Order]:
     """Get All Orders that is waiting for driver"""
@@ -240,78 +414,251 @@ def get_orders_waiting_driver() -> List[Order]:
         Order.order_status != OrderStatus.CANCELLED
     ).all()
 
-def get_orders_of_driver_from_order_type(driver_id: int, order_type: str) -> List[Order]:
-    """order_type: new, in_progress, delivering, completed, all"""
+def get_recent_order_times(
+    restaurant_id: int, since: datetime, limit: int
+) -> List[Tuple[datetime, datetime, Optional[datetime], str]]:
+    """
+    (order_time, pickup_time, delivery_time, postcode) of the latest orders of the
+    restaurant picked up, ordered since `since`, the latest first. Used for the ETA.
+    """
+    return db.session.query(
+        Order.order_time, Order.pickup_time, Order.delivery_time, Order.postcode
+    ).filter(
+        Order.restaurant_id == restaurant_id,
+        Order.order_time >= since,
+        Order.pickup_time.isnot(None)
+    ).order_by(Order.order_time.desc()).limit(limit).all()
+
+def count_accepted_orders(restaurant_id: int) -> int:
+    """Number of orders of the restaurant accepted and not ready yet, its kitchen queue"""
+    return Order.query.filter(
+        Order.restaurant_id == restaurant_id,
+        Order.order_status == OrderStatus.RESTAURANT_ACCEPTED
+    ).count()
+
+def get_prep_time_stats(restaurant_id: int) -> List[PrepTimeStat]:
+    """Preparation time statistics of the restaurant, one per (hour, queue bucket)"""
+    return PrepTimeStat.query.filter(PrepTimeStat.restaurant_id == restaurant_id).all()
+
+def update_prep_time_stat(
+    restaurant_id: int, hour: int, queue_bucket: int, minutes: float, now: datetime
+) -> bool:
+    """
+    Add one preparation time to its statistic with Welford's update, in one UPDATE so
+    concurrent updates are not lost (every value set is computed from the old row).
+    The caller commits.
+
+    :return: Whether the statistic exists (False: nothing updated)
+    """
+    delta = minutes - PrepTimeStat.mean_minutes
+    new_mean = PrepTimeStat.mean_minutes + delta / (PrepTimeStat.samples + 1)
+    updated = PrepTimeStat.query.filter(
+        PrepTimeStat.restaurant_id == restaurant_id,
+        PrepTimeStat.hour == hour,
+        PrepTimeStat.queue_bucket == queue_bucket
+    ).update({
+        PrepTimeStat.samples: PrepTimeStat.samples + 1,
+        PrepTimeStat.mean_minutes: new_mean,
+        PrepTimeStat.m2: PrepTimeStat.m2 + delta * (minutes - new_mean),
+        PrepTimeStat.updated_at: now,
+    }, synchronize_session=False)
+    return updated == 1
+
+def get_prep_time_history(
+    since: datetime
+) -> List[Tuple[int, datetime, Optional[datetime], Optional[datetime], Optional[int]]]:
+    """
+    (restaurant_id, order_time, ready_time, pickup_time, kitchen_queue) of the orders
+    placed since `since` and ready or picked up
+    """
+    return db.session.query(
+        Order.restaurant_id, Order.order_time, Order.ready_time, Order.pickup_time,
+        Order.kitchen_queue
+    ).filter(
+        Order.order_time >= since,
+        or_(Order.ready_time.isnot(None), Order.pickup_time.isnot(None))
+    ).all()
+
+def replace_prep_time_stats(stats: List[Dict]) -> None:
+    """Replace every preparation time statistic by the given rows, the caller commits"""
+    PrepTimeStat.query.delete(synchronize_session=False)
+    if stats:
+        db.session.execute(insert(PrepTimeStat), stats)
+
+def get_order_events_since(since: int, **kwargs) -> List[OrderEvent]:
+    """
+    Get the order events after the event of id `since`, oldest first.
+
+    Supported fields (events matching any of them):
+        - customer_id
+        - restaurant_id
+        - driver_id
+        - in_pool (True for the events of orders waiting for a driver)
+    """
+    conditions = [
+        getattr(OrderEvent, field) == value for field, value in kwargs.items()
+        if field in ('customer_id', 'restaurant_id', 'driver_id', 'in_pool')
+    ]
+    if not conditions:
+        return []
+    return OrderEvent.query.filter(
+        or_(*conditions), OrderEvent.id > since
+    ).order_by(OrderEvent.id.asc()).all()
+
+def get_last_order_event_id() -> int:
+    """Id of the newest order event, 0 when there is none"""
+    return db.session.query(func.max(OrderEvent.id)).scalar() or 0
+
+def get_orders_of_driver_from_order_type(
+    driver_id: int,
+    order_type: str,
+    page: Optional[PageArgs] = None
+) -> Union[List[Order], Page]:
+    """
+    order_type: new, in_progress, delivering, completed, all
+    Pass page to get one Page of the newest orders instead of the full list.
+    """
 
     if order_type == 'new':
         # require this order must be accepted by the restaurant first, 
         # then it can be shown to the driver.
         # so the order_status can be: RESTAURANT_ACCEPTED, READY_FOR_PICKUP
-        return Order.query.filter(
+        query = Order.query.filter(
             Order.driver_id.is_(None),
             Order.order_status.in_([
                 OrderStatus.RESTAURANT_ACCEPTED,
                 OrderStatus.READY_FOR_PICKUP,
             ])
-        ).all()
+        )
+        # with the dispatch, only the orders offered to this driver
+        if current_app.config.get('DISPATCH_ENABLED'):
+            query = query.filter(live_offer_exists(driver_id, datetime.now()))
     elif order_type == 'to_pickup':
         # this order belongs to this driver,
         # order status: restaurant_accepted (in cooking), ready_for_pickup (waiting for driver)
-        return Order.query.filter(
+        query = Order.query.filter(
             Order.driver_id == driver_id,
             Order.order_status.in_([
                 OrderStatus.RESTAURANT_ACCEPTED,
                 OrderStatus.READY_FOR_PICKUP,
             ])
-        ).all()
+        )
     elif order_type == 'delivering':
-        return Order.query.filter(
+        query = Order.query.filter(
             Order.driver_id == driver_id,
             Order.order_status == OrderStatus.PICKED_UP
-        ).all()
+        )
     elif order_type == 'completed':
-        return Order.query.filter(
+        query = Order.query.filter(
             Order.driver_id == driver_id,
             Order.order_status == OrderStatus.DELIVERED
-        ).all()
+        )
     elif order_type == 'all':
-        return Order.query.filter(
+        query = Order.query.filter(
             Order.driver_id == driver_id
-        ).all()
+        )
     else:
         # invalid order type
+        return [] if page is None else Page([], None)
+
+    return fetch(query, ORDER_PAGE_KEYS, page)
+
+def format_orders_with_details(orders: List[Order]) -> List[Dict]:
+    """
+    Format orders with the restaurant, customer, driver and items (with the menu item).
+    Uses a fixed number of queries however many orders are given.
+    The result keeps the order of the given list.
+    """
+    if not orders:
         return []
-    
-# the order_id is assumed to be valid.
-def get_order_by_order_id(order_id: int):
-    order = Order.query.get(order_id)
 
-    # obtain the restaurant details, into a dictionary, the driver detail, and the customer detail
-    restaurant = Restaurant.query.get(order.restaurant_id)
-    customer = Customer.query.get(order.customer_id)
-    driver = Driver.query.get(order.driver_id) if order.driver_id else None
+    order_ids = [order.id for order in orders]
+    restaurant_ids = {order.restaurant_id for order in orders}
+    customer_ids = {order.customer_id for order in orders}
+    driver_ids = {order.driver_id for order in orders if order.driver_id}
 
-    # obtain all the items
-    items = OrderItem.query.filter_by(order_id=order_id).all()
+    # load every related row with one IN query per table
+    restaurants = {
+        r.id: r for r in Restaurant.query.filter(Restaurant.id.in_(restaurant_ids)).all()
+    }
+    customers = {
+        c.id: c for c in Customer.query.filter(Customer.id.in_(customer_ids)).all()
+    }
+    drivers = {
+        d.id: d for d in Driver.query.filter(Driver.id.in_(driver_ids)).all()
+    } if driver_ids else {}
 
-    # for each item, also obtain the menu item object
-    formatted_items = []
-    for item in items:
+    # the items with its menu item, the menu may already be deleted
+    items_by_order = defaultdict(list)
+    rows = (
+        db.session.query(OrderItem, MenuItem)
+        .outerjoin(MenuItem, OrderItem.menu_id == MenuItem.id)
+        .filter(OrderItem.order_id.in_(order_ids))
+        .order_by(OrderItem.id)
+        .all()
+    )
+    for item, menu_item in rows:
         result = item.dict()
-        menu_item = MenuItem.query.get(item.menu_id)
         result['menu_item'] = menu_item.dict() if menu_item else None
-        formatted_items.append(result)
-    
-    # make the result dictionary
-    result = {
-        'order': order.dict(),
-        'restaurant': restaurant.dict(),
-        'customer': customer.dict(),
-        'driver': driver.dict() if driver else None,
-        'items': formatted_items
-    }
+        items_by_order[item.order_id].append(result)
+
+    results = []
+    for order in orders:
+        driver = drivers.get(order.driver_id)
+        results.append({
+            'order': order.dict(),
+            'restaurant': restaurants[order.restaurant_id].dict(),
+            'customer': customers[order.customer_id].dict(),
+            'driver': driver.dict() if driver else None,
+            'items': items_by_order[order.id]
+        })
+
+    return results
+
+def get_orders_by_order_ids(order_ids: List[int]) -> List[Dict]:
+    """Detailed orders for the given ids, in the same order. Unknown ids are skipped."""
+    orders = {o.id: o for o in Order.query.filter(Order.id.in_(order_ids)).all()}
+    return format_orders_with_details(
+        [orders[order_id] for order_id in order_ids if order_id in orders]
+    )
+
+# the order_id is assumed to be valid.
+def get_order_by_order_id(order_id: int):
+    """Detailed order of the given id"""
+    return get_orders_by_order_ids([order_id])[0]
+
+def transition_order(order: Order, new_status: OrderStatus, *conditions, **values) -> bool:
+    """
+    Compare and set the status of the order: one
+    UPDATE orders SET order_status = new_status, values... WHERE id = ?
+    AND order_status = <the status the order was read with> AND conditions.
+    A concurrent change of the order makes it fail instead of being overwritten.
+    The caller checks OrderStatus.can_move_to first, and commits.
 
-    return result
+    :return: Whether the order was updated (the order object is updated as well)
+    """
+    values[Order.order_status.key] = new_status
+    updated = Order.query.filter(
+        Order.id == order.id,
+        Order.order_status == order.order_status,
+        *conditions
+    ).update(values)
+    return updated == 1
+
+def claim_order(order: Order, driver_id: int) -> bool:
+    """
+    Assign the driver to the order only if no driver has it yet and it can be taken:
+    one UPDATE ... WHERE id = ? AND driver_id IS NULL AND order_status IN (...),
+    so among concurrent claims exactly one wins. The caller commits.
+
+    :return: Whether this driver got the order (the order object is updated as well)
+    """
+    updated = Order.query.filter(
+        Order.id == order.id,
+        Order.driver_id.is_(None),
+        Order.order_status.in_(DRIVER_CLAIMABLE_STATUSES)
+    ).update({Order.driver_id: driver_id})
+    return updated == 1
 
 #--------------------------------------------------------#
 #------------Functions related to Menu Items------------#
@@ -353,7 +700,8 @@ def filter_menu_from_restaurant(
     :return: List of MenuItems or a single MenuItem if first_only is True
     """
     query = MenuItem.query.join(MenuCategory).filter(
-        MenuCategory.restaurant_id == restaurant_id
+        MenuCategory.restaurant_id == restaurant_id,
+        MenuItem.is_deleted.is_(False)
     )
 
     if name:
@@ -377,7 +725,7 @@ def filter_menu_categories(**kwargs) -> List[MenuCategory]:
         - restaurant_id
         - name
     """
-    filters = []
+    filters = [MenuCategory.is_deleted.is_(False)]
     for field in ['id', 'restaurant_id', 'name']:
         value = kwargs.get(field)
         if value is not None:
@@ -388,21 +736,49 @@ def filter_menu_categories(**kwargs) -> List[MenuCategory]:
 #--------------------------------------------------------#
 #---------------Functions related to Chat---------------#
 #--------------------------------------------------------#
-def get_chats_by_user(user_type: ChatSupportUserType, user_id: int)\
+def get_chats_of_user_since(
+        user_type: ChatSupportUserType, user_id: int, since: int
+    ) -> List[Chat]:
+    """
+    Get the chats sent or received by the user after the chat of id `since`,
+    for a client catching up on the messages it missed.
+
+    :param user_type: Enum value of ChatSupportUserType (e.g., ChatSupportUserType.Customer)
+    :param user_id: Integer user ID
+    :param since: id of the last chat the client has
+    :return: List of Chat objects sorted by id
+    """
+    return Chat.query.filter(
+        or_(
+            (Chat.from_type == user_type) & (Chat.from_id == user_id),
+            (Chat.to_type == user_type) & (Chat.to_id == user_id)
+        ),
+        Chat.id > since
+    ).order_by(Chat.id.asc()).all()
+
+def get_last_chat_id() -> int:
+    """Id of the newest chat, 0 when there is none"""
+    return db.session.query(func.max(Chat.id)).scalar() or 0
+
+def get_chats_by_user(user_type: ChatSupportUserType, user_id: int, since: Optional[int] = None)\
     -> Dict[Tuple[ChatSupportUserType, int], List[Chat]]:
     """
     Get all chats involving the user and group them by the other user involved.
 
     :param user_type: Enum value of ChatSupportUserType (e.g., ChatSupportUserType.Customer)
     :param user_id: Integer user ID
+    :param since: Only the chats after the chat of this id (optional)
     :return: Dictionary grouped by (other_user_type, other_user_id)
     """
-    chats = Chat.query.filter(
+    query = Chat.query.filter(
         or_(
             (Chat.from_type == user_type) & (Chat.from_id == user_id),
             (Chat.to_type == user_type) & (Chat.to_id == user_id)
         )
-    ).order_by(Chat.time.asc()).all()
+    )
+    if since is not None:
+        query = query.filter(Chat.id > since)
+    chats = query.order_by(Chat.time.asc()).all()
 
     grouped_chats = defaultdict(list)
 
@@ -417,8 +793,10 @@ def get_chats_by_user(user_type: ChatSupportUserType, user_id: int)\
 
 def get_chats_between_users(
         user1_type: ChatSupportUserType, user1_id: int,
-        user2_type: ChatSupportUserType, user2_id: int
-    ) -> List[Chat]:
+        user2_type: ChatSupportUserType, user2_id: int,
+        page: Optional[PageArgs] = None,
+        since: Optional[int] = None
+    ) -> Union[List[Chat], Page]:
     """
     Get all chat logs exchanged between two users (in either direction).
 
@@ -426,22 +804,94 @@ def get_chats_between_users(
     :param user1_id: Integer ID of the first user
     :param user2_type: Enum value of ChatSupportUserType
     :param user2_id: Integer ID of the second user
+    :param page: Get one Page of the newest chats instead of the full list (optional)
+    :param since: Only the chats after the chat of this id (optional)
     :return: List of Chat objects sorted by time
     """
-    chats = Chat.query.filter(
+    query = Chat.query.filter(
         or_(
             and_(Chat.from_type == user1_type, Chat.from_id == user1_id,
                  Chat.to_type == user2_type, Chat.to_id == user2_id),
             and_(Chat.from_type == user2_type, Chat.from_id == user2_id,
                  Chat.to_type == user1_type, Chat.to_id == user1_id)
         )
-    ).order_by(Chat.time.asc()).all()
-    return chats
+    ).order_by(Chat.time.asc())
+    if since is not None:
+        query = query.filter(Chat.id > since)
+    return fetch(query, [Chat.time, Chat.id], page)
+
+def reset_conversation_unread(
+        my_type: ChatSupportUserType, my_id: int,
+        other_type: ChatSupportUserType, other_id: int,
+        last_seen_id: int
+    ) -> bool:
+    """
+    Reset the unread count of the user (my_type, my_id) in the conversation with the
+    other user, with one conditional UPDATE: only if its last chat is the chat of id
+    last_seen_id or older, so a chat added meanwhile stays unread. The caller commits.
+
+    :return: Whether the count was reset
+    """
+    user1_type, user1_id, user2_type, user2_id = Conversation.order_users(
+        my_type, my_id, other_type, other_id
+    )
+    is_user1 = (user1_type, user1_id) == (my_type, my_id)
+    unread = Conversation.user1_unread if is_user1 else Conversation.user2_unread
+    return Conversation.query.filter(
+        Conversation.user1_type == user1_type, Conversation.user1_id == user1_id,
+        Conversation.user2_type == user2_type, Conversation.user2_id == user2_id,
+        Conversation.last_chat_id <= last_seen_id,
+        unread > 0
+    ).update({unread: 0}, synchronize_session=False) == 1
+
+def get_conversations_of_user(
+        user_type: ChatSupportUserType, user_id: int,
+        page: Optional[PageArgs] = None
+    ) -> Union[List[Conversation], Page]:
+    """
+    Get the conversation summaries of the user, newest chat first.
+
+    :param user_type: Enum value of ChatSupportUserType (e.g., ChatSupportUserType.Customer)
+    :param user_id: Integer user ID
+    :param page: Get one Page instead of the full list (optional)
+    :return: List of Conversation objects
+    """
+    query = Conversation.query.filter(
+        or_(
+            (Conversation.user1_type == user_type) & (Conversation.user1_id == user_id),
+            (Conversation.user2_type == user_type) & (Conversation.user2_id == user_id)
+        )
+    ).order_by(Conversation.last_time.desc(), Conversation.id.desc())
+    return fetch(query, [Conversation.last_time, Conversation.id], page)
+
+def get_chat_users(
+        keys: List[Tuple[ChatSupportUserType, int]]
+    ) -> Dict[Tuple[ChatSupportUserType, int], Union[Customer, Driver, Restaurant]]:
+    """
+    Get the users of the given (type, id) with one query per user type.
+
+    :return: Dictionary of the found users by (type, id)
+    """
+    models = {
+        ChatSupportUserType.CUSTOMER: Customer,
+        ChatSupportUserType.DRIVER: Driver,
+        ChatSupportUserType.RESTAURANT: Restaurant,
+    }
+    ids_by_type = defaultdict(set)
+    for user_type, user_id in keys:
+        ids_by_type[user_type].add(user_id)
+
+    users = {}
+    for user_type, ids in ids_by_type.items():
+        model = models[user_type]
+        for user in model.query.filter(model.id.in_(ids)).all():
+            users[(user_type, user.id)] = user
+    return users
 
 #--------------------------------------------------------#
 #-------------Functions related to Favourites-------------#
 #--------------------------------------------------------#
-def filter_favourites(**kwargs) -> List[Favourites]:
+def filter_favourites(**kwargs) -> Union[List[Favourites], Page]:
     """
     Dynamically filters favourite restaurants.
 
@@ -450,6 +900,8 @@ def filter_favourites(**kwargs) -> List[Favourites]:
         - customer_id
         - restaurant_id
 
+    Pass page (PageArgs) to get one Page of the newest entries instead of the full list.
+
     Returns:
         List[Favourites]: List of favourite entries matching the filter
     """
@@ -459,12 +911,12 @@ def filter_favourites(**kwargs) -> List[Favourites]:
         if value is not None:
             filters.append(getattr(Favourites, field) == value)
 
-    return Favourites.query.filter(and_(*filters)).all()
+    return fetch(Favourites.query.filter(and_(*filters)), [Favourites.id], kwargs.get('page'))
 
 #--------------------------------------------------------#
 #-----------Functions related to Review-----------#
 #--------------------------------------------------------#
-def filter_restaurant_reviews(**kwargs) -> List[RestaurantReview]:
+def filter_restaurant_reviews(**kwargs) -> Union[List[RestaurantReview], Page]:
     """
     Dynamically filters restaurant reviews.
 
@@ -474,6 +926,9 @@ def filter_restaurant_reviews(**kwargs) -> List[RestaurantReview]:
         - customer_id
         - restaurant_id
         - rating
+
+    Pass page (PageArgs) to get one Page, newest first by (updated_at, id),
+    instead of the full list.
     """
     filters = []
     for field in ['id', 'order_id', 'customer_id', 'restaurant_id', 'rating']:
@@ -481,12 +936,12 @@ def filter_restaurant_reviews(**kwargs) -> List[RestaurantReview]:
         if value is not None:
             filters.append(getattr(RestaurantReview, field) == value)
 
-    return (
-        RestaurantReview.query.filter(and_(*filters))
-        .order_by(RestaurantReview.updated_at.desc()).all()
+    return fetch(
+        RestaurantReview.query.filter(and_(*filters)).order_by(RestaurantReview.updated_at.desc()),
+        [RestaurantReview.updated_at, RestaurantReview.id], kwargs.get('page')
     )
 
-def filter_driver_reviews(**kwargs) -> List[DriverReview]:
+def filter_driver_reviews(**kwargs) -> Union[List[DriverReview], Page]:
     """
     Dynamically filters driver reviews.
 
@@ -496,6 +951,9 @@ def filter_driver_reviews(**kwargs) -> List[DriverReview]:
         - customer_id
         - driver_id
         - rating
+
+    Pass page (PageArgs) to get one Page, newest first by (updated_at, id),
+    instead of the full list.
     """
     filters = []
     for field in ['id', 'order_id', 'customer_id', 'driver_id', 'rating']:
@@ -503,7 +961,341 @@ def filter_driver_reviews(**kwargs) -> List[DriverReview]:
         if value is not None:
             filters.append(getattr(DriverReview, field) == value)
 
-    return (
-        DriverReview.query.filter(and_(*filters))
-        .order_by(DriverReview.updated_at.desc()).all()
+    return fetch(
+        DriverReview.query.filter(and_(*filters)).order_by(DriverReview.updated_at.desc()),
+        [DriverReview.updated_at, DriverReview.id], kwargs.get('page')
+    )
+
+#--------------------------------------------------------#
+#---------------Functions related to Search---------------#
+#--------------------------------------------------------#
+def _ilike_words(columns: list, search_text: Optional[str]) -> list:
+    """Fallback without the search index: every word is in one of the columns"""
+    words = (search_text or '').split()
+    return [or_(*[column.ilike(f'%{word}%') for column in columns]) for word in words]
+
+def search_restaurants(
+    text: Optional[str] = None,
+    name: Optional[str] = None,
+    suburb: Optional[str] = None,
+    page: Optional[PageArgs] = None,
+    near: Optional[Dict[str, float]] = None,
+    min_rating: Optional[float] = None,
+    open_at: Optional[time] = None
+) -> Union[List[Restaurant], Page]:
+    """
+    Search restaurants, the words are matched as prefixes.
+
+    :param text: Words in the name, suburb or description (optional)
+    :param name: Words in the name (optional)
+    :param suburb: Exact suburb, case insensitive (optional)
+    :param page: Get one Page instead of the full list (optional)
+    :param near: postcode -> distance km, only the restaurants in these postcodes,
+                 the nearest first (optional, see utils.geo.postcodes_within)
+    :param min_rating: Lowest average rating, restaurants without review excluded (optional)
+    :param open_at: Only the restaurants open at this time of the day (optional)
+    :return: Restaurants, the nearest or the most relevant first
+    """
+    query = Restaurant.query
+    keys = [Restaurant.id]
+
+    if is_search_index_supported():
+        matched = match_subquery('restaurant_search', [
+            match_expression(text),
+            match_expression(name, 'name'),
+            match_expression(suburb, 'suburb'),
+        ], 'restaurant_match')
+        if matched is not None:
+            query = query.join(matched, matched.c.id == Restaurant.id)
+            keys = [matched.c.score, Restaurant.id]
+    else:
+        query = query.filter(
+            *_ilike_words([Restaurant.name, Restaurant.suburb, Restaurant.description], text),
+            *_ilike_words([Restaurant.name], name)
+        )
+
+    if suburb:
+        query = query.filter(func.lower(Restaurant.suburb) == suburb.lower())
+
+    if near is not None:
+        # read by the postcode index, sorted by the distance of the postcode
+        query = query.filter(Restaurant.postcode.in_(list(near)))
+        if near:
+            keys = [case(near, value=Restaurant.postcode), Restaurant.id]
+
+    if min_rating is not None:
+        query = query.filter(
+            Restaurant.rating_count > 0,
+            Restaurant.rating_sum >= min_rating * Restaurant.rating_count
+        )
+
+    if open_at is not None:
+        opens, closes = Restaurant.opening_time, Restaurant.closing_time
+        query = query.filter(or_(
+            opens.is_(None),
+            closes.is_(None),
+            and_(opens <= closes, opens <= open_at, closes > open_at),
+            # open past midnight
+            and_(opens > closes, or_(opens <= open_at, closes > open_at)),
+        ))
+
+    return fetch(query.order_by(*keys), keys, page, descending=False)
+
+def search_menu_items(
+    text: Optional[str] = None,
+    name: Optional[str] = None,
+    restaurant_name: Optional[str] = None,
+    suburb: Optional[str] = None,
+    is_available: Optional[bool] = None,
+    page: Optional[PageArgs] = None
+) -> Union[List[MenuItem], Page]:
+    """
+    Search menu items of all restaurants, the words are matched as prefixes.
+
+    :param text: Words in the item name or description (optional)
+    :param name: Words in the item name (optional)
+    :param restaurant_name: Words in the restaurant name (optional)
+    :param suburb: Exact suburb of the restaurant, case insensitive (optional)
+    :param is_available: Availability filter (optional)
+    :param page: Get one Page instead of the full list (optional)
+    :return: Menu items, the most relevant first
+    """
+    query = (
+        MenuItem.query
+        .join(MenuCategory, MenuCategory.id == MenuItem.category_id)
+        .join(Restaurant, Restaurant.id == MenuCategory.restaurant_id)
+        .filter(MenuItem.is_deleted.is_(False))
+    )
+    keys = [MenuItem.id]
+
+    if is_search_index_supported():
+        item_matched = match_subquery('menu_search', [
+            match_expression(text),
+            match_expression(name, 'name'),
+        ], 'menu_match')
+        restaurant_matched = match_subquery('restaurant_search', [
+            match_expression(restaurant_name, 'name'),
+            match_expression(suburb, 'suburb'),
+        ], 'restaurant_match')
+
+        if restaurant_matched is not None:
+            query = query.join(restaurant_matched, restaurant_matched.c.id == Restaurant.id)
+            keys = [restaurant_matched.c.score, MenuItem.id]
+        # the relevance of the item itself goes first
+        if item_matched is not None:
+            query = query.join(item_matched, item_matched.c.id == MenuItem.id)
+            keys = [item_matched.c.score, MenuItem.id]
+    else:
+        query = query.filter(
+            *_ilike_words([MenuItem.name, MenuItem.description], text),
+            *_ilike_words([MenuItem.name], name),
+            *_ilike_words([Restaurant.name], restaurant_name)
+        )
+
+    if suburb:
+        query = query.filter(func.lower(Restaurant.suburb) == suburb.lower())
+    if is_available is not None:
+        query = query.filter(MenuItem.is_available == is_available)
+
+    return fetch(query.order_by(*keys), keys, page, descending=False)
+
+#--------------------------------------------------------#
+#-------------Functions related to Upload Job-------------#
+#--------------------------------------------------------#
+def get_upload_job(job_id: str) -> Optional[UploadJob]:
+    """Get the upload job of the id"""
+    return db.session.get(UploadJob, job_id)
+
+def claim_upload_job(job_id: str) -> bool:
+    """
+    Move the job from PENDING to PROCESSING with one conditional UPDATE,
+    so a job is run once even when several workers try it. The caller commits.
+
+    :return: Whether this caller runs the job
+    """
+    updated = UploadJob.query.filter(
+        UploadJob.id == job_id,
+        UploadJob.status == UploadJobStatus.PENDING
+    ).update({UploadJob.status: UploadJobStatus.PROCESSING}, synchronize_session=False)
+    return updated == 1
+
+def reclaim_stale_upload_jobs(before: datetime) -> int:
+    """
+    Move the jobs still PROCESSING that were created before `before` back to PENDING:
+    their worker stopped (crash, restart) before finishing them. The caller commits.
+
+    :return: Number of jobs reclaimed
+    """
+    return UploadJob.query.filter(
+        UploadJob.status == UploadJobStatus.PROCESSING,
+        UploadJob.created_at < before
+    ).update({UploadJob.status: UploadJobStatus.PENDING}, synchronize_session=False)
+
+def get_pending_upload_jobs() -> List[UploadJob]:
+    """The jobs still waiting to run, the oldest first"""
+    return UploadJob.query.filter(
+        UploadJob.status == UploadJobStatus.PENDING
+    ).order_by(UploadJob.created_at).all()
+
+#--------------------------------------------------------#
+#-------------Functions related to Dispatch-------------#
+#--------------------------------------------------------#
+# orders a driver is delivering or about to, their load
+DRIVER_ACTIVE_STATUSES = [
+    OrderStatus.RESTAURANT_ACCEPTED, OrderStatus.READY_FOR_PICKUP, OrderStatus.PICKED_UP
+]
+
+def _is_live(now: datetime):
+    """Condition of the offers still open at now"""
+    return and_(
+        DispatchOffer.status == OfferStatus.OFFERED,
+        or_(DispatchOffer.expires_at.is_(None), DispatchOffer.expires_at > now)
+    )
+
+def live_offer_exists(driver_id: int, now: datetime):
+    """Condition of the orders with an open offer to the driver (or to every driver)"""
+    return db.session.query(DispatchOffer.id).filter(
+        DispatchOffer.order_id == Order.id,
+        or_(DispatchOffer.driver_id == driver_id, DispatchOffer.driver_id.is_(None)),
+        _is_live(now)
+    ).exists()
+
+def get_driver_state(driver_id: int) -> Optional[DriverState]:
+    """Get the availability and position of the driver"""
+    return db.session.get(DriverState, driver_id)
+
+def get_driver_states_since(since: datetime) -> List[DriverState]:
+    """The driver states changed since the time (pings saved, status changed)"""
+    return DriverState.query.filter(or_(
+        DriverState.updated_at >= since, DriverState.status_changed_at >= since
+    )).all()
+
+def save_driver_positions(positions: Dict[int, Tuple[float, float, datetime]]) -> None:
+    """
+    Save the latest positions of the drivers (id -> (lat, lon, time)) with one
+    statement per kind: an UPDATE of the known drivers, unless a newer position is
+    saved already, and an INSERT of the others (not available). The caller commits.
+    """
+    if not positions:
+        return
+    table = DriverState.__table__
+    known = {
+        driver_id for (driver_id,) in db.session.query(DriverState.driver_id).filter(
+            DriverState.driver_id.in_(list(positions))
+        )
+    }
+    updates = [
+        {'b_driver_id': driver_id, 'b_lat': lat, 'b_lon': lon, 'b_at': at}
+        for driver_id, (lat, lon, at) in positions.items() if driver_id in known
+    ]
+    if updates:
+        db.session.execute(
+            update(table).where(
+                table.c.driver_id == bindparam('b_driver_id'),
+                or_(table.c.updated_at.is_(None), table.c.updated_at < bindparam('b_at'))
+            ).values(lat=bindparam('b_lat'), lon=bindparam('b_lon'), updated_at=bindparam('b_at')),
+            updates
+        )
+    inserts = [
+        {'driver_id': driver_id, 'available': False, 'lat': lat, 'lon': lon, 'updated_at': at}
+        for driver_id, (lat, lon, at) in positions.items() if driver_id not in known
+    ]
+    if inserts:
+        db.session.execute(insert(table), inserts)
+
+def get_available_drivers(seen_since: datetime) -> List[Tuple[DriverState, Driver]]:
+    """The available drivers with a position updated since seen_since"""
+    return db.session.query(DriverState, Driver).join(
+        Driver, Driver.id == DriverState.driver_id
+    ).filter(
+        DriverState.available.is_(True),
+        DriverState.updated_at >= seen_since,
+        DriverState.lat.isnot(None)
+    ).all()
+
+def get_driver_loads(driver_ids: List[int]) -> Dict[int, int]:
+    """driver id -> number of orders the driver has not delivered yet"""
+    if not driver_ids:
+        return {}
+    rows = db.session.query(Order.driver_id, func.count(Order.id)).filter(
+        Order.driver_id.in_(driver_ids),
+        Order.order_status.in_(DRIVER_ACTIVE_STATUSES)
+    ).group_by(Order.driver_id).all()
+    return dict(rows)
+
+def get_orders_to_dispatch(now: datetime) -> List[Tuple[Order, str]]:
+    """
+    (order, restaurant postcode) of the orders waiting for a driver without any
+    open offer, the oldest first
+    """
+    return db.session.query(Order, Restaurant.postcode).join(
+        Restaurant, Restaurant.id == Order.restaurant_id
+    ).filter(
+        Order.driver_id.is_(None),
+        Order.order_status.in_(DRIVER_CLAIMABLE_STATUSES),
+        ~db.session.query(DispatchOffer.id).filter(
+            DispatchOffer.order_id == Order.id, _is_live(now)
+        ).exists()
+    ).order_by(Order.order_time, Order.id).all()
+
+def get_offer_history(order_ids: List[int]) -> List[Tuple[int, Optional[int], int]]:
+    """(order id, driver id, round) of every offer ever made for the orders"""
+    if not order_ids:
+        return []
+    return db.session.query(
+        DispatchOffer.order_id, DispatchOffer.driver_id, DispatchOffer.round
+    ).filter(DispatchOffer.order_id.in_(order_ids)).all()
+
+def get_live_offer_counts(now: datetime) -> Dict[int, int]:
+    """driver id -> number of open offers to the driver"""
+    rows = db.session.query(DispatchOffer.driver_id, func.count(DispatchOffer.id)).filter(
+        DispatchOffer.status == OfferStatus.OFFERED,
+        DispatchOffer.expires_at > now
+    ).group_by(DispatchOffer.driver_id).all()
+    return dict(rows)
+
+def expire_offers(now: datetime) -> int:
+    """Mark the offers not answered in time EXPIRED, return their number. The caller commits"""
+    return DispatchOffer.query.filter(
+        DispatchOffer.status == OfferStatus.OFFERED,
+        DispatchOffer.expires_at <= now
+    ).update({DispatchOffer.status: OfferStatus.EXPIRED}, synchronize_session=False)
+
+def get_live_offers_of_driver(driver_id: int, now: datetime) -> List[DispatchOffer]:
+    """The open offers to the driver of orders still waiting for a driver, the oldest first"""
+    return DispatchOffer.query.join(Order, Order.id == DispatchOffer.order_id).filter(
+        DispatchOffer.driver_id == driver_id,
+        _is_live(now),
+        Order.driver_id.is_(None),
+        Order.order_status.in_(DRIVER_CLAIMABLE_STATUSES)
+    ).order_by(DispatchOffer.offered_at).all()
+
+def has_live_offer(order_id: int, driver_id: int, now: datetime) -> bool:
+    """Whether the order is offered to the driver (or to every driver) right now"""
+    return db.session.query(
+        Order.query.filter(Order.id == order_id, live_offer_exists(driver_id, now)).exists()
+    ).scalar()
+
+def decline_offer(order_id: int, driver_id: int, now: datetime) -> bool:
+    """
+    Mark the open offer of the order to the driver DECLINED. The caller commits.
+
+    :return: Whether the driver had such an offer
+    """
+    updated = DispatchOffer.query.filter(
+        DispatchOffer.order_id == order_id,
+        DispatchOffer.driver_id == driver_id,
+        _is_live(now)
+    ).update({DispatchOffer.status: OfferStatus.DECLINED}, synchronize_session=False)
+    return updated == 1
+
+def close_offers(order_id: int, driver_id: int) -> None:
+    """The driver took the order: accept their offer, withdraw the others. The caller commits"""
+    open_offers = DispatchOffer.query.filter(
+        DispatchOffer.order_id == order_id,
+        DispatchOffer.status == OfferStatus.OFFERED
+    )
+    open_offers.filter(DispatchOffer.driver_id == driver_id).update(
+        {DispatchOffer.status: OfferStatus.ACCEPTED}, synchronize_session=False
     )
+    open_offers.update({DispatchOffer.status: OfferStatus.WITHDRAWN}, synchronize_session=False)
@@ -0,0 +1,100 @@
+"""Driver State, Dispatch Offer DB"""
+from datetime import datetime
+from typing import Optional, TypedDict
+from db_model.base import BaseModel
+from db_model.db_enum import OfferStatus
+from utils.db import db, enum_type
+
+class DriverStateFormat(TypedDict):
+    """Type for formatted driver state"""
+    driver_id: int
+    available: bool
+    lat: Optional[float]
+    lon: Optional[float]
+    updated_at: Optional[str]
+
+class DispatchOfferFormat(TypedDict):
+    """Type for formatted dispatch offer"""
+    id: int
+    order_id: int
+    round: int
+    distance_km: Optional[float]
+    offered_at: str
+    expires_at: Optional[str]
+
+class DriverState(BaseModel):
+    """
+    Class of Driver State DB, one row per driver who told the dispatch where they are.
+    Only available drivers with a recent position are offered orders. The location
+    pings are saved in batches, see utils/locations.py.
+    """
+    __tablename__ = 'driver_states'
+    driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), primary_key=True)
+    available = db.Column(db.Boolean, nullable=False, default=False)
+    # last known position, and when it was sent
+    lat = db.Column(db.Float, nullable=True)
+    lon = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    # when the availability was last set, it does not make the position any fresher
+    status_changed_at = db.Column(db.DateTime, nullable=True)
+
+    # the dispatch reads the available drivers seen recently,
+    # the workers read the positions and statuses saved by the other workers
+    __table_args__ = (
+        db.Index('ix_driver_states_available', 'available', 'updated_at'),
+        db.Index('ix_driver_states_updated', 'updated_at'),
+        db.Index('ix_driver_states_status_changed', 'status_changed_at'),
+    )
+
+    def format(self) -> DriverStateFormat:
+        """Format the state for its driver"""
+        return {
+            'driver_id': self.driver_id,
+            'available': self.available,
+            'lat': self.lat,
+            'lon': self.lon,
+            'updated_at': self.updated_at.strftime("%Y-%m-%d %H:%M:%S")
+                if self.updated_at else None,
+        }
+
+class DispatchOffer(BaseModel):
+    """
+    Class of Dispatch Offer DB, one row per order offered to a driver.
+    An offer without driver (driver_id None) opens the order to every driver,
+    once the rounds of offers found nobody. See routes/dispatch/services.py.
+    """
+    __tablename__ = 'dispatch_offers'
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    driver_id = db.Column(db.Integer, db.ForeignKey('drivers.id'), nullable=True)
+
+    # 1 for the first drivers offered the order, then one more per widening
+    round = db.Column(db.Integer, nullable=False, default=1)
+    # lower is better, see score_driver
+    score = db.Column(db.Float, nullable=True)
+    distance_km = db.Column(db.Float, nullable=True)
+
+    status = db.Column(enum_type(OfferStatus), nullable=False, default=OfferStatus.OFFERED)
+    offered_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    # None: does not expire (opened to every driver)
+    expires_at = db.Column(db.DateTime, nullable=True)
+
+    # an order is offered once to a driver; offers are read per order, per driver,
+    # and the live ones are expired by time
+    __table_args__ = (
+        db.UniqueConstraint('order_id', 'driver_id', name='uq_dispatch_offers_order_driver'),
+        db.Index('ix_dispatch_offers_driver_status', 'driver_id', 'status', 'expires_at'),
+        db.Index('ix_dispatch_offers_status_expires', 'status', 'expires_at'),
+    )
+
+    def format(self) -> DispatchOfferFormat:
+        """Format the offer for its driver"""
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'round': self.round,
+            'distance_km': round(self.distance_km, 2) if self.distance_km is not None else None,
+            'offered_at': self.offered_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'expires_at': self.expires_at.strftime("%Y-%m-%d %H:%M:%S")
+                if self.expires_at else None,
+        }
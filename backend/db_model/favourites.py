@@ -9,5 +9,7 @@ class Favourites(BaseModel):
     """
     __tablename__ = 'favourites'
     id = db.Column(db.Integer, primary_key=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(
+        db.Integer, db.ForeignKey('customers.id'), nullable=False, index=True
+    )
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurants.id'), nullable=False)
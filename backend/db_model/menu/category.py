@@ -22,9 +22,12 @@ class MenuCategory(BaseModel):
     restaurant_id = db.Column(
         db.Integer,
         db.ForeignKey('restaurants.id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     name = db.Column(db.String(50), nullable=False)
+    # a deleted category still holding items of past orders, hidden from the menu
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
 
     def format(self) -> Optional[CategoryFormat]:
         """
@@ -13,7 +13,8 @@ class MenuItem(BaseModel):
     category_id = db.Column(
         db.Integer,
         db.ForeignKey('menu_categories.id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     # Basic information
     name = db.Column(db.String(50), nullable=False)
@@ -23,3 +24,5 @@ class MenuItem(BaseModel):
 
     # the item may be available or not
     is_available = db.Column(db.Boolean, nullable=False, default=True)
+    # a deleted item of past orders is kept for them, hidden from the menu
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
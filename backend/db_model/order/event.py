@@ -0,0 +1,55 @@
+"""Order Event DB"""
+from datetime import datetime
+from typing import Optional, TypedDict
+from db_model.base import BaseModel
+from db_model.db_enum import OrderStatus
+from utils.db import db, enum_type
+
+class OrderEventFormat(TypedDict):
+    """Type for formatted order event"""
+    id: int
+    order_id: int
+    old_status: Optional[str]
+    new_status: str
+    driver_id: Optional[int]
+    time: str
+
+class OrderEvent(BaseModel):
+    """
+    Class of Order Event DB, one row per change of an order:
+    created (old_status None), status changed, or driver assigned.
+    The id orders the events, streams resume after the last id they sent.
+    """
+    __tablename__ = 'order_events'
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+
+    # who can see the event
+    customer_id = db.Column(db.Integer, nullable=False)
+    restaurant_id = db.Column(db.Integer, nullable=False)
+    driver_id = db.Column(db.Integer, nullable=True)
+    # the order was waiting for a driver, so every driver sees the event
+    in_pool = db.Column(db.Boolean, nullable=False, default=False)
+
+    old_status = db.Column(enum_type(OrderStatus), nullable=True)
+    new_status = db.Column(enum_type(OrderStatus), nullable=False)
+    time = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    # streams catch up on the events of one user, or of the pool, after an id
+    __table_args__ = (
+        db.Index('ix_order_events_customer', 'customer_id', 'id'),
+        db.Index('ix_order_events_restaurant', 'restaurant_id', 'id'),
+        db.Index('ix_order_events_driver', 'driver_id', 'id'),
+        db.Index('ix_order_events_pool', 'in_pool', 'id'),
+    )
+
+    def format(self) -> OrderEventFormat:
+        """Format the event"""
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'old_status': self.old_status.value if self.old_status else None,
+            'new_status': self.new_status.value,
+            'driver_id': self.driver_id,
+            'time': self.time.strftime("%Y-%m-%d %H:%M:%S")
+        }
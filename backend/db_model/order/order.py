@@ -2,7 +2,7 @@
 from datetime import datetime
 from db_model.base import BaseModel
 from db_model.db_enum import OrderStatus, State
-from utils.db import db
+from utils.db import db, enum_type
 
 class Order(BaseModel):
     """
@@ -25,12 +25,12 @@ class Order(BaseModel):
     )
 
     # order stataus
-    order_status = db.Column(db.Enum(OrderStatus), nullable=False, default=OrderStatus.PENDING)
+    order_status = db.Column(enum_type(OrderStatus), nullable=False, default=OrderStatus.PENDING)
 
     # the order should have the delivery address, suburb, state, postcode
     address = db.Column(db.String(255), nullable=False)
     suburb = db.Column(db.String(50), nullable=False)
-    state = db.Column(db.Enum(State), nullable=False, default=State.NSW)
+    state = db.Column(enum_type(State), nullable=False, default=State.NSW)
     postcode = db.Column(db.String(4), nullable=False)
 
     # the order price: order price, delivery fee, total price
@@ -42,6 +42,12 @@ class Order(BaseModel):
     order_time = db.Column(db.DateTime, default=datetime.now)
     pickup_time = db.Column(db.DateTime, nullable=True, default=None)
     delivery_time = db.Column(db.DateTime, nullable=True, default=None)
+    # when the restaurant marked the food ready
+    ready_time = db.Column(db.DateTime, nullable=True, default=None)
+
+    # orders RESTAURANT_ACCEPTED before this one and not ready yet, when it was accepted.
+    # The preparation time depends on it, see utils/prep_time.py
+    kitchen_queue = db.Column(db.Integer, nullable=True, default=None)
 
     # the customer or the restaurant can leave some notes
     customer_notes = db.Column(db.String(255), nullable=True)
@@ -50,6 +56,18 @@ class Order(BaseModel):
     # the customer payment (a fake payment record)
     card_number = db.Column(db.String(16), nullable=False)
 
+    # the orders are listed per restaurant / driver by status, and pages of
+    # orders are read per restaurant / driver / customer by time
+    __table_args__ = (
+        db.Index('ix_orders_restaurant_status', 'restaurant_id', 'order_status'),
+        db.Index('ix_orders_driver_status', 'driver_id', 'order_status'),
+        db.Index('ix_orders_customer_time', 'customer_id', 'order_time'),
+        db.Index('ix_orders_restaurant_time', 'restaurant_id', 'order_time'),
+        db.Index('ix_orders_driver_time', 'driver_id', 'order_time'),
+        # the preparation times are refitted from the recent orders of every restaurant
+        db.Index('ix_orders_time', 'order_time'),
+    )
+
 # each order contains many items, here we define one order to be one restaurant
 class OrderItem(BaseModel):
     """
@@ -60,8 +78,8 @@ class OrderItem(BaseModel):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    menu_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    menu_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False, index=True)
 
     # the item price may be changed, so here needs to save the price when the order is made
     price = db.Column(db.Float, nullable=False)
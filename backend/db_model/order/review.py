@@ -1,5 +1,5 @@
 """Review DB"""
-from typing import Dict, TypedDict
+from typing import Dict, Optional, TypedDict
 from abc import abstractmethod
 from datetime import datetime
 from sqlalchemy import CheckConstraint, UniqueConstraint
@@ -57,12 +57,15 @@ class BaseReview(BaseModel):
 
     __table_args__ = (
         CheckConstraint('rating >= 1 AND rating <= 5', name='check_rating_range'),
-        UniqueConstraint('order_id', 'customer_id', name='unique_order_customer_review'),
     )
 
-    def format(self) -> BaseReviewFormat:
-        '''Format Reveiw into detailed dictionary format without the target info.'''
-        customer: Customer = Customer.query.filter_by(id=self.customer_id).first()
+    def format(self, customer: Optional[Customer] = None) -> BaseReviewFormat:
+        '''
+        Format Reveiw into detailed dictionary format without the target info.
+        The reviewer can be passed in when it is already loaded.
+        '''
+        if customer is None:
+            customer = Customer.query.filter_by(id=self.customer_id).first()
         return {
             'order_id': self.order_id,
             'customer_id': customer.id,
@@ -94,6 +97,12 @@ class DriverReview(BaseReview):
         nullable=False
     )
 
+    # the constraint names are unique in the database (an index on PostgreSQL)
+    __table_args__ = BaseReview.__table_args__ + (
+        UniqueConstraint('order_id', 'customer_id', name='unique_order_customer_driver_review'),
+        db.Index('ix_driver_reviews_driver_updated', 'driver_id', 'updated_at'),
+    )
+
     def format_with_target_profile(self) -> DriverReviewFormat:
         result: DriverReviewFormat = super().format()
         driver: Driver = Driver.query.filter_by(id=self.driver_id).first()
@@ -113,6 +122,13 @@ class RestaurantReview(BaseReview):
         nullable=False
     )
 
+    __table_args__ = BaseReview.__table_args__ + (
+        UniqueConstraint(
+            'order_id', 'customer_id', name='unique_order_customer_restaurant_review'
+        ),
+        db.Index('ix_restaurant_reviews_restaurant_updated', 'restaurant_id', 'updated_at'),
+    )
+
     def format_with_target_profile(self) -> RestaurantReviewFormat:
         result: RestaurantReviewFormat = super().format()
         restaurant: Restaurant = Restaurant.query.filter_by(id=self.restaurant_id).first()
@@ -0,0 +1,23 @@
+"""Prep Time Stat DB"""
+from datetime import datetime
+from db_model.base import BaseModel
+from utils.db import db
+
+class PrepTimeStat(BaseModel):
+    """
+    Class of Prep Time Stat DB: the preparation times (order to ready, in minutes) of the
+    orders of a restaurant placed in one hour of the day, with one kitchen queue bucket.
+    Kept as the running count, mean and sum of squared deviations (Welford's method),
+    so an order is added without reading the others. See utils/prep_time.py.
+    """
+    __tablename__ = 'prep_time_stats'
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurants.id'), primary_key=True)
+    # hour of the order time, 0 - 23
+    hour = db.Column(db.Integer, primary_key=True)
+    # index in QUEUE_BUCKETS of the orders accepted before it and not ready yet
+    queue_bucket = db.Column(db.Integer, primary_key=True)
+
+    samples = db.Column(db.Integer, nullable=False, default=0)
+    mean_minutes = db.Column(db.Float, nullable=False, default=0)
+    m2 = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
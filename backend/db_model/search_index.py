@@ -0,0 +1,106 @@
+"""
+Full-text search index of restaurants and menu items.
+
+On SQLite each searchable table has an FTS5 index table (external content) which is
+kept in sync by triggers, so every write to the table (routes, init_db, scripts)
+updates the index in the same transaction. Other databases fall back to ilike.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Subquery
+from utils.db import db
+from db_model import MenuItem, Restaurant
+
+# index name -> (content table, indexed columns, bm25 weight of each column)
+SEARCH_INDEXES: Dict[str, Tuple[str, List[str], List[float]]] = {
+    'restaurant_search': ('restaurants', ['name', 'suburb', 'description'], [10.0, 5.0, 1.0]),
+    'menu_search': ('menu_items', ['name', 'description'], [10.0, 1.0]),
+}
+
+def is_search_index_supported(bind=None) -> bool:
+    """Whether the database has the FTS5 search index"""
+    bind = bind if bind is not None else db.engine
+    return bind.dialect.name == 'sqlite'
+
+def _index_ddl(index: str) -> List[str]:
+    """Statements creating the index table and its sync triggers"""
+    table, columns, _ = SEARCH_INDEXES[index]
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{col}' for col in columns)
+    old_values = ', '.join(f'old.{col}' for col in columns)
+
+    insert_new = f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new_values});"
+    delete_old = (
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    )
+    return [
+        # prefix indexes make 'piz*' as cheap as a full token lookup
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({cols}, "
+        f"content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} "
+        f"BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+def create_search_index(connection: Connection, index: str) -> None:
+    """Create the index if missing, and rebuild it from the content table"""
+    if not is_search_index_supported(connection):
+        return
+    for statement in _index_ddl(index):
+        connection.execute(text(statement))
+    connection.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+
+def create_search_indexes(connection: Connection) -> None:
+    """Create and rebuild every search index, for an existing database"""
+    for index in SEARCH_INDEXES:
+        create_search_index(connection, index)
+
+def _listen_table_ddl(table, index: str) -> None:
+    """Create / drop the index together with its content table"""
+    def after_create(target, connection, **kwargs): # pylint: disable=unused-argument
+        create_search_index(connection, index)
+
+    def before_drop(target, connection, **kwargs): # pylint: disable=unused-argument
+        if is_search_index_supported(connection):
+            connection.execute(text(f"DROP TABLE IF EXISTS {index}"))
+
+    event.listen(table, 'after_create', after_create)
+    event.listen(table, 'before_drop', before_drop)
+
+_listen_table_ddl(Restaurant.__table__, 'restaurant_search')
+_listen_table_ddl(MenuItem.__table__, 'menu_search')
+
+def match_expression(search_text: Optional[str], column: Optional[str] = None) -> Optional[str]:
+    """
+    FTS5 query matching every word of the text as a prefix, e.g. 'thai cur' -> "thai"* "cur"*.
+    None when the text has no word.
+    """
+    words = re.findall(r'\w+', search_text or '')
+    if not words:
+        return None
+    expression = ' '.join(f'"{word}"*' for word in words)
+    return f'{column} : ({expression})' if column else expression
+
+def match_subquery(index: str, expressions: List[Optional[str]], name: str) -> Optional[Subquery]:
+    """
+    Ids and relevance score (lower is better) of the rows matching all the expressions.
+    None when there is no expression.
+    """
+    expressions = [expression for expression in expressions if expression]
+    if not expressions:
+        return None
+
+    _, _, weights = SEARCH_INDEXES[index]
+    weight_args = ', '.join(str(weight) for weight in weights)
+    statement = text(
+        f"SELECT rowid AS id, bm25({index}, {weight_args}) AS score "
+        f"FROM {index} WHERE {index} MATCH :{name}_match"
+    ).bindparams(**{f'{name}_match': ' AND '.join(f'({e})' for e in expressions)})
+    return statement.columns(id=Integer, score=Float).subquery(name)
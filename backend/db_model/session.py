@@ -0,0 +1,28 @@
+"""Login Session DB"""
+from datetime import datetime
+from utils.db import db, enum_type
+from db_model.base import BaseModel
+from db_model.db_enum import UserType
+
+class UserSession(BaseModel):
+    """
+    Class of Login Session DB.
+    One row per issued token, so a token is resolved with one primary key lookup
+    instead of searching every user table.
+    """
+    __tablename__ = 'sessions'
+
+    token = db.Column(db.String(255), primary_key=True)
+    user_type = db.Column(enum_type(UserType), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_sessions_user', 'user_type', 'user_id'),
+    )
+
+    def is_expired(self) -> bool:
+        """Whether this session is no longer valid"""
+        return self.expires_at <= datetime.now()
@@ -0,0 +1,45 @@
+"""Upload Job DB"""
+from datetime import datetime
+from typing import Optional, TypedDict
+from db_model.base import BaseModel
+from db_model.db_enum import UploadJobStatus, UploadKind
+from utils.db import db, enum_type
+
+class UploadJobFormat(TypedDict):
+    """Type for formatted upload job"""
+    id: str
+    status: str
+    url: str
+    error: Optional[str]
+
+class UploadJob(BaseModel):
+    """
+    Class of Upload Job DB, one row per file received and not processed yet.
+    The request stores the file in the incoming folder and returns its final url;
+    the job checks it, moves it to the url and creates its copies (see utils/upload_jobs.py).
+    """
+    __tablename__ = 'upload_jobs'
+    # uuid hex, also the name of the file
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(enum_type(UploadKind), nullable=False)
+    staged_path = db.Column(db.String(255), nullable=False)
+    url = db.Column(db.String(255), nullable=False)
+
+    status = db.Column(enum_type(UploadJobStatus), nullable=False, default=UploadJobStatus.PENDING)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # the jobs left pending (e.g. by a restart) are run again, the oldest first
+    __table_args__ = (
+        db.Index('ix_upload_jobs_status_created', 'status', 'created_at'),
+    )
+
+    def format(self) -> UploadJobFormat:
+        """Format the job for its owner"""
+        return {
+            'id': self.id,
+            'status': self.status.value,
+            'url': self.url,
+            'error': self.error,
+        }
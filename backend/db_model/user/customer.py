@@ -1,7 +1,7 @@
 """Customer DB"""
 from datetime import datetime
 from db_model.db_enum import State
-from utils.db import db
+from utils.db import db, enum_type
 from .user import User
 
 class Customer(User):
@@ -23,7 +23,7 @@ class Customer(User):
     # Address: address, suburb, state, postcode
     address = db.Column(db.String(255), nullable=False)
     suburb = db.Column(db.String(50), nullable=False)
-    state = db.Column(db.Enum(State), nullable=False, default=State.NSW)
+    state = db.Column(enum_type(State), nullable=False, default=State.NSW)
     postcode = db.Column(db.String(4), nullable=False)
 
     # Customer Profile Image URL
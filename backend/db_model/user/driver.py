@@ -1,10 +1,10 @@
 """Driver DB"""
 from datetime import datetime
 from db_model.db_enum import RegistrationStatus
-from utils.db import db
-from .user import User
+from utils.db import db, enum_type
+from .user import User, RatedMixin
 
-class Driver(User):
+class Driver(User, RatedMixin):
     """
     Class for Driver DB.
     """
@@ -30,9 +30,10 @@ class Driver(User):
 
     # during registration, the driver application has the status
     registration_status = db.Column(
-        db.Enum(RegistrationStatus),
+        enum_type(RegistrationStatus),
         nullable=False,
-        default=RegistrationStatus.PENDING
+        default=RegistrationStatus.PENDING,
+        index=True
     )
     # the driver can have a profile
     url_profile_image = db.Column(db.String(255), nullable=False, default="uploads/driver.png")
@@ -54,4 +55,6 @@ class Driver(User):
             "url_profile_image": self.url_profile_image,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
             "role": self.role,
+            "avg_rating": self.get_avg_rating(),
+            "n_reviews": self.rating_count,
         }
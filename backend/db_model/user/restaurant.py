@@ -1,10 +1,10 @@
 """Restaurant DB"""
 from datetime import datetime
 from db_model.db_enum import RegistrationStatus, State
-from utils.db import db
-from .user import User
+from utils.db import db, enum_type
+from .user import User, RatedMixin
 
-class Restaurant(User):
+class Restaurant(User, RatedMixin):
     """
     Class for Restaurant DB.
     """
@@ -21,20 +21,27 @@ class Restaurant(User):
     # Address
     address = db.Column(db.String(255), nullable=False)
     suburb = db.Column(db.String(50), nullable=False)
-    state = db.Column(db.Enum(State), nullable=False, default=State.NSW)
-    postcode = db.Column(db.String(4), nullable=False)
+    state = db.Column(enum_type(State), nullable=False, default=State.NSW)
+    # restaurants near a customer are looked up by postcode, see search_restaurants
+    postcode = db.Column(db.String(4), nullable=False, index=True)
 
     # shop description
     description = db.Column(db.String(255), nullable=False)
 
+    # opening hours, None when not given (always open).
+    # A closing time before the opening time is past midnight
+    opening_time = db.Column(db.Time, nullable=True)
+    closing_time = db.Column(db.Time, nullable=True)
+
     # the restaurant should have ABN, ABN is 11 digits
-    abn = db.Column(db.String(11), nullable=False)
+    abn = db.Column(db.String(11), nullable=False, index=True)
 
     # during registration, the restaurant application has the status
     registration_status = db.Column(
-        db.Enum(RegistrationStatus),
+        enum_type(RegistrationStatus),
         nullable=False,
-        default=RegistrationStatus.PENDING
+        default=RegistrationStatus.PENDING,
+        index=True
     )
 
     # Restaurant can have profile and additional 3 images
@@ -43,6 +50,9 @@ class Restaurant(User):
     url_img2 = db.Column(db.String(255), nullable=False)
     url_img3 = db.Column(db.String(255), nullable=False)
 
+    # increased on every change of the menu, so the cached full menu can be reused
+    menu_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     token = db.Column(db.String(255), nullable=True, default=None)
     role = db.Column(db.String, default="restaurant")
@@ -60,10 +70,14 @@ class Restaurant(User):
             "state": self.state.value,
             "postcode": self.postcode,
             "description": self.description,
+            "opening_time": self.opening_time.strftime("%H:%M") if self.opening_time else None,
+            "closing_time": self.closing_time.strftime("%H:%M") if self.closing_time else None,
             "url_profile_image": self.url_profile_image,
             "url_img1": self.url_img1,
             "url_img2": self.url_img2,
             "url_img3": self.url_img3,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
             "role": self.role,
+            "avg_rating": self.get_avg_rating(),
+            "n_reviews": self.rating_count,
         }
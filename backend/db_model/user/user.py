@@ -1,6 +1,7 @@
 """Base User Model"""
 from abc import abstractmethod
 from typing import Dict
+from utils.db import db
 from db_model.base import BaseModel
 
 class User(BaseModel):
@@ -17,3 +18,17 @@ class User(BaseModel):
         Get the profile information without sensitive information.
         JSON-Serialisable
         """
+
+class RatedMixin:
+    """
+    Rating totals of a user that can be reviewed (restaurant, driver).
+    Kept up to date by the review APIs, so the average needs no review query.
+    """
+    rating_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def get_avg_rating(self) -> float:
+        """Average rating, 0 when there is no review"""
+        if not self.rating_count:
+            return 0
+        return self.rating_sum / self.rating_count
@@ -0,0 +1,2 @@
+-- run once by the postgres image on a new volume: the database of the tests
+CREATE DATABASE delivery_test OWNER delivery;
@@ -0,0 +1,31 @@
+"""
+gunicorn settings of the production server (see wsgi.py), overridden by environment variables:
+- GUNICORN_WORKERS: worker processes, default 2 per CPU + 1
+- GUNICORN_THREADS: threads per worker, default 8
+- GUNICORN_TIMEOUT: seconds before a silent worker is restarted, default 60
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:11000')
+
+# a worker per CPU runs the python code in parallel, its threads wait on the
+# database, the uploads and the clients. Each open chat / order event stream
+# keeps one thread, so the threads also bound the open streams per worker.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# read by settings.py in the workers, which size their caches by it
+os.environ['GUNICORN_WORKERS'] = str(workers)
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+
+# a gthread worker is only restarted when it hangs, not for a long request
+# (an event stream, a slow upload)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# each worker creates its app after the fork, nothing is shared between workers
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
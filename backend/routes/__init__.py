@@ -15,6 +15,9 @@ from routes.profile.routes import api as profile_api
 from routes.chat.routes import api as chat_api
 from routes.report.routes import api as report_api
 from routes.review.routes import api as review_api
+from routes.order_event.routes import api as order_event_api
+from routes.upload.routes import api as upload_api
+from routes.dispatch.routes import api as dispatch_api
 
 api = Api(
     version = "1.0",
@@ -38,3 +41,6 @@ api.add_namespace(profile_api)
 api.add_namespace(chat_api)
 api.add_namespace(report_api)
 api.add_namespace(review_api)
+api.add_namespace(order_event_api)
+api.add_namespace(upload_api)
+api.add_namespace(dispatch_api)
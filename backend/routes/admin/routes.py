@@ -11,6 +11,7 @@ from db_model import Admin
 from db_model.db_enum import RegistrationStatus
 from db_model.db_query import (
     get_admin_by_token,
+    invalidate_user_sessions,
     filter_admins,
     filter_drivers,
     filter_restaurants,
@@ -66,7 +67,8 @@ class AdminUpdate(Resource):
     def put(self):
         """ Admin can update his first_name, last_name, email, password, profile image """
 
-        admin = get_admin_by_token(tokenize(request.headers))
+        token = tokenize(request.headers)
+        admin = get_admin_by_token(token)
         if not admin:
             return res_error(401)
 
@@ -83,6 +85,8 @@ class AdminUpdate(Resource):
             if not is_password_okay:
                 return res_error(400, description)
             admin.password = args["password"]
+            # log out every other device
+            invalidate_user_sessions(admin, keep_token=token)
 
         if args.get('first_name'):
             admin.first_name = args['first_name']
@@ -1,10 +1,10 @@
 from flask_restx import Namespace, Resource, fields
 from flask import request, abort
-import secrets
 
 from utils.db import db 
 from utils.header import auth_header
 from db_model import *
+from db_model.db_query import get_user_by_token, create_session, invalidate_session
 
 api = Namespace('auth', description='Authentication related operations. Common for all types of users')
 
@@ -25,13 +25,9 @@ user_type_model = {
 }
 
 # authenticate the user with the token.
-# so the token will be checked in 4 tables
+# the token is resolved through the session table (and its cache)
 def authenticate_user(token):
-    for user in [Customer, Driver, Restaurant, Admin]:
-        user = user.query.filter_by(token=token).first()
-        if user:
-            return user
-    return None
+    return get_user_by_token(token)
 
 @api.route('/login')
 class Login(Resource):
@@ -59,13 +55,31 @@ class Login(Resource):
         if not user:
             abort(401, 'Invalid credentials')
         
-        # screate the token
-        token = secrets.token_urlsafe(16)
-        user.token = token
+        # create the token, stored in the session table
+        create_session(user)
         db.session.commit()
 
         return user.dict(), 200
 
+@api.route('/logout')
+class Logout(Resource):
+    @api.expect(auth_header)
+    def post(self):
+        """Logout, the token can no longer be used"""
+
+        token = auth_header.parse_args()['Authorization']
+        user = authenticate_user(token)
+
+        if not user:
+            abort(401, 'Unauthorized')
+
+        invalidate_session(token)
+        if user.token == token:
+            user.token = None
+        db.session.commit()
+
+        return {'message': 'Logged out'}, 200
+
 # as long as the token is valid, any user can obtain any user's profile
 # require the user_type = customer, driver, restaurant, admin
 # and the user_id
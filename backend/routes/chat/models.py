@@ -1,5 +1,5 @@
 """Flask-Restx Models for Chat APIs"""
-from flask_restx import Namespace, fields
+from flask_restx import Namespace, fields, reqparse
 
 api = Namespace('chat', description='APIs for Chat Messages')
 
@@ -14,6 +14,7 @@ send_message_req = api.model('Send Message Request', {
 })
 
 chat_model = api.model('Chat Log Model', {
+    'id': fields.Integer(description='Chat ID, pass as `since` to get the newer chats'),
     'message_type': fields.String(
         description='sent/received', example='sent OR received'
     ),
@@ -30,6 +31,24 @@ chat_user_model = api.model('Chat Opposite User Model', {
 get_all_chat_res = api.model('Get All Chat Log Model', {
     "user": fields.Nested(chat_user_model),
     "chats": fields.List(fields.Nested(chat_model)),
+    "next_cursor": fields.String(
+        description='Only when after / limit is given. Pass as `after` to get the older chats'
+    ),
 })
 
 get_all_chats_from_all_users_res = fields.List(fields.Nested(get_all_chat_res))
+
+inbox_model = api.model('Chat Inbox Model', {
+    "user": fields.Nested(chat_user_model),
+    "last_chat": fields.Nested(chat_model),
+    "unread": fields.Integer(description='Number of chats not read yet', example=2),
+})
+
+inbox_res = fields.List(fields.Nested(inbox_model))
+
+"""Only the Chats After a Chat"""
+since_parser = reqparse.RequestParser()
+since_parser.add_argument(
+    'since', type=int, location='args', required=False,
+    help='id of the last chat the client has, only the newer chats are returned'
+)
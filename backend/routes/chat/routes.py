@@ -1,33 +1,47 @@
 """APIs for Chat system"""
 from flask_restx import Resource
-from flask import request
+from flask import current_app, request
 
 from utils.db import db
 from utils.header import auth_header, tokenize
 from utils.response import res_error
+from utils.pagination import pagination_parser, get_page_args, page_response, Page
+from utils.event_hub import get_resume_id, stream_parser, stream_response
 from db_model import Chat
 from db_model.db_query import (
     get_user_by_token,
     get_user_by_type_and_id,
     get_chats_between_users,
-    get_chats_by_user
+    get_chats_by_user,
+    get_chat_users,
+    get_conversations_of_user,
+    get_last_chat_id
 )
 from routes.chat.models import (
     api,
     message_res,
     send_message_req,
     get_all_chat_res,
-    get_all_chats_from_all_users_res
+    get_all_chats_from_all_users_res,
+    inbox_res,
+    since_parser
+)
+from routes.chat.services import (
+    can_this_user_chat,
+    chat_hub,
+    chat_stream,
+    mark_conversation_read,
+    publish_chat,
+    update_conversation
 )
-from routes.chat.services import can_this_user_chat
 
 @api.route('/get/all')
 class GetAllChat(Resource):
     """Route: /get/all"""
-    @api.expect(auth_header)
+    @api.expect(auth_header, since_parser)
     @api.response(200, 'Success', get_all_chats_from_all_users_res)
     def get(self):
-        """Get all user's chat log"""
+        """Get all user's chat log, or only the chats after `since`"""
         # Get Myself from Token
         me = get_user_by_token(tokenize(request.headers))
         if not me:
@@ -41,16 +55,19 @@ class GetAllChat(Resource):
         # Find all chats for me
         chat_groups = get_chats_by_user(
             user_type = my_type,
-            user_id = me.id
+            user_id = me.id,
+            since = since_parser.parse_args()['since']
         )
 
         # return a list of {user, chats}
         chat_logs = []
 
+        # get the other users with one query per user type
+        others = get_chat_users(list(chat_groups.keys()))
+
         for (other_type, other_id), chats in chat_groups.items():
             # get the other user profile
-            other = get_user_by_type_and_id(other_type.name, other_id)
-            other_profile = other.get_profile()
+            other_profile = others[(other_type, other_id)].get_profile()
 
             # get the chats between them
             chats = [chat.format_chat(me) for chat in chats]
@@ -66,6 +83,80 @@ class GetAllChat(Resource):
         return chat_logs, 200
 
 
+@api.route('/inbox')
+class ChatInbox(Resource):
+    """Route: /inbox"""
+    @api.expect(auth_header, pagination_parser)
+    @api.response(200, 'Success', inbox_res)
+    @api.response(401, "Unauthorised", message_res)
+    def get(self):
+        """
+        Get my conversations, newest chat first: the other user, the last chat and
+        the number of unread chats. Use /get/... with `since` to load the new chats.
+        """
+        me = get_user_by_token(tokenize(request.headers))
+        if not me:
+            return res_error(401)
+        my_type = can_this_user_chat(me)
+
+        # Check that the chat is supported for my type
+        if not my_type:
+            return res_error(400, 'Does not support chat')
+
+        page = get_page_args(pagination_parser.parse_args())
+        conversations = get_conversations_of_user(my_type, me.id, page)
+
+        def format_inbox(conversations):
+            others = get_chat_users([
+                conversation.other_user(my_type, me.id) for conversation in conversations
+            ])
+            return [{
+                "user": others[conversation.other_user(my_type, me.id)].get_profile(),
+                "last_chat": conversation.format_last_chat(me),
+                "unread": conversation.unread_of(my_type, me.id),
+            } for conversation in conversations]
+
+        return page_response(conversations, format_inbox), 200
+
+
+@api.route('/stream')
+class ChatStream(Resource):
+    """Route: /stream"""
+    @api.expect(stream_parser)
+    @api.response(200, 'text/event-stream of `chat` events, the event id is the chat id')
+    @api.response(401, "Unauthorised", message_res)
+    def get(self):
+        """
+        Server-Sent Events stream of the chats sent and received by myself.
+        Reconnects resume after the Last-Event-ID header (or `since`), so no chat is missed.
+        The token may be given as `token` since EventSource cannot set headers.
+        """
+        args = stream_parser.parse_args()
+        me = get_user_by_token(tokenize(request.headers) or args['token'])
+        if not me:
+            return res_error(401)
+        my_type = can_this_user_chat(me)
+
+        # Check that the chat is supported for my type
+        if not my_type:
+            return res_error(400, 'Does not support chat')
+
+        try:
+            since = get_resume_id(request.headers, args['since'])
+        except ValueError as e:
+            return res_error(400, str(e))
+        if since is None:
+            # only the new chats, read before subscribing so none is skipped
+            since = get_last_chat_id()
+
+        # subscribe now, so no chat sent before the first read is missed
+        subscription = chat_hub.subscribe((my_type, me.id))
+        return stream_response(
+            chat_stream(current_app._get_current_object(), subscription, me, since),
+            subscription
+        )
+
+
 @api.route('/get/<string:user_type>/<int:user_id>')
 @api.doc(params={
     'user_type': {
@@ -77,10 +168,10 @@ class GetAllChat(Resource):
 })
 class GetChatWith(Resource):
     """Route: /get/<string:user_type>/<int:user_id>"""
-    @api.expect(auth_header)
+    @api.expect(auth_header, pagination_parser, since_parser)
     @api.response(200, 'Success', get_all_chat_res)
     def get(self, user_type: str, user_id: int):
-        """Get the chat of myself with the given user"""
+        """Get the chat of myself with the given user, or only the chats after `since`"""
         # Get Myself from Token
         me = get_user_by_token(tokenize(request.headers))
         if not me:
@@ -101,21 +192,34 @@ class GetChatWith(Resource):
             return res_error(400, 'Does not support chat')
 
         # Get all chat messages between two
+        # a page holds the newest messages, next_cursor leads to the older ones
+        page = get_page_args(pagination_parser.parse_args())
+        since = since_parser.parse_args()['since']
         chats = get_chats_between_users(
             user1_type = other_type,
             user1_id = other_user.id,
             user2_type = my_type,
-            user2_id = me.id
+            user2_id = me.id,
+            page = page,
+            since = since
         )
 
+        # I have read the conversation, up to the newest chat sent
+        items = chats.items if isinstance(chats, Page) else chats
+        last_seen_id = max([chat.id for chat in items], default=since or 0)
+        mark_conversation_read(me, other_type, other_user.id, last_seen_id)
+        db.session.commit()
+
         # the other user's profile
         other_user_profile = other_user.get_profile()
         
-        # return a dictionary {user, chats}
-        response = {
-            "user": other_user_profile,
-            "chats": [chat.format_chat(me) for chat in chats]
-        }
+        # return a dictionary {user, chats}, the chats are always in time order
+        response = {"user": other_user_profile}
+        if isinstance(chats, Page):
+            response["chats"] = [chat.format_chat(me) for chat in reversed(chats.items)]
+            response["next_cursor"] = chats.next_cursor
+        else:
+            response["chats"] = [chat.format_chat(me) for chat in chats]
 
         return response, 200
 
@@ -179,7 +283,12 @@ class SendChatFromCustomer(Resource):
         new_chat.to_type = other_user_type
 
         db.session.add(new_chat)
+        db.session.flush()
+        update_conversation(new_chat)
         db.session.commit()
 
+        # push to the open chat streams
+        publish_chat(new_chat, me, other_user)
+
         # return the new customer object
         return { 'message': 'Message Sent' }, 200
@@ -1,10 +1,23 @@
 """General functions for Chat APIs"""
-from typing import Optional, Union, TypedDict
-from db_model import Admin, Customer, Driver, Restaurant
+from typing import Dict, Iterator, List, Optional, Tuple, Union, TypedDict
+from flask import Flask
+from sqlalchemy.exc import IntegrityError
+from utils.db import db
+from utils.event_hub import EventHub, Subscription, event_stream, format_event
+from db_model import Admin, Chat, Conversation, Customer, Driver, Restaurant
 from db_model.db_enum import ChatSupportUserType
+from db_model.db_query import get_chats_of_user_since, reset_conversation_unread
+
+# seconds between two checks of the database while the stream is idle
+CHAT_STREAM_HEARTBEAT = 15
+CHAT_STREAM_RETRY_MS = 3000
+
+# open chat streams of this process, by (ChatSupportUserType, user id)
+chat_hub = EventHub()
 
 class ChatLog(TypedDict):
     """Type for Chat log"""
+    id: int
     message_type: str
     message: str
     time: str
@@ -20,3 +33,123 @@ def can_this_user_chat(
         return ChatSupportUserType(type(user).__name__.upper())
     except ValueError:
         return None
+
+def format_chat_event(chat: Chat, me: Union[Customer, Driver, Restaurant]) -> str:
+    """Format the chat as a Server-Sent Event for the given user, the event id is the chat id"""
+    my_type = ChatSupportUserType(type(me).__name__.upper())
+    if chat.from_type == my_type and chat.from_id == me.id:
+        other_type, other_id = chat.to_type, chat.to_id
+    else:
+        other_type, other_id = chat.from_type, chat.from_id
+
+    return format_event(chat.id, 'chat', {
+        'user': {'role': other_type.value.lower(), 'id': other_id},
+        'chat': chat.format_chat(me)
+    })
+
+def publish_chat(chat: Chat, sender: Union[Customer, Driver, Restaurant],
+                 receiver: Union[Customer, Driver, Restaurant]) -> None:
+    """
+    Wake up the open streams of the receiver, and of the sender (their other open
+    screens), after a new chat is committed. The streams read it from the database.
+    """
+    for user in (receiver, sender):
+        user_type = ChatSupportUserType(type(user).__name__.upper())
+        chat_hub.publish((user_type, user.id), chat.id)
+
+def chat_stream(
+    app: Flask,
+    subscription: Subscription,
+    me: Union[Customer, Driver, Restaurant],
+    since: int
+) -> Iterator[str]:
+    """
+    Server-Sent Events of the chats of the user, starting after the chat of id `since`.
+    The database is used in a short app context each time, so the stream does not
+    hold a connection while idle.
+    """
+    my_type = ChatSupportUserType(type(me).__name__.upper())
+
+    def catch_up(last_id: int) -> List[Tuple[int, str]]:
+        with app.app_context():
+            chats = get_chats_of_user_since(my_type, me.id, last_id)
+            return [(chat.id, format_chat_event(chat, me)) for chat in chats]
+
+    return event_stream(
+        subscription, catch_up, since, CHAT_STREAM_HEARTBEAT, CHAT_STREAM_RETRY_MS
+    )
+
+def update_conversation(chat: Chat) -> None:
+    """
+    Put the new chat (flushed, so it has its id) in the summary of its conversation,
+    and count it as unread by the receiver. The caller commits.
+    """
+    user1_type, user1_id, user2_type, user2_id = Conversation.order_users(
+        chat.from_type, chat.from_id, chat.to_type, chat.to_id
+    )
+    from_user1 = chat.from_type == user1_type and chat.from_id == user1_id
+    unread = Conversation.user2_unread if from_user1 else Conversation.user1_unread
+    pair = Conversation.query.filter_by(
+        user1_type=user1_type, user1_id=user1_id, user2_type=user2_type, user2_id=user2_id
+    )
+
+    def update() -> int:
+        # increment in SQL so concurrent chats are all counted
+        return pair.update({
+            Conversation.last_chat_id: chat.id,
+            Conversation.last_message: chat.message,
+            Conversation.last_time: chat.time,
+            Conversation.last_from_user1: from_user1,
+            unread: unread + 1,
+        }, synchronize_session=False)
+
+    if update():
+        return
+    try:
+        # first chat of the pair
+        with db.session.begin_nested():
+            db.session.add(Conversation(
+                user1_type=user1_type, user1_id=user1_id,
+                user2_type=user2_type, user2_id=user2_id,
+                last_chat_id=chat.id, last_message=chat.message, last_time=chat.time,
+                last_from_user1=from_user1,
+                user1_unread=0 if from_user1 else 1,
+                user2_unread=1 if from_user1 else 0,
+            ))
+    except IntegrityError:
+        # created by a concurrent first chat
+        update()
+
+def mark_conversation_read(
+    me: Union[Customer, Driver, Restaurant],
+    other_type: ChatSupportUserType,
+    other_id: int,
+    last_seen_id: int
+) -> None:
+    """
+    Reset the unread count of the user in the conversation, if the user was sent its
+    last chat (last_seen_id is the newest chat sent). The caller commits.
+    """
+    my_type = ChatSupportUserType(type(me).__name__.upper())
+    reset_conversation_unread(my_type, me.id, other_type, other_id, last_seen_id)
+
+def rebuild_conversations() -> int:
+    """
+    Recompute every conversation summary from the chats, for an existing database.
+    Older chats are counted as read. Return the number of conversations.
+    """
+    Conversation.query.delete()
+    last_chats: Dict[tuple, Chat] = {}
+    for chat in Chat.query.order_by(Chat.id.asc()).all():
+        key = Conversation.order_users(chat.from_type, chat.from_id, chat.to_type, chat.to_id)
+        last_chats[key] = chat
+
+    for (user1_type, user1_id, user2_type, user2_id), chat in last_chats.items():
+        db.session.add(Conversation(
+            user1_type=user1_type, user1_id=user1_id,
+            user2_type=user2_type, user2_id=user2_id,
+            last_chat_id=chat.id, last_message=chat.message, last_time=chat.time,
+            last_from_user1=chat.from_type == user1_type and chat.from_id == user1_id,
+        ))
+    db.session.commit()
+    return len(last_chats)
@@ -1,6 +1,7 @@
 """Flask-restx model for Customer API"""
 from flask_restx import Namespace, fields, reqparse
 from werkzeug.datastructures import FileStorage
+from utils.pagination import page_model
 
 api = Namespace('customer', description='APIs for Customer')
 
@@ -46,6 +47,9 @@ favourite_model = api.model('Single favourite model', {
     'restaurant_id': fields.Integer(description="Restaurant ID", default="1"),
 })
 
+# Page of favourites, see utils/pagination.py
+favourites_page_res = page_model(api, 'Favourites Page', favourite_model)
+
 # Request for updating (addition/deletion) favourites
 update_favourites_req = api.model('Customer Updating Favourites', {
     'restaurant_id': fields.Integer(required=True, description="Restaurant ID", default="1"),
@@ -1,5 +1,4 @@
 """Customer API Routes"""
-import secrets
 from flask_restx import Resource
 from flask import request
 
@@ -13,8 +12,11 @@ from utils.check import (
 )
 from utils.header import auth_header, tokenize
 from utils.response import res_error
+from utils.pagination import pagination_parser, get_page_args, page_response
 from db_model import Customer, Favourites
 from db_model.db_query import (
+    create_session,
+    invalidate_user_sessions,
     filter_customers,
     get_customer_by_token,
     filter_favourites,
@@ -28,7 +30,7 @@ from routes.customer.models import (
     message_res,
     update_profile_req_parser,
     update_favourites_req,
-    favourite_model
+    favourites_page_res
 )
 
 @api.route('/register')
@@ -73,11 +75,13 @@ class RegisterCustomer(Resource):
             suburb=data['suburb'],
             state=State(data['state']),
             postcode=data['postcode'],
-            # create the token now
-            token=secrets.token_urlsafe(16)
         )
 
         db.session.add(new_customer)
+        db.session.flush()
+
+        # create the token now
+        create_session(new_customer)
         db.session.commit()
 
         # return the new customer object
@@ -94,7 +98,8 @@ class CustomerUpdate(Resource):
     def put(self):
         """Customer updates his profile, no admin approval needed"""
 
-        customer = get_customer_by_token(tokenize(request.headers))
+        token = tokenize(request.headers)
+        customer = get_customer_by_token(token)
         if not customer:
             return res_error(401)
 
@@ -106,6 +111,8 @@ class CustomerUpdate(Resource):
             if not is_password_okay:
                 return res_error(400, description)
             customer.password = args['password']
+            # log out every other device
+            invalidate_user_sessions(customer, keep_token=token)
 
         if args['username'] and args['username'] != customer.username:
             # the username must be unique
@@ -160,9 +167,8 @@ class CustomerUpdate(Resource):
 @api.route('/favourites')
 class GetFavourites(Resource):
     """Route: /favourites"""
-    @api.expect(auth_header)
-    @api.marshal_list_with(favourite_model)
-    @api.response(200, "Success")
+    @api.expect(auth_header, pagination_parser)
+    @api.response(200, "Success. A page envelope when after / limit is given", favourites_page_res)
     @api.response(400, "Bad Request", message_res)
     @api.response(401, "Unauthorised", message_res)
     def get(self):
@@ -171,9 +177,9 @@ class GetFavourites(Resource):
         if not customer:
             return res_error(401)
 
-        favourites = filter_favourites(customer_id = customer.id)
-        print(favourites)
-        return [favourite for favourite in favourites], 200
+        page = get_page_args(pagination_parser.parse_args())
+        favourites = filter_favourites(customer_id = customer.id, page = page)
+        return page_response(favourites, lambda rows: [f.dict() for f in rows]), 200
 
 @api.route('/favourite')
 class AddFavourite(Resource):
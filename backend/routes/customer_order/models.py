@@ -1,5 +1,6 @@
 """Flask-restx model for Customer-Order APIs"""
-from flask_restx import Namespace, fields
+from flask_restx import Namespace, fields, reqparse
+from utils.pagination import page_model
 
 api = Namespace('customer-order', description='APIs for Customer')
 
@@ -33,6 +34,16 @@ cart_item_update_res = api.model("Cart Item Update Response Model", {
     )
 })
 
+"""Response/Request for customer cart batch update"""
+cart_batch_update_req = api.model('Cart Batch Update Request Model', {
+    'items': fields.List(fields.Nested(cart_item_update_req), required=True)
+})
+
+cart_batch_update_res = api.model("Cart Batch Update Response Model", {
+    "message": fields.String(example="Cart Updated"),
+    "cart": fields.List(fields.Raw(), description="The cart grouped by restaurant, as /cart/v2")
+})
+
 """Response/Request for customer viewing order"""
 get_order_res = api.model("Get Order Response", {
     "id": fields.Integer(),
@@ -65,9 +76,12 @@ post_order_req = api.model("Order From Cart Request", {
     'postcode': fields.String(required=True),
     'customer_notes': fields.String(required=True, default='2000'),
     'card_number': fields.String(required=True),
-    'order_price': fields.Float(required=True),
-    'delivery_fee': fields.Float(required=True),
-    'total_price': fields.Float(required=True),
+    'order_price': fields.Float(description='Ignored, computed from the menu prices'),
+    'delivery_fee': fields.Float(description='Ignored, set by the distance to the postcode'),
+    'total_price': fields.Float(description='Ignored, order_price + delivery_fee'),
+    'quote_id': fields.String(
+        description='quote_id of GET /quote, the quoted prices and delivery fee are charged'
+    ),
 })
 post_order_res = api.model("Order From Cart Response", {
     "id": fields.Integer(),
@@ -89,3 +103,34 @@ post_order_res = api.model("Order From Cart Response", {
     "restaurant_notes": fields.String(),
     "card_number": fields.String()
 })
+
+"""Request/Response for the quote of the cart of a restaurant"""
+quote_req_parser = reqparse.RequestParser()
+quote_req_parser.add_argument('restaurant_id', type=int, location='args', required=True)
+quote_req_parser.add_argument(
+    'postcode', type=str, location='args', required=True, help='Postcode of the delivery address'
+)
+quote_item_model = api.model("Quoted Item", {
+    'menu_id': fields.Integer(),
+    'menu_name': fields.String(),
+    'price': fields.Float(),
+    'quantity': fields.Integer(),
+    'total_price': fields.Float(),
+})
+quote_res = api.model("Quote Response", {
+    'quote_id': fields.String(
+        description='Send with POST /order to be charged this quote, null if quotes are disabled'
+    ),
+    'restaurant_id': fields.Integer(),
+    'postcode': fields.String(),
+    'items': fields.List(fields.Nested(quote_item_model)),
+    'order_price': fields.Float(),
+    'distance_km': fields.Float(description='Between the postcode centres, null if unknown'),
+    'delivery_fee': fields.Float(),
+    'total_price': fields.Float(),
+    'eta_minutes': fields.Integer(description='Minutes from the order to its delivery'),
+    'expires_at': fields.String(description='Redeem the quote before this time'),
+})
+
+# Page of detailed orders, see utils/pagination.py
+orders_page_res = page_model(api, "Detailed Orders Page")
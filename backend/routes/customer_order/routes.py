@@ -5,35 +5,38 @@ from flask import request
 from utils.db import db
 from utils.header import auth_header, tokenize
 from utils.response import res_error
+from utils.pagination import pagination_parser, get_page_args, page_response
 from utils.check import (
     is_valid_card_format,
     is_valid_postcode,
     is_valid_state
 )
-from db_model import CartItem
 from db_model.db_query import (
     get_customer_by_token,
-    filter_cart_items,
     filter_orders,
-    filter_menus,
-    get_order_by_order_id
+    format_orders_with_details,
+    get_cart_lines
 )
 from routes.customer_order.models import (
     api,
     error_res,
     cart_item_model,
     cart_item_update_req, cart_item_update_res,
+    cart_batch_update_req, cart_batch_update_res,
     get_order_res,
     post_order_req, post_order_res,
+    orders_page_res,
+    quote_req_parser, quote_res,
 )
 from routes.customer_order.services import (
-    attach_order_items,
     empty_cart_items_from_restaurant,
-    make_order,
-    format_cart_items,
-    format_cart_items_v2,
-    format_cart_items_with_restaurant_filter
+    get_cart,
+    make_quote,
+    place_order,
+    redeem_quote,
+    update_cart
 )
+from routes.order_event.services import publish_order_event, record_order_event
 
 @api.route('/cart/restaurant/<int:restaurant_id>')
 class ShopItemsWithRestaurant(Resource):
@@ -70,10 +73,8 @@ class ShopItemsV2(Resource):
         if not customer:
             return res_error(401)
 
-        # Get all items in the cart
-        cart_items = filter_cart_items(customer_id = customer.id)
-        items = format_cart_items_v2(cart_items)
-        return items, 200
+        # Get all items in the cart, with one query
+        return get_cart(customer.id, grouped=True), 200
 
 @api.route('/cart')
 class ShopItems(Resource):
@@ -90,10 +91,8 @@ class ShopItems(Resource):
         if not customer:
             return res_error(401)
 
-        # Get all items in the cart
-        cart_items = filter_cart_items(customer_id = customer.id)
-        items = format_cart_items(cart_items)
-        return items, 200
+        # Get all items in the cart, with one query
+        return get_cart(customer.id), 200
 
     @api.expect(auth_header, cart_item_update_req)
     @api.response(200, "Success", cart_item_update_res)
@@ -107,44 +106,36 @@ class ShopItems(Resource):
 
         data = request.json
 
-        menu_items = filter_menus(id = data['menu_id'])
-        if not menu_items:
-            return res_error(400, 'Wrong Item ID')
-        menu_item = menu_items[0]
-
-        if not menu_item.is_available:
-            return res_error(400, 'Item not available')
+        error, messages = update_cart(customer.id, [data])
+        if error:
+            return res_error(400, error)
+        db.session.commit()
 
-        if data['quantity'] < 0:
-            return res_error(400, 'Wrong Item Quantity')
+        return {'message': messages[0]}, 200
 
-        # Check if item already exists
-        cart_items = filter_cart_items(
-            customer_id = customer.id,
-            menu_id = data['menu_id']
-        )
+@api.route('/cart/batch')
+class ShopItemsBatch(Resource):
+    """Route: /cart/batch"""
+    @api.expect(auth_header, cart_batch_update_req)
+    @api.response(200, "Success", cart_batch_update_res)
+    @api.response(400, "Bad Request", error_res)
+    @api.response(401, "Unauthorised", error_res)
+    def put(self):
+        """
+        Apply several cart changes at once, like several PUT /cart. Quantity 0 will remove the item.
+        Nothing is changed when any change is invalid, or when an item is listed twice.
+        Returns the updated cart grouped by restaurant (as /cart/v2), so no reload is needed.
+        """
+        customer = get_customer_by_token(tokenize(request.headers))
+        if not customer:
+            return res_error(401)
 
-        message = ""
-        # If there is no same item, add one
-        if not cart_items:
-            new_cart_item = CartItem(
-                customer_id=customer.id,
-                menu_id=data['menu_id'],
-                quantity=data['quantity']
-            )
-            db.session.add(new_cart_item)
-            message = "Item Added"
-        # If the quantity is 0, delete the item
-        elif data['quantity'] == 0:
-            db.session.delete(cart_items[0])
-            message = "Item Deleted"
-        # Otherwise, update the item
-        else:
-            cart_items[0].quantity = data['quantity']
-            message = "Item Updated"
+        error, _ = update_cart(customer.id, request.json['items'])
+        if error:
+            return res_error(400, error)
         db.session.commit()
 
-        return {'message': message}, 200
+        return {'message': 'Cart Updated', 'cart': get_cart(customer.id, grouped=True)}, 200
 
 @api.route('/orders')
 class GetAllOrders(Resource):
@@ -196,7 +187,10 @@ class OrderItems(Resource):
         """
         Place order for Given Restaurant ID.
         This function also works when there are items from different restaurant.
-        The frontend needs to input the order_price, delivery_fee, and total_price ( = order_price + delivery_fee).
+        The order_price is computed from the menu prices and the delivery_fee from the
+        distance to the postcode; the prices sent by the frontend are ignored.
+        With the quote_id of GET /quote, the quoted prices and delivery fee are charged.
+        The order, its items and the emptied cart are saved in one transaction.
         """
         customer = get_customer_by_token(tokenize(request.headers))
         if not customer:
@@ -204,13 +198,12 @@ class OrderItems(Resource):
 
         data = request.get_json()
 
-        # Get all cart items that belong to this restaurant
-        cart_items = format_cart_items_with_restaurant_filter(
-            cart_items = filter_cart_items(customer_id = customer.id),
-            restaurant_id = data['restaurant_id']
-        )
-        if not cart_items:
+        # Get all cart items that belong to this restaurant, with their menu items
+        cart_lines = get_cart_lines(customer.id, data['restaurant_id'])
+        if not cart_lines:
             return res_error(400, 'Cart Empty')
+        if not all(menu.is_available for _, menu, _, _ in cart_lines):
+            return res_error(400, 'Item not available')
 
         # Check the payload for validity
         if not is_valid_state(data['state']):
@@ -220,37 +213,57 @@ class OrderItems(Resource):
         if not is_valid_card_format(data['card_number']):
             return res_error(400, 'Invalid Card Number')
 
-        # Make new  order with wrong info.
-        new_order = make_order(
-            customer_id=customer.id,
-            data=data,
-        )
-
-        # Push it first
-        db.session.add(new_order)
+        # The quoted prices, else computed by place_order
+        quote = None
+        if data.get('quote_id'):
+            error, quote = redeem_quote(data['quote_id'], customer.id, data, cart_lines)
+            if error:
+                return res_error(400, error)
+
+        # The order, its items, the emptied cart and the order event, committed at once
+        new_order = place_order(customer.id, data, cart_lines, quote)
+        # drivers see it once the restaurant accepts it
+        event = record_order_event(new_order, None, in_pool=False)
         db.session.commit()
+        publish_order_event(event)
 
-        # Make order items. Update order accordingly.
-        new_order_items = attach_order_items(
-            order=new_order,
-            formatted_cart_items=cart_items
-        )
+        return new_order.dict(), 200
 
-        # Push each order item
-        for new_order_item in new_order_items:
-            db.session.add(new_order_item)
-        db.session.commit()
 
-        # Empty the cart
-        empty_cart_items_from_restaurant(customer.id, data['restaurant_id'])
+@api.route('/quote')
+class OrderQuote(Resource):
+    """Route: /quote"""
+    @api.expect(auth_header, quote_req_parser)
+    @api.response(200, 'Success', quote_res)
+    @api.response(400, 'Bad Request', error_res)
+    @api.response(401, 'Unauthorised', error_res)
+    def get(self):
+        """
+        Prices, delivery fee and ETA of the cart of the restaurant delivered to the postcode.
+        The fee is set by the distance, the ETA by the latest orders of the restaurant.
+        Send the quote_id with POST /order to be charged this quote.
+        """
+        customer = get_customer_by_token(tokenize(request.headers))
+        if not customer:
+            return res_error(401)
+
+        args = quote_req_parser.parse_args()
+        if not is_valid_postcode(args['postcode']):
+            return res_error(400, 'Invalid Postcode')
 
-        return new_order.dict(), 200
+        cart_lines = get_cart_lines(customer.id, args['restaurant_id'])
+        if not cart_lines:
+            return res_error(400, 'Cart Empty')
+        if not all(menu.is_available for _, menu, _, _ in cart_lines):
+            return res_error(400, 'Item not available')
 
+        restaurant = cart_lines[0][3]
+        return make_quote(customer.id, restaurant, args['postcode'], cart_lines), 200
 
 @api.route('/')
 class CustomerOrderV2(Resource):
-    @api.expect(auth_header)
-    @api.response(200, 'Success')
+    @api.expect(auth_header, pagination_parser)
+    @api.response(200, 'Success. A page envelope when after / limit is given', orders_page_res)
     @api.response(400, 'Bad Request', error_res)
     @api.response(401, 'Unauthorised', error_res)
     def get(self):
@@ -260,9 +273,9 @@ class CustomerOrderV2(Resource):
         if not customer:
             return res_error(401)
 
-        orders = filter_orders(customer_id=customer.id)
-        results = [get_order_by_order_id(order.id) for order in orders]
-        return results, 200
+        page = get_page_args(pagination_parser.parse_args())
+        orders = filter_orders(customer_id=customer.id, page=page)
+        return page_response(orders, format_orders_with_details), 200
 
 @api.route('/<int:order_id>')
 class CustomerOneOrder(Resource):
@@ -282,5 +295,5 @@ class CustomerOneOrder(Resource):
             return res_error(400, 'Invalid Order ID')
 
         order = orders[0]
-        results = get_order_by_order_id(order.id)
+        results = format_orders_with_details([order])[0]
         return results, 200
\ No newline at end of file
@@ -1,9 +1,25 @@
 """Common functions for customer order goes here."""
-from typing import List, TypedDict, Any
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Dict, List, NamedTuple, Optional, Tuple, TypedDict, Any
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import insert
+from utils.cache import TTLCache
 from utils.db import db
-from db_model import CartItem, Order, OrderItem
+from utils.geo import postcode_distance_km
+from utils.prep_time import estimate_prep_minutes
+from db_model import CartItem, MenuCategory, MenuItem, Order, OrderItem, Restaurant
 from db_model.db_enum import State
-from db_model.db_query import filter_cart_items
+from db_model.db_query import (
+    count_accepted_orders,
+    delete_cart_items,
+    get_cart_lines,
+    get_recent_order_times,
+)
+
+# a cart item with its menu item, category and restaurant, see get_cart_lines
+CartLine = Tuple[CartItem, MenuItem, MenuCategory, Restaurant]
 
 class FormatCartItems(TypedDict):
     """Type for formatted cart item. For API result type annotation."""
@@ -17,41 +33,27 @@ class FormatCartItems(TypedDict):
     total_price: float
     url_img: str
 
-def format_cart_items(cart_items: List[CartItem]) -> List[FormatCartItems]:
-    """Format raw cart item model into more understandable format"""
-    items = []
-    for cart_item in cart_items:
-        cart_format = cart_item.format()
-        if not cart_format:
-            continue
-        menu = cart_format.get('menu')
-        restaurant = cart_format.get('restaurant')
-        quantity = cart_format.get('quantity')
-        items.append({
-            'menu_id': menu.id,
-            'menu_name': menu.name,
-            'restaurant_id': restaurant.id,
-            'restaurant_name': restaurant.name,
-            'description': menu.description,
-            'price': menu.price,
-            'quantity': quantity,
-            'total_price': quantity * menu.price,
-            'url_img': menu.url_img
-        })
+def format_cart_items(cart_lines: List[CartLine]) -> List[FormatCartItems]:
+    """Format the cart lines (see get_cart_lines) into more understandable format"""
+    return [{
+        'menu_id': menu.id,
+        'menu_name': menu.name,
+        'restaurant_id': restaurant.id,
+        'restaurant_name': restaurant.name,
+        'description': menu.description,
+        'price': menu.price,
+        'quantity': cart_item.quantity,
+        'total_price': cart_item.quantity * menu.price,
+        'url_img': menu.url_img
+    } for cart_item, menu, _, restaurant in cart_lines]
 
-    return items
 
-
-def format_cart_items_v2(cart_items: List[CartItem]):
-    """Format raw cart items, group under each restaurant"""
+def format_cart_items_v2(cart_lines: List[CartLine]):
+    """Format the cart lines (see get_cart_lines), group under each restaurant"""
     result_dict = {}
 
     # iterate each cart item, group by restaurant id
-    for item in cart_items:
-        cart_format = item.format()
-        restaurant = cart_format.get('restaurant')
-        menu = cart_format.get('menu')
-
+    for cart_item, menu, _, restaurant in cart_lines:
         # if the restaurant is not in the result_dict, add it
         if restaurant.id not in result_dict:
             result_dict[restaurant.id] = {
@@ -70,14 +72,14 @@ def format_cart_items_v2(cart_items: List[CartItem]):
             }
 
             result_dict[restaurant.id]["address"] = address
-        
+
         # add the menu item to the restaurant
         result_dict[restaurant.id]['items'].append({
             'menu_id': menu.id,
             'menu_name': menu.name,
             'price': menu.price,
-            'quantity': item.quantity,
-            'total_price': item.quantity * menu.price,
+            'quantity': cart_item.quantity,
+            'total_price': cart_item.quantity * menu.price,
             'url_img': menu.url_img
         })
 
@@ -87,45 +89,80 @@ def format_cart_items_v2(cart_items: List[CartItem]):
 
     return result_list
 
+def get_cart(customer_id: int, grouped: bool = False) -> List:
+    """
+    The formatted cart of the customer, read with one query whatever its size.
+    grouped: group the items under each restaurant (format_cart_items_v2)
+    """
+    cart_lines = get_cart_lines(customer_id)
+    return format_cart_items_v2(cart_lines) if grouped else format_cart_items(cart_lines)
 
-def format_cart_items_with_restaurant_filter(
-        cart_items: List[CartItem], restaurant_id: int
-) -> List[FormatCartItems]:
+def update_cart(customer_id: int, updates: List[Dict]) -> Tuple[Optional[str], List[str]]:
     """
-    Format raw cart item model into more understandable format.
-    Filter cart items from given restaurant id
+    Apply the quantity changes [{menu_id, quantity}] to the cart, quantity 0 removes the item.
+    The menu items and the cart items are read with one query each, the caller commits.
+    Return (error message, None if valid) and the message of each change.
+    Nothing is changed when any change is invalid, or when an item is changed twice.
     """
-    items = []
-    for cart_item in cart_items:
-        cart_format = cart_item.format()
-        restaurant = cart_format.get('restaurant')
-        if restaurant.id != restaurant_id:
-            continue
-        menu = cart_format.get('menu')
-        quantity = cart_format.get('quantity')
-        items.append({
-            'menu_id': menu.id,
-            'menu_name': menu.name,
-            'restaurant_id': restaurant.id,
-            'restaurant_name': restaurant.name,
-            'description': menu.description,
-            'price': menu.price,
-            'quantity': quantity,
-            'total_price': quantity * menu.price,
-            'url_img': menu.url_img
-        })
+    menu_ids = [update['menu_id'] for update in updates]
+    if len(set(menu_ids)) != len(menu_ids):
+        return 'Duplicate Item ID', []
+    menu_items = {
+        menu.id: menu for menu in MenuItem.query.filter(
+            MenuItem.id.in_(menu_ids), MenuItem.is_deleted.is_(False)
+        ).all()
+    }
+    for update in updates:
+        menu_item = menu_items.get(update['menu_id'])
+        if not menu_item:
+            return 'Wrong Item ID', []
+        if not menu_item.is_available:
+            return 'Item not available', []
+        if update['quantity'] < 0:
+            return 'Wrong Item Quantity', []
+
+    cart_items = {
+        cart_item.menu_id: cart_item for cart_item in CartItem.query.filter(
+            CartItem.customer_id == customer_id, CartItem.menu_id.in_(menu_ids)
+        ).all()
+    }
 
-    return items
+    messages = []
+    for update in updates:
+        cart_item = cart_items.get(update['menu_id'])
+        # If the quantity is 0, delete the item
+        if update['quantity'] == 0:
+            if cart_item:
+                db.session.delete(cart_item)
+                del cart_items[update['menu_id']]
+            messages.append("Item Deleted")
+        # If there is no same item, add one
+        elif not cart_item:
+            cart_items[update['menu_id']] = CartItem(
+                customer_id=customer_id,
+                menu_id=update['menu_id'],
+                quantity=update['quantity']
+            )
+            db.session.add(cart_items[update['menu_id']])
+            messages.append("Item Added")
+        # Otherwise, update the item
+        else:
+            cart_item.quantity = update['quantity']
+            messages.append("Item Updated")
+    return None, messages
 
 def make_order(
         customer_id: int,
-        data: Any #This will be json data
+        data: Any, #This will be json data
+        order_price: float,
+        delivery_fee: float
 ) -> Order:
     """
     Make Order with limited information.
     Have no order items attached.
+    The total price is computed from the order price (of the menu) and the delivery fee.
     """
-    # Make fake order
+    delivery_fee = round(delivery_fee, 2)
     return Order(
         customer_id = customer_id,
         restaurant_id = data['restaurant_id'],
@@ -133,41 +170,213 @@ def make_order(
         suburb = data['suburb'],
         state = State(data['state']),
         postcode = data['postcode'],
-        order_price = round(data['order_price'], 2),
-        delivery_fee = round(data['delivery_fee'], 2),
-        total_price = round(data['total_price'], 2),
+        order_price = order_price,
+        delivery_fee = delivery_fee,
+        total_price = round(order_price + delivery_fee, 2),
         customer_notes = data['customer_notes'],
         card_number = data['card_number']
     )
 
-def attach_order_items(
-        order: Order,
-        formatted_cart_items: List[FormatCartItems]
-) -> List[OrderItem]:
+def place_order(
+        customer_id: int,
+        data: Any, #This will be json data
+        cart_lines: List[CartLine],
+        quote: Optional[Dict] = None
+) -> Order:
     """
-    Attach order items to given Order.
-    Order will now have updated information.
+    Add the order of the cart lines (of one restaurant) to the session.
+    Nothing is committed here, so the caller commits the order, its items and
+    the emptied cart at once, and a failure leaves no half-written order.
+    - the prices come from the menu and the delivery fee from the distance (see
+      get_delivery_estimate), not from the request
+    - with a redeemed quote (see redeem_quote), the quoted prices and delivery fee
+    - the order items are inserted with one statement
+    - the ordered items are removed from the cart with one statement
     """
-    order_items: List[OrderItem] = []
+    if quote is not None:
+        prices = {menu_id: price for menu_id, _, price in quote['items']}
+        order_price, delivery_fee = quote['order_price'], quote['delivery_fee']
+    else:
+        prices = {menu.id: menu.price for _, menu, _, _ in cart_lines}
+        order_price = round(sum(menu.price * cart_item.quantity for cart_item, menu, _, _ in cart_lines), 2)
+        delivery_fee = get_delivery_estimate(cart_lines[0][3], data['postcode']).delivery_fee
+    order = make_order(customer_id, data, order_price, delivery_fee)
+    db.session.add(order)
+    # get the order id
+    db.session.flush()
 
-    for formatted_cart_item in formatted_cart_items:
-        order_items.append(OrderItem(
-            order_id = order.id,
-            menu_id = formatted_cart_item['menu_id'],
-            price = formatted_cart_item['price'],
-            quantity = formatted_cart_item['quantity'],
-        ))
+    db.session.execute(insert(OrderItem), [{
+        'order_id': order.id,
+        'menu_id': menu.id,
+        'price': prices[menu.id],
+        'quantity': cart_item.quantity,
+    } for cart_item, menu, _, _ in cart_lines])
 
-    return order_items
+    delete_cart_items(customer_id, menu_ids=[menu.id for _, menu, _, _ in cart_lines])
+    return order
 
 def empty_cart_items_from_restaurant(
         customer_id: int,
         restaurant_id: int
     ) -> None:
     """Remove all cart items from customer from given restaurant"""
-    cart_items = filter_cart_items(customer_id = customer_id)
-    for cart_item in cart_items:
-        restaurant = cart_item.format().get('restaurant')
-        if restaurant.id == restaurant_id:
-            db.session.delete(cart_item)
+    delete_cart_items(customer_id, restaurant_id=restaurant_id)
     db.session.commit()
+
+# Quotes: the prices, delivery fee and ETA of the cart of one restaurant, computed by
+# the server before checkout. The quote id signs what was quoted, so POST /order
+# redeems it without computing anything again, as long as the cart did not change.
+
+# delivery fee by distance, the tiers of frontend/utils/fee.js: (up to km, fee)
+DELIVERY_FEE_TIERS = [(5, 5.0), (10, 10.0), (15, 15.0)]
+MAX_DELIVERY_FEE = 20.0
+
+# the delivery minutes per km are learnt from the latest orders of the restaurant
+ETA_HISTORY_DAYS = 14
+ETA_HISTORY_SIZE = 50
+# used before the restaurant has any history
+DEFAULT_PREP_MINUTES = 20.0
+DEFAULT_MINUTES_PER_KM = 3.0
+# deliveries to unknown postcodes are assumed this far
+UNKNOWN_DISTANCE_KM = 15.0
+
+class DeliveryEstimate(NamedTuple):
+    """Delivery from a restaurant to a postcode, the same for every cart"""
+    distance_km: Optional[float]
+    delivery_fee: float
+    eta_minutes: int
+
+# (restaurant_id, postcode) -> DeliveryEstimate
+delivery_estimates = TTLCache(maxsize=4096, ttl=60)
+
+def delivery_fee_for(distance_km: Optional[float]) -> float:
+    """Fee of the distance tier, the highest when the distance is unknown"""
+    if distance_km is None:
+        return MAX_DELIVERY_FEE
+    for max_km, fee in DELIVERY_FEE_TIERS:
+        if distance_km <= max_km:
+            return fee
+    return MAX_DELIVERY_FEE
+
+def estimate_order_minutes(
+    restaurant: Restaurant, now: datetime
+) -> Tuple[float, float]:
+    """
+    (preparation minutes, delivery minutes per km) of an order of the restaurant now.
+    The preparation from the model of the restaurant with its current kitchen queue
+    (utils/prep_time.py), the delivery the median of its latest orders from pickup to
+    delivery over the distance (at least 1 km, the time to park and hand over counts too).
+    """
+    prep = estimate_prep_minutes(restaurant.id, now, count_accepted_orders(restaurant.id))
+    rows = get_recent_order_times(
+        restaurant.id, now - timedelta(days=ETA_HISTORY_DAYS), ETA_HISTORY_SIZE
+    )
+    per_km = []
+    for _, pickup, delivered, postcode in rows:
+        distance_km = postcode_distance_km(restaurant.postcode, postcode)
+        if delivered is not None and distance_km is not None:
+            per_km.append((delivered - pickup).total_seconds() / 60 / max(distance_km, 1))
+
+    return (
+        prep if prep is not None else DEFAULT_PREP_MINUTES,
+        median(per_km) if per_km else DEFAULT_MINUTES_PER_KM,
+    )
+
+def get_delivery_estimate(restaurant: Restaurant, postcode: str) -> DeliveryEstimate:
+    """Distance, fee and ETA of a delivery to the postcode, cached for a minute"""
+    key = (restaurant.id, postcode)
+    estimate = delivery_estimates.get(key)
+    if estimate is None:
+        distance_km = postcode_distance_km(restaurant.postcode, postcode)
+        prep_minutes, minutes_per_km = estimate_order_minutes(restaurant, datetime.now())
+        travel_km = max(distance_km, 1) if distance_km is not None else UNKNOWN_DISTANCE_KM
+        estimate = DeliveryEstimate(
+            distance_km,
+            delivery_fee_for(distance_km),
+            round(prep_minutes + minutes_per_km * travel_km),
+        )
+        delivery_estimates.set(key, estimate)
+    return estimate
+
+def quote_serializer() -> Optional[URLSafeTimedSerializer]:
+    """Signs and checks the quote ids with the SECRET_KEY, None if the quotes are disabled"""
+    secret_key = current_app.config['SECRET_KEY']
+    if not secret_key:
+        return None
+    return URLSafeTimedSerializer(secret_key, salt='order-quote')
+
+def make_quote(
+    customer_id: int, restaurant: Restaurant, postcode: str, cart_lines: List[CartLine]
+) -> Dict:
+    """
+    The quote of the cart lines of the restaurant delivered to the postcode,
+    without quote id if the quotes are disabled (no SECRET_KEY)
+    """
+    estimate = get_delivery_estimate(restaurant, postcode)
+    items = [
+        [menu.id, cart_item.quantity, menu.price] for cart_item, menu, _, _ in cart_lines
+    ]
+    order_price = round(sum(quantity * price for _, quantity, price in items), 2)
+    serializer = quote_serializer()
+    quote_id = serializer and serializer.dumps({
+        'customer_id': customer_id,
+        'restaurant_id': restaurant.id,
+        'postcode': postcode,
+        'items': items,
+        'order_price': order_price,
+        'delivery_fee': estimate.delivery_fee,
+    })
+    return {
+        'quote_id': quote_id,
+        'restaurant_id': restaurant.id,
+        'postcode': postcode,
+        'items': [{
+            'menu_id': menu.id,
+            'menu_name': menu.name,
+            'price': menu.price,
+            'quantity': cart_item.quantity,
+            'total_price': round(cart_item.quantity * menu.price, 2),
+        } for cart_item, menu, _, _ in cart_lines],
+        'order_price': order_price,
+        'distance_km': estimate.distance_km,
+        'delivery_fee': estimate.delivery_fee,
+        'total_price': round(order_price + estimate.delivery_fee, 2),
+        'eta_minutes': estimate.eta_minutes,
+        'expires_at': (
+            datetime.now() + timedelta(seconds=current_app.config['QUOTE_LIFETIME'])
+        ).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def redeem_quote(
+    quote_id: str, customer_id: int, data: Any, cart_lines: List[CartLine]
+) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Check the quote id sent with an order (data).
+    Return (error message, None if valid) and the quoted values for place_order.
+    """
+    serializer = quote_serializer()
+    if serializer is None:
+        return 'Quotes Disabled', None
+    try:
+        quote = serializer.loads(
+            quote_id, max_age=current_app.config['QUOTE_LIFETIME']
+        )
+    except SignatureExpired:
+        return 'Quote Expired', None
+    except BadSignature:
+        return 'Invalid Quote', None
+
+    if (quote['customer_id'], quote['restaurant_id'], quote['postcode']) != \
+            (customer_id, data['restaurant_id'], data['postcode']):
+        return 'Quote Does Not Match The Order', None
+    cart = sorted((menu.id, cart_item.quantity) for cart_item, menu, _, _ in cart_lines)
+    if cart != sorted((menu_id, quantity) for menu_id, quantity, _ in quote['items']):
+        return 'Cart Changed Since The Quote', None
+    # the prices charged are those of the menu now
+    prices = {menu.id: menu.price for _, menu, _, _ in cart_lines}
+    if any(prices[menu_id] != price for menu_id, _, price in quote['items']) or \
+            quote['order_price'] != round(sum(
+                quantity * price for _, quantity, price in quote['items']
+            ), 2):
+        return 'Prices Changed Since The Quote', None
+    return None, quote
@@ -0,0 +1,57 @@
+"""Flask-Restx Models for Dispatch APIs"""
+from flask_restx import Namespace, fields, reqparse
+
+api = Namespace('dispatch', description='APIs for the Drivers Offered Orders by the Dispatch')
+
+"""General Message Response"""
+message_res = api.model('Message', {
+    'message': fields.String(description='Descriptive message', example='Some Description')
+})
+
+"""Availability and position sent by the driver"""
+driver_status_req = api.model('Driver Status Request', {
+    'available': fields.Boolean(required=True, description='Whether the driver takes orders'),
+    'lat': fields.Float(description='Latitude of the driver', example=-33.8688),
+    'lon': fields.Float(description='Longitude of the driver', example=151.2093),
+    'postcode': fields.String(
+        description='Postcode the driver is in, used when lat / lon are not given',
+        example='2000'
+    ),
+})
+
+"""Availability and position known by the dispatch"""
+driver_status_res = api.model('Driver Status Response', {
+    'driver_id': fields.Integer(),
+    'available': fields.Boolean(),
+    'lat': fields.Float(),
+    'lon': fields.Float(),
+    'updated_at': fields.String(description='Last time the driver was heard from'),
+})
+
+"""An order offered to the driver"""
+offer_res = api.model('Dispatch Offer', {
+    'id': fields.Integer(),
+    'order_id': fields.Integer(),
+    'round': fields.Integer(description='1 for the first drivers offered the order'),
+    'distance_km': fields.Float(description='From the driver to the restaurant'),
+    'offered_at': fields.String(),
+    'expires_at': fields.String(description='Accept the order before this time'),
+})
+
+"""Location ping of the driver"""
+location_req = api.model('Location Ping Request', {
+    'lat': fields.Float(required=True, description='Latitude of the driver', example=-33.8688),
+    'lon': fields.Float(required=True, description='Longitude of the driver', example=151.2093),
+})
+
+"""Drivers near the restaurant"""
+nearby_parser = reqparse.RequestParser()
+nearby_parser.add_argument(
+    'radius_km', type=float, location='args', required=False,
+    help='Radius around the restaurant, at most 50 km (default 5)'
+)
+
+nearby_res = api.model('Nearby Drivers', {
+    'count': fields.Integer(description='Available drivers within the radius'),
+    'nearest_km': fields.Float(description='Distance of the nearest one, null if none'),
+})
@@ -0,0 +1,184 @@
+"""APIs for the Drivers Offered Orders by the Dispatch"""
+from datetime import datetime
+from flask import request
+from flask_restx import Resource
+
+from utils.db import db
+from utils.geo import geocode_postcode
+from utils.header import auth_header, tokenize
+from utils.locations import location_store
+from utils.response import res_error
+from db_model import DriverState
+from db_model.db_enum import UserType
+from db_model.db_query import (
+    decline_offer,
+    get_driver_by_token,
+    get_driver_state,
+    get_live_offers_of_driver,
+    get_restaurant_by_token,
+    resolve_session,
+)
+from routes.dispatch.models import (
+    api,
+    driver_status_req,
+    driver_status_res,
+    location_req,
+    message_res,
+    nearby_parser,
+    nearby_res,
+    offer_res,
+)
+
+# largest radius of /drivers/nearby
+MAX_NEARBY_RADIUS_KM = 50
+
+def is_valid_position(lat: float, lon: float) -> bool:
+    """Whether lat / lon are degrees on the earth"""
+    return -90 <= lat <= 90 and -180 <= lon <= 180
+
+@api.route('/driver/status')
+class DriverStatus(Resource):
+    """Route: /driver/status"""
+    @api.expect(auth_header)
+    @api.response(200, 'Success', driver_status_res)
+    @api.response(401, 'Unauthorised', message_res)
+    @api.response(404, 'Not Found', message_res)
+    def get(self):
+        """Availability and last position of the driver known by the dispatch"""
+        driver = get_driver_by_token(tokenize(request.headers))
+        if not driver:
+            return res_error(401)
+
+        state = get_driver_state(driver.id)
+        if not state:
+            return res_error(404, 'No Status Sent Yet')
+        return state.format(), 200
+
+    @api.expect(auth_header, driver_status_req)
+    @api.response(200, 'Success', driver_status_res)
+    @api.response(400, 'Bad Request', message_res)
+    @api.response(401, 'Unauthorised', message_res)
+    def put(self):
+        """
+        Set whether the driver takes orders, and where they are: lat / lon, or the
+        postcode they are in. An available driver is offered orders near them.
+        """
+        driver = get_driver_by_token(tokenize(request.headers))
+        if not driver:
+            return res_error(401)
+
+        data = request.json
+        lat, lon = data.get('lat'), data.get('lon')
+        if (lat is None) != (lon is None):
+            return res_error(400, 'Both lat and lon Are Needed')
+        if lat is None and data.get('postcode'):
+            position = geocode_postcode(data['postcode'])
+            if not position:
+                return res_error(400, 'Unknown Postcode')
+            lat, lon = position
+        if lat is not None and not is_valid_position(lat, lon):
+            return res_error(400, 'Invalid Position')
+
+        state = get_driver_state(driver.id)
+        if not state:
+            state = DriverState(driver_id=driver.id)
+            db.session.add(state)
+        now = datetime.now()
+        state.available = data['available']
+        if lat is not None:
+            state.lat, state.lon = lat, lon
+            state.updated_at = now
+        # the other workers read the states changed since their last sync
+        state.status_changed_at = now
+        db.session.commit()
+        location_store.load(driver.id, state.lat, state.lon, state.updated_at, state.available)
+        return state.format(), 200
+
+@api.route('/driver/location')
+class DriverLocation(Resource):
+    """Route: /driver/location"""
+    @api.expect(auth_header, location_req)
+    @api.response(200, 'Success', message_res)
+    @api.response(400, 'Bad Request', message_res)
+    @api.response(401, 'Unauthorised', message_res)
+    def post(self):
+        """
+        Position of the driver, sent every few seconds while the app is open.
+        Kept in memory and saved in batches, see utils/locations.py.
+        """
+        # the session is cached, so a ping reads nothing from the database
+        resolved = resolve_session(tokenize(request.headers))
+        if not resolved or resolved[0] != UserType.DRIVER:
+            return res_error(401)
+
+        data = request.json
+        if not is_valid_position(data['lat'], data['lon']):
+            return res_error(400, 'Invalid Position')
+        location_store.ping(resolved[1], data['lat'], data['lon'])
+        return {'message': 'Location Received'}, 200
+
+@api.route('/drivers/nearby')
+class NearbyDrivers(Resource):
+    """Route: /drivers/nearby"""
+    @api.expect(auth_header, nearby_parser)
+    @api.response(200, 'Success', nearby_res)
+    @api.response(400, 'Bad Request', message_res)
+    @api.response(401, 'Unauthorised', message_res)
+    def get(self):
+        """Number of available drivers near the restaurant, and the distance of the nearest"""
+        restaurant = get_restaurant_by_token(tokenize(request.headers))
+        if not restaurant:
+            return res_error(401)
+
+        radius_km = nearby_parser.parse_args()['radius_km'] or 5
+        if not 0 < radius_km <= MAX_NEARBY_RADIUS_KM:
+            return res_error(400, f'radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM}')
+        position = geocode_postcode(restaurant.postcode)
+        if not position:
+            return res_error(400, 'Unknown Restaurant Postcode')
+
+        drivers = location_store.within(position.lat, position.lon, radius_km)
+        return {
+            'count': len(drivers),
+            'nearest_km': round(drivers[0][1], 2) if drivers else None,
+        }, 200
+
+@api.route('/offers')
+class DriverOffers(Resource):
+    """Route: /offers"""
+    @api.expect(auth_header)
+    @api.marshal_list_with(offer_res)
+    @api.response(401, 'Unauthorised', message_res)
+    def get(self):
+        """
+        The orders offered to the driver and not expired, the oldest first.
+        Accept one with /driver-order/order/accept/<order_id>.
+        """
+        driver = get_driver_by_token(tokenize(request.headers))
+        if not driver:
+            return res_error(401)
+
+        offers = get_live_offers_of_driver(driver.id, datetime.now())
+        return [offer.format() for offer in offers], 200
+
+@api.route('/offers/<int:order_id>/decline')
+@api.doc(params={
+    'order_id': 'Order ID'
+})
+class DeclineOffer(Resource):
+    """Route: /offers/<int:order_id>/decline"""
+    @api.expect(auth_header)
+    @api.response(200, 'Success', message_res)
+    @api.response(401, 'Unauthorised', message_res)
+    @api.response(404, 'Not Found', message_res)
+    def post(self, order_id: int):
+        """Decline the offer of the order, it goes to other drivers at the next tick"""
+        driver = get_driver_by_token(tokenize(request.headers))
+        if not driver:
+            return res_error(401)
+
+        if not decline_offer(order_id, driver.id, datetime.now()):
+            db.session.rollback()
+            return res_error(404, 'No Open Offer Of This Order')
+        db.session.commit()
+        return {'message': 'Offer Declined'}, 200
@@ -0,0 +1,235 @@
+"""
+Helper functions of the dispatch: which drivers are offered which orders.
+
+Every tick (utils/dispatcher.py), for each order waiting for a driver without an open offer:
+1. the restaurant is located by its postcode (utils/geo.py)
+2. the available drivers within the radius of the round are scored by distance,
+   current load and rating (score_driver, lower is better)
+3. the best DISPATCH_OFFER_SIZE of them not offered the order yet get an offer
+   valid DISPATCH_OFFER_TIMEOUT seconds
+When the offers expire or are declined, the next round offers the order to twice as
+many drivers in twice the radius. After DISPATCH_MAX_ROUNDS, or when the restaurant
+cannot be located, the order is opened to every driver (an offer without driver).
+
+An order accepted but not ready yet is held until DISPATCH_PICKUP_LEAD seconds before
+its food is expected ready (utils/prep_time.py), so the driver does not wait at the
+restaurant. Orders of restaurants without enough history are offered straight away.
+
+The drivers are found with a GridIndex, so a tick reads the drivers near each order
+instead of every driver, and all its offers are inserted with one statement.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import insert
+from utils.db import db
+from utils.geo import GridIndex, geocode_postcode
+from utils.locations import POSITION_MAX_AGE
+from utils.prep_time import expected_ready_time
+from db_model import DispatchOffer, Order
+from db_model.db_enum import OfferStatus, OrderStatus
+from db_model.db_query import (
+    expire_offers,
+    get_available_drivers,
+    get_driver_loads,
+    get_live_offer_counts,
+    get_offer_history,
+    get_orders_to_dispatch,
+)
+
+# radius of the first round, doubled every round up to MAX_RADIUS_KM
+FIRST_ROUND_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 40.0
+# drivers with this many orders not delivered are not offered more
+MAX_LOAD = 2
+# open offers a driver may have at once
+MAX_LIVE_OFFERS = 2
+
+# score = distance + LOAD_PENALTY_KM per order not delivered
+#         - RATING_BONUS_KM per star above NEUTRAL_RATING (drivers without review have it)
+LOAD_PENALTY_KM = 2.0
+RATING_BONUS_KM = 1.0
+NEUTRAL_RATING = 4.0
+
+class DriverCandidate(NamedTuple):
+    """An available driver, as seen by the matching"""
+    id: int
+    lat: float
+    lon: float
+    load: int
+    rating: float
+
+class OpenOrder(NamedTuple):
+    """An order to offer: the restaurant position (None if unknown) and its offer history"""
+    id: int
+    lat: Optional[float]
+    lon: Optional[float]
+    next_round: int
+    offered: FrozenSet[int]
+
+class Offer(NamedTuple):
+    """An order offered to a driver, driver_id None for every driver"""
+    order_id: int
+    driver_id: Optional[int]
+    round: int
+    score: Optional[float]
+    distance_km: Optional[float]
+
+class TickResult(NamedTuple):
+    """What one tick did"""
+    orders: int
+    offers: int
+    opened: int
+    expired: int
+    # orders not offered yet as their food is not ready soon
+    held: int = 0
+
+def score_driver(distance_km: float, load: int, rating: float) -> float:
+    """Score of a driver for an order, lower is better (in km, see the constants)"""
+    return distance_km + LOAD_PENALTY_KM * load - RATING_BONUS_KM * (rating - NEUTRAL_RATING)
+
+def round_radius(round_number: int) -> float:
+    """Radius (km) around the restaurant of the drivers offered the order in the round"""
+    return min(FIRST_ROUND_RADIUS_KM * 2 ** (round_number - 1), MAX_RADIUS_KM)
+
+def match_orders(
+    orders: List[OpenOrder],
+    drivers: List[DriverCandidate],
+    live_offers: Dict[int, int],
+    offer_size: int,
+    max_rounds: int
+) -> List[Offer]:
+    """
+    The offers of one tick, see the module doc. The orders are served in the given
+    order (the oldest first), so they get the best drivers when drivers are scarce.
+    live_offers (driver id -> open offers) is counted against MAX_LIVE_OFFERS.
+    """
+    index = GridIndex(cell_km=FIRST_ROUND_RADIUS_KM)
+    by_id: Dict[int, DriverCandidate] = {}
+    for driver in drivers:
+        if driver.load < MAX_LOAD and live_offers.get(driver.id, 0) < MAX_LIVE_OFFERS:
+            index.update(driver.id, driver.lat, driver.lon)
+            by_id[driver.id] = driver
+    offer_counts = defaultdict(int, live_offers)
+
+    offers: List[Offer] = []
+    for order in orders:
+        round_number = order.next_round
+        chosen: List[Offer] = []
+        while not chosen and order.lat is not None and round_number <= max_rounds:
+            scored = []
+            for driver_id, distance in index.within(
+                order.lat, order.lon, round_radius(round_number)
+            ):
+                if driver_id in order.offered:
+                    continue
+                driver = by_id[driver_id]
+                score = score_driver(distance, driver.load, driver.rating)
+                scored.append((score, distance, driver_id))
+            scored.sort()
+            size = offer_size * 2 ** (round_number - 1)
+            chosen = [
+                Offer(order.id, driver_id, round_number, score, distance)
+                for score, distance, driver_id in scored[:size]
+            ]
+            # nobody new in this radius, widen now rather than next tick
+            if not chosen:
+                round_number += 1
+
+        if not chosen:
+            # nobody left to offer it to: every driver sees it
+            chosen = [Offer(order.id, None, max(round_number, order.next_round), None, None)]
+        for offer in chosen:
+            if offer.driver_id is not None:
+                offer_counts[offer.driver_id] += 1
+                # no more offers for this driver in this tick, stop finding them
+                if offer_counts[offer.driver_id] >= MAX_LIVE_OFFERS:
+                    index.remove(offer.driver_id)
+        offers.extend(chosen)
+    return offers
+
+def load_candidates(now: datetime) -> List[DriverCandidate]:
+    """The available drivers with a recent position, their load and rating"""
+    rows = get_available_drivers(now - timedelta(seconds=POSITION_MAX_AGE))
+    loads = get_driver_loads([state.driver_id for state, _ in rows])
+    return [
+        DriverCandidate(
+            id=state.driver_id,
+            lat=state.lat,
+            lon=state.lon,
+            load=loads.get(state.driver_id, 0),
+            rating=driver.get_avg_rating() if driver.rating_count else NEUTRAL_RATING,
+        )
+        for state, driver in rows
+    ]
+
+def is_held(order: Order, now: datetime, lead: timedelta) -> bool:
+    """Whether the food of the order is expected ready later than `lead` from now"""
+    if order.order_status != OrderStatus.RESTAURANT_ACCEPTED:
+        return False
+    ready_at = expected_ready_time(order)
+    return ready_at is not None and ready_at - lead > now
+
+def load_open_orders(now: datetime, lead: timedelta) -> Tuple[List[OpenOrder], int]:
+    """
+    The orders to offer, the oldest first, with their offer history.
+    And the number of orders held, see is_held.
+    """
+    all_rows = get_orders_to_dispatch(now)
+    rows = [(order, postcode) for order, postcode in all_rows if not is_held(order, now, lead)]
+    held = len(all_rows) - len(rows)
+    history: Dict[int, Tuple[int, set]] = {}
+    for order_id, driver_id, round_number in get_offer_history([order.id for order, _ in rows]):
+        last_round, offered = history.setdefault(order_id, (0, set()))
+        if driver_id is not None:
+            offered.add(driver_id)
+        history[order_id] = (max(last_round, round_number), offered)
+
+    orders = []
+    for order, postcode in rows:
+        position = geocode_postcode(postcode)
+        last_round, offered = history.get(order.id, (0, set()))
+        orders.append(OpenOrder(
+            id=order.id,
+            lat=position.lat if position else None,
+            lon=position.lon if position else None,
+            next_round=last_round + 1,
+            offered=frozenset(offered),
+        ))
+    return orders, held
+
+def run_dispatch_tick(now: Optional[datetime] = None) -> TickResult:
+    """Expire the old offers and make the new ones, in one transaction (app context needed)"""
+    now = now or datetime.now()
+    config = current_app.config
+    expired = expire_offers(now)
+
+    orders, held = load_open_orders(
+        now, timedelta(seconds=config['DISPATCH_PICKUP_LEAD'])
+    )
+    offers = match_orders(
+        orders, load_candidates(now), get_live_offer_counts(now),
+        config['DISPATCH_OFFER_SIZE'], config['DISPATCH_MAX_ROUNDS']
+    ) if orders else []
+
+    expires_at = now + timedelta(seconds=config['DISPATCH_OFFER_TIMEOUT'])
+    if offers:
+        db.session.execute(insert(DispatchOffer), [
+            {
+                'order_id': offer.order_id,
+                'driver_id': offer.driver_id,
+                'round': offer.round,
+                'score': offer.score,
+                'distance_km': offer.distance_km,
+                'status': OfferStatus.OFFERED,
+                'offered_at': now,
+                'expires_at': expires_at if offer.driver_id is not None else None,
+            }
+            for offer in offers
+        ])
+    db.session.commit()
+
+    opened = sum(1 for offer in offers if offer.driver_id is None)
+    return TickResult(len(orders), len(offers) - opened, opened, expired, held)
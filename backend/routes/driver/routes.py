@@ -13,7 +13,7 @@ from utils.header import auth_header, tokenize
 from utils.response import res_error
 from db_model import Driver
 from db_model.db_enum import RegistrationStatus
-from db_model.db_query import get_driver_by_token, filter_drivers
+from db_model.db_query import get_driver_by_token, filter_drivers, invalidate_user_sessions
 from routes.driver.models import (
     api,
     register_req_parser,
@@ -99,7 +99,8 @@ class UpdateProfile(Resource):
     def put(self):
         """Driver updates profile, may turn the registration status to pending for admin review"""
 
-        driver = get_driver_by_token(tokenize(request.headers))
+        token = tokenize(request.headers)
+        driver = get_driver_by_token(token)
         if not driver:
             return res_error(401)
 
@@ -122,6 +123,8 @@ class UpdateProfile(Resource):
             if not is_password_okay:
                 return res_error(400, description)
             driver.password = args["password"]
+            # log out every other device
+            invalidate_user_sessions(driver, keep_token=token)
 
         if args.get("phone") and args.get('phone') != driver.phone:
             if not is_valid_phone(args['phone']):
@@ -1,5 +1,6 @@
 """Flask-restx models for Driver Order APIs"""
 from flask_restx import Namespace, fields
+from utils.pagination import page_model
 
 api = Namespace('driver-order', description='APIs for Driver')
 
@@ -28,4 +29,7 @@ order_info = api.model('Order Information', {
     'delivery_time': fields.String(),
     'customer_notes': fields.String(),
     'restaurant_notes': fields.String()
-})
\ No newline at end of file
+})
+
+# Page of detailed orders, see utils/pagination.py
+orders_page_res = page_model(api, "Detailed Orders Page")
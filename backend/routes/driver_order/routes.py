@@ -1,27 +1,36 @@
 """Routes related to Driver Dealing with Orders"""
 from datetime import datetime
 from flask_restx import Resource
-from flask import request
+from flask import current_app, request
 
 from utils.db import db
 from utils.header import auth_header, tokenize
 from utils.response import res_error
+from utils.pagination import pagination_parser, get_page_args, page_response
+from utils.prep_time import forget_prep_stats, record_prep_time
 from db_model.db_query import (
+    claim_order,
+    close_offers,
     filter_orders,
     get_driver_by_token,
     get_orders_waiting_driver,
     get_orders_of_driver_from_order_type,
-    get_order_by_order_id
+    format_orders_with_details,
+    has_live_offer,
+    transition_order
 )
-from db_model.db_enum import OrderStatus
+from db_model import Order
+from db_model.db_enum import DRIVER_CLAIMABLE_STATUSES, OrderStatus
 from routes.driver_order.models import (
     api,
     message_res,
     order_info,
+    orders_page_res,
 )
 from routes.driver_order.services import (
     format_order
 )
+from routes.order_event.services import publish_order_event, record_order_event
 
 @api.route('/orders/available')
 class AvailableOrders(Resource):
@@ -37,7 +46,11 @@ class AvailableOrders(Resource):
         if not driver:
             return res_error(401)
 
-        orders = get_orders_waiting_driver()
+        # with the dispatch, only the orders offered to this driver
+        if current_app.config['DISPATCH_ENABLED']:
+            orders = get_orders_of_driver_from_order_type(driver.id, 'new')
+        else:
+            orders = get_orders_waiting_driver()
 
         return [format_order(order) for order in orders], 200
 
@@ -51,8 +64,9 @@ class AcceptOrder(Resource):
     @api.response(200, 'Success', message_res)
     @api.response(400, 'Bad Request', message_res)
     @api.response(401, 'Unauthorised', message_res)
+    @api.response(404, 'Order Accepted By Other Driver', message_res)
     def post(self, order_id: int):
-        """Accept given Order"""
+        """Accept given Order. Among drivers accepting the same order at once, only one gets it."""
         driver = get_driver_by_token(tokenize(request.headers))
         if not driver:
             return res_error(401)
@@ -67,12 +81,24 @@ class AcceptOrder(Resource):
         if order.driver_id:
             return res_error(404, 'Order Accepted By Other Driver')
 
-        # if this order is not approved by the restaurant, then it cannot be accepted.
-        if order.order_status == OrderStatus.PENDING:
+        # if this order is not approved by the restaurant (or is over), then it cannot be accepted.
+        if order.order_status not in DRIVER_CLAIMABLE_STATUSES:
             return res_error(400, 'Order Cannot Be Accepted')
 
-        order.driver_id = driver.id
+        # with the dispatch, only the drivers offered the order can take it
+        dispatch = current_app.config['DISPATCH_ENABLED']
+        if dispatch and not has_live_offer(order.id, driver.id, datetime.now()):
+            return res_error(404, 'Order Not Offered To You')
+
+        # claim it only if still free, another driver may be accepting it right now
+        if not claim_order(order, driver.id):
+            db.session.rollback()
+            return res_error(404, 'Order Accepted By Other Driver')
+        if dispatch:
+            close_offers(order.id, driver.id)
+        event = record_order_event(order, order.order_status, in_pool=True)
         db.session.commit()
+        publish_order_event(event)
 
         return { 'message': 'Order Accepted' }, 200
 
@@ -102,13 +128,24 @@ class PickupOrder(Resource):
         if order.driver_id != driver.id:
             return res_error(404, 'Order Unaccessible')
 
-        if order.order_status != OrderStatus.READY_FOR_PICKUP:
+        if not order.order_status.can_move_to(OrderStatus.PICKED_UP):
             return res_error(400, 'Order Not Ready')
 
-        order.order_status = OrderStatus.PICKED_UP
-        order.pickup_time = datetime.now()
+        pickup_time = datetime.now()
+        if not transition_order(
+            order, OrderStatus.PICKED_UP, Order.driver_id == driver.id,
+            pickup_time = pickup_time
+        ):
+            db.session.rollback()
+            return res_error(409, 'Order Changed, Please Reload')
+        # marked ready before the ready times were recorded, learnt at the pickup instead
+        if order.ready_time is None:
+            record_prep_time(order, pickup_time)
+        event = record_order_event(order, OrderStatus.READY_FOR_PICKUP, in_pool=False)
 
         db.session.commit()
+        forget_prep_stats(order.restaurant_id)
+        publish_order_event(event)
         return { 'message': 'Order Picked Up' }, 200
 
 @api.route('/order/complete/<int:order_id>')
@@ -133,13 +170,19 @@ class CompleteOrder(Resource):
         if order.driver_id != driver.id:
             return res_error(404, 'Order Unaccessible')
 
-        if order.order_status != OrderStatus.PICKED_UP:
+        if not order.order_status.can_move_to(OrderStatus.DELIVERED):
             return res_error(400, 'Order Not Picked Up')
 
-        order.order_status = OrderStatus.DELIVERED
-        order.delivery_time = datetime.now()
+        if not transition_order(
+            order, OrderStatus.DELIVERED, Order.driver_id == driver.id,
+            delivery_time = datetime.now()
+        ):
+            db.session.rollback()
+            return res_error(409, 'Order Changed, Please Reload')
+        event = record_order_event(order, OrderStatus.PICKED_UP, in_pool=False)
 
         db.session.commit()
+        publish_order_event(event)
         return { 'message': 'Delivery Completed' }, 200
 
 # order_type: new, in_progress, completed
@@ -155,8 +198,8 @@ class CompleteOrder(Resource):
     }
 })
 class AvailableOrdersV2(Resource):
-    @api.expect(auth_header)
-    @api.response(200, 'Success')
+    @api.expect(auth_header, pagination_parser)
+    @api.response(200, 'Success. A page envelope when after / limit is given', orders_page_res)
     @api.response(400, 'Bad Request', message_res)
     @api.response(401, 'Unauthorised', message_res)
     def get(self, order_type):
@@ -165,6 +208,6 @@ class AvailableOrdersV2(Resource):
         if not driver:
             return res_error(401)
 
-        orders = get_orders_of_driver_from_order_type(driver.id, order_type)
-        response = [get_order_by_order_id(order.id) for order in orders]
-        return response, 200
+        page = get_page_args(pagination_parser.parse_args())
+        orders = get_orders_of_driver_from_order_type(driver.id, order_type, page)
+        return page_response(orders, format_orders_with_details), 200
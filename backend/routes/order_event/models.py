@@ -0,0 +1,19 @@
+"""Flask-Restx Models for Order Event APIs"""
+from flask_restx import Namespace, fields
+
+api = Namespace('order-event', description='APIs for Live Order Changes')
+
+"""General Message Response"""
+message_res = api.model('Message', {
+    'message': fields.String(description='Descriptive message', example='Some Description')
+})
+
+"""Data of an `order` event"""
+order_event_model = api.model('Order Event Model', {
+    'id': fields.Integer(description='Event ID, sent back as Last-Event-ID on reconnect'),
+    'order_id': fields.Integer(example=1),
+    'old_status': fields.String(description='null when the order is created', example='PENDING'),
+    'new_status': fields.String(example='RESTAURANT_ACCEPTED'),
+    'driver_id': fields.Integer(description='null while no driver is assigned'),
+    'time': fields.String(example='YYYY-MM-DD HH:mm:SS')
+})
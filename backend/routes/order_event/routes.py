@@ -0,0 +1,49 @@
+"""APIs for Live Order Changes"""
+from flask_restx import Resource
+from flask import current_app, request
+
+from utils.header import tokenize
+from utils.response import res_error
+from utils.event_hub import get_resume_id, stream_parser, stream_response
+from db_model import Customer, Driver, Restaurant
+from db_model.db_query import get_user_by_token, get_last_order_event_id
+from routes.order_event.models import api, message_res, order_event_model
+from routes.order_event.services import order_hub, order_stream, order_stream_filter
+
+@api.route('/stream')
+class OrderEventStream(Resource):
+    """Route: /stream"""
+    @api.expect(stream_parser)
+    @api.response(200, 'text/event-stream of `order` events', order_event_model)
+    @api.response(400, 'Bad Request', message_res)
+    @api.response(401, 'Unauthorised', message_res)
+    def get(self):
+        """
+        Server-Sent Events stream of the order changes I can see:
+        a customer / restaurant its own orders, a driver its orders and the orders
+        waiting for a driver. Each event has the order id, the old and new status and the time.
+        Reconnects resume after the Last-Event-ID header (or `since`), so no change is missed.
+        The token may be given as `token` since EventSource cannot set headers.
+        """
+        args = stream_parser.parse_args()
+        me = get_user_by_token(tokenize(request.headers) or args['token'])
+        if not me:
+            return res_error(401)
+        if not isinstance(me, (Customer, Driver, Restaurant)):
+            return res_error(400, 'No Orders For This User')
+
+        try:
+            since = get_resume_id(request.headers, args['since'])
+        except ValueError as e:
+            return res_error(400, str(e))
+        if since is None:
+            # only the new changes, read before subscribing so none is skipped
+            since = get_last_order_event_id()
+
+        # subscribe now, so no change made before the first read is missed
+        keys, filters = order_stream_filter(me)
+        subscription = order_hub.subscribe(*keys)
+        return stream_response(
+            order_stream(current_app._get_current_object(), subscription, filters, since),
+            subscription
+        )
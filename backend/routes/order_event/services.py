@@ -0,0 +1,83 @@
+"""Helper functions for Order Event APIs"""
+from typing import Hashable, Iterator, List, Optional, Tuple, Union
+from flask import Flask
+from utils.db import db
+from utils.event_hub import EventHub, Subscription, event_stream, format_event
+from db_model import Customer, Driver, Order, OrderEvent, Restaurant
+from db_model.db_enum import OrderStatus
+from db_model.db_query import get_order_events_since
+
+# seconds between two checks of the database while the stream is idle
+ORDER_STREAM_HEARTBEAT = 15
+ORDER_STREAM_RETRY_MS = 3000
+
+# open order streams of this process, by ('customer' | 'restaurant' | 'driver', id)
+# and POOL_KEY for the orders waiting for a driver
+order_hub = EventHub()
+POOL_KEY = 'pool'
+
+def record_order_event(
+    order: Order,
+    old_status: Optional[OrderStatus],
+    in_pool: bool
+) -> OrderEvent:
+    """
+    Add the event of a change of the order to the session, the caller commits
+    and then calls publish_order_event.
+    old_status is None for a new order, in_pool whether the order was waiting for a driver.
+    """
+    event = OrderEvent(
+        order_id=order.id,
+        customer_id=order.customer_id,
+        restaurant_id=order.restaurant_id,
+        driver_id=order.driver_id,
+        in_pool=in_pool,
+        old_status=old_status,
+        new_status=order.order_status,
+    )
+    db.session.add(event)
+    return event
+
+def publish_order_event(event: OrderEvent) -> None:
+    """Wake up the open streams of the users of the order after the event is committed"""
+    keys: List[Hashable] = [('customer', event.customer_id), ('restaurant', event.restaurant_id)]
+    if event.driver_id is not None:
+        keys.append(('driver', event.driver_id))
+    if event.in_pool:
+        keys.append(POOL_KEY)
+
+    for key in keys:
+        order_hub.publish(key, event.id)
+
+def order_stream_filter(user: Union[Customer, Driver, Restaurant]) -> Tuple[List[Hashable], dict]:
+    """
+    Hub keys and get_order_events_since filters of the events the user sees:
+    a customer / restaurant its own orders, a driver its orders and the pool.
+    """
+    if isinstance(user, Customer):
+        return [('customer', user.id)], {'customer_id': user.id}
+    if isinstance(user, Restaurant):
+        return [('restaurant', user.id)], {'restaurant_id': user.id}
+    return [('driver', user.id), POOL_KEY], {'driver_id': user.id, 'in_pool': True}
+
+def order_stream(
+    app: Flask,
+    subscription: Subscription,
+    filters: dict,
+    since: int
+) -> Iterator[str]:
+    """
+    Server-Sent Events of the order changes matching the filters, after the event `since`.
+    The database is used in a short app context each time, so the stream does not
+    hold a connection while idle.
+    """
+    def catch_up(last_id: int) -> List[Tuple[int, str]]:
+        with app.app_context():
+            return [
+                (event.id, format_event(event.id, 'order', event.format()))
+                for event in get_order_events_since(last_id, **filters)
+            ]
+
+    return event_stream(
+        subscription, catch_up, since, ORDER_STREAM_HEARTBEAT, ORDER_STREAM_RETRY_MS
+    )
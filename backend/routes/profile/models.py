@@ -1,5 +1,6 @@
 """Flask-restx models for Profile APIs"""
 from flask_restx import Namespace, reqparse 
+from utils.pagination import page_model
 
 api = Namespace('profile', description='APIs for Profile')
 
@@ -8,3 +9,6 @@ api = Namespace('profile', description='APIs for Profile')
 profile_req_parser = reqparse.RequestParser()
 profile_req_parser.add_argument('user_type', type=str, required=True, help='User Type')
 profile_req_parser.add_argument('user_id', type=int, required=True, help='User ID')
+
+# Page of user profiles, see utils/pagination.py
+profiles_page_res = page_model(api, 'Profiles Page')
@@ -1,13 +1,18 @@
 """APIs related to profile"""
 from flask_restx import Resource
 from utils.response import res_error
+from utils.pagination import pagination_parser, get_page_args, page_response
 
 from db_model import (
     Admin, Customer, Driver, Restaurant
 )
+from db_model.db_query import (
+    filter_admins, filter_customers, filter_drivers, filter_restaurants
+)
 from routes.profile.models import (
     api,
-    profile_req_parser
+    profile_req_parser,
+    profiles_page_res
 )
 
 @api.route("/")
@@ -44,20 +49,23 @@ class ProfileResource(Resource):
 @api.route("/all/<string:user_type>")
 class AllProfileResource(Resource):
     """Route /all/<string:user_type>"""
+    @api.expect(pagination_parser)
+    @api.response(200, 'Success. A page envelope when after / limit is given', profiles_page_res)
     def get(self, user_type):
         """
         Obtain all profiles of a certain user type, user_type in 
         (customer, restaurant, driver, admin)
         """
+        page = get_page_args(pagination_parser.parse_args())
         if user_type == 'customer':
-            users = Customer.query.all()
+            users = filter_customers(page=page)
         elif user_type == 'restaurant':
-            users = Restaurant.query.all()
+            users = filter_restaurants(page=page)
         elif user_type == 'driver':
-            users = Driver.query.all()
+            users = filter_drivers(page=page)
         elif user_type == 'admin':
-            users = Admin.query.all()
+            users = filter_admins(page=page)
         else:
             return res_error(400, 'Invalid user type')
 
-        return [user.dict() for user in users]
+        return page_response(users, lambda rows: [user.dict() for user in rows])
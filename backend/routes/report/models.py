@@ -6,6 +6,10 @@ api = Namespace('report', description='APIs for Report/Record')
 date_req_parser = reqparse.RequestParser()
 date_req_parser.add_argument('start_date', type=str, required=True, help="Start date in YYYY-MM-DD")
 date_req_parser.add_argument('end_date', type=str, required=True, help="End date in YYYY-MM-DD")
+date_req_parser.add_argument(
+    'bucket', type=str, required=False, default='day',
+    choices=('day', 'week', 'month'), help="Group the series by day, week or month"
+)
 
 spending_report_model = api.model('Customer Spending Model', {
     'total_order': fields.Integer(description='Number of total order'),
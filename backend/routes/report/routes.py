@@ -16,10 +16,7 @@ from routes.report.models import (
     spending_report_model,
     earning_report_model
 )
-from routes.report.services import (
-    filter_orders_by_user_and_date_range,
-    get_per_day_data
-)
+from routes.report.services import get_order_report
 
 @api.route('/customer')
 class CustomerReport(Resource):
@@ -43,18 +40,16 @@ class CustomerReport(Resource):
         except ValueError:
             return res_error(400, 'Date format must be YYYY-MM-DD')
 
-        orders = filter_orders_by_user_and_date_range(
+        report = get_order_report(
             customer_id=customer.id,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            bucket=args.get('bucket')
         )
-        total_spending = 0
-        for order in orders:
-            total_spending += order.order_price
 
         return {
-            'total_order': len(orders),
-            'total_spending': total_spending
+            'total_order': report['total_order'],
+            'total_spending': report['order_price']
         }, 200
 
 @api.route('/driver')
@@ -79,27 +74,20 @@ class DriverReport(Resource):
         except ValueError:
             return res_error(400, 'Date format must be YYYY-MM-DD')
 
-        orders = filter_orders_by_user_and_date_range(
-            driver_id=driver.id,
-            start_date=start_date,
-            end_date=end_date
-        )
-        total_earning = 0
-        for order in orders:
-            total_earning += order.delivery_fee
-
-        # get per day data
-        per_day_data = get_per_day_data(
+        # the totals and the series from one query, the driver earns the delivery fee
+        report = get_order_report(
             driver_id=driver.id,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            bucket=args.get('bucket'),
+            earning='delivery_fee'
         )
 
         # write the response
         response = {
-            'total_order': len(orders),
-            'total_earning': round(total_earning, 2),
-            'data': per_day_data
+            'total_order': report['total_order'],
+            'total_earning': report['delivery_fee'],
+            'data': report['data']
         }
 
         return response, 200
@@ -126,28 +114,19 @@ class RestaurantReport(Resource):
         except ValueError:
             return res_error(400, 'Date format must be YYYY-MM-DD')
 
-        orders = filter_orders_by_user_and_date_range(
-            restaurant_id=restaurant.id,
-            start_date=start_date,
-            end_date=end_date
-        )
-
-        total_earning = 0
-        for order in orders:
-            total_earning += order.order_price
-
-        # get the per day number of orders and earnings from the orders
-        per_day_data = get_per_day_data(
+        # the totals and the series from one query
+        report = get_order_report(
             restaurant_id=restaurant.id,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            bucket=args.get('bucket')
         )
 
         # format the result
         response = {
-            'total_order': len(orders),
-            'total_earning': round(total_earning, 2),
-            'data': per_day_data,
+            'total_order': report['total_order'],
+            'total_earning': report['order_price'],
+            'data': report['data'],
         }
 
         return response, 200
@@ -1,36 +1,72 @@
 """Helper functions for Report API"""
-from typing import Optional, List
-from datetime import datetime, timedelta
-from sqlalchemy import and_
+from typing import Optional, List, Dict, TypedDict
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, func
+from utils.db import db
 from db_model import Order
 from db_model.db_enum import OrderStatus
 
-def filter_orders_by_user_and_date_range(
-    customer_id: Optional[int] = None,
+# supported bucket sizes of the report series
+REPORT_BUCKETS = ['day', 'week', 'month']
+
+class ReportBucket(TypedDict):
+    """One point of the report series"""
+    date: str
+    num_orders: int
+    earnings: float
+
+class OrderReport(TypedDict):
+    """Totals and the series of a report"""
+    total_order: int
+    order_price: float
+    delivery_fee: float
+    data: List[ReportBucket]
+
+def _bucket_start(day: date, bucket: str) -> date:
+    """First day of the bucket that contains the given day"""
+    if bucket == 'week':
+        # weeks start on Monday
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(day: date, bucket: str) -> date:
+    """First day of the bucket after the one starting at the given day"""
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+def get_order_report(
     restaurant_id: Optional[int] = None,
     driver_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None
-) -> List[Order]:
+    end_date: Optional[datetime] = None,
+    bucket: str = 'day',
+    earning: str = 'order_price'
+) -> OrderReport:
     """
-    Filters orders by customer, restaurant, or driver within an optional date range.
-
-    At least one of customer_id, restaurant_id, or driver_id must be provided.
+    Totals and the per-bucket series of the delivered orders of one user,
+    computed from a single GROUP BY date(order_time) query.
+    Both start_date and end_date days are included.
 
     Args:
-        session (Session): SQLAlchemy session.
-        customer_id (int, optional): Customer ID.
-        restaurant_id (int, optional): Restaurant ID.
-        driver_id (int, optional): Driver ID.
-        start_date (datetime, optional): Start date (inclusive).
-        end_date (datetime, optional): End date (inclusive).
+        restaurant_id, driver_id, customer_id (int): One of them must be given.
+        start_date (datetime): First day of the report.
+        end_date (datetime): Last day of the report.
+        bucket (str): day, week or month.
+        earning (str): order_price or delivery_fee, used for the series earnings.
 
     Returns:
-        List[Order]: Filtered list of orders.
+        OrderReport: total_order, order_price, delivery_fee, and the series in data.
     """
-    filters = []
+    if bucket not in REPORT_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(REPORT_BUCKETS)}")
 
-    # At least one user ID must be provided
+    filters = []
     if customer_id:
         filters.append(Order.customer_id == customer_id)
     if restaurant_id:
@@ -38,76 +74,62 @@ def filter_orders_by_user_and_date_range(
     if driver_id:
         filters.append(Order.driver_id == driver_id)
 
-    # If no user ID is provided, you can raise an error or return empty
     if not filters:
         raise ValueError(
             "At least one of customer_id, restaurant_id, or driver_id must be specified."
         )
 
-    # Apply date range filters
-    if start_date:
-        filters.append(Order.order_time >= start_date)
-    if end_date:
-        filters.append(Order.order_time <= end_date)
+    # [first day 0:00, the day after the last day 0:00)
+    first_day = start_date.date()
+    end_day = end_date.date() + timedelta(days=1)
 
-    # Only check for completed order
+    filters.append(Order.order_time >= datetime.combine(first_day, datetime.min.time()))
+    filters.append(Order.order_time < datetime.combine(end_day, datetime.min.time()))
     filters.append(Order.order_status == OrderStatus.DELIVERED)
 
-    return Order.query.filter(and_(*filters)).order_by(Order.order_time.asc()).all()
-
-
-def get_per_day_data(
-    restaurant_id: Optional[int] = None,
-    driver_id: Optional[int] = None,
-    customer_id: Optional[int] = None,
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None
-) -> List[dict]:
-    """
-    Get the per day number of orders and earnings from the orders.
-
-    Args:
-        restaurant_id (int): Restaurant ID.
-        start_date (datetime): Start date (inclusive).
-        end_date (datetime): End date (inclusive).
-
-    Returns:
-        List[dict]: List of dictionaries containing: date, num_orders, earnings
-    """
-
-    # reset the start_date to the start of the day
-    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    # reset the end_date to the next day 0:00:00
-    end_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-
-    # create a list to hold the per day data
-    data = []
-
-    # start the iteration from the first day
-    current_date = start_date 
-    while current_date < end_date:
-        # get the number of orders and earnings for the current day
-        # use either restaurant_id or driver_id to filter the orders (one of the 3 variables is not None)
-        orders = filter_orders_by_user_and_date_range(
-            restaurant_id=restaurant_id,
-            driver_id=driver_id,
-            customer_id=customer_id,
-            start_date=current_date,
-            end_date=current_date + timedelta(days=1)
+    day_col = func.date(Order.order_time)
+    rows = (
+        db.session.query(
+            day_col.label('day'),
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.order_price), 0),
+            func.coalesce(func.sum(Order.delivery_fee), 0),
         )
-
-        num_orders = len(orders)
-        earnings = sum(order.order_price for order in orders)
-
-        # append the data to the list
+        .filter(and_(*filters))
+        .group_by(day_col)
+        .all()
+    )
+
+    # sum the days into their buckets
+    per_bucket: Dict[date, List[float]] = {}
+    total_order, total_price, total_fee = 0, 0.0, 0.0
+    for day, num_orders, order_price, delivery_fee in rows:
+        # SQLite returns the date as a string
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        counts = per_bucket.setdefault(_bucket_start(day, bucket), [0, 0.0])
+        counts[0] += num_orders
+        counts[1] += order_price if earning == 'order_price' else delivery_fee
+
+        total_order += num_orders
+        total_price += order_price
+        total_fee += delivery_fee
+
+    # fill the empty buckets
+    data: List[ReportBucket] = []
+    current = _bucket_start(first_day, bucket)
+    while current < end_day:
+        num_orders, earnings = per_bucket.get(current, (0, 0.0))
         data.append({
-            'date': current_date.strftime('%Y-%m-%d'),
+            'date': current.strftime('%Y-%m-%d'),
             'num_orders': num_orders,
             'earnings': round(earnings, 2)
         })
-
-        # move to the next day
-        current_date += timedelta(days=1)
-    
-    return data
+        current = _next_bucket(current, bucket)
+
+    return {
+        'total_order': total_order,
+        'order_price': round(total_price, 2),
+        'delivery_fee': round(total_fee, 2),
+        'data': data
+    }
@@ -36,7 +36,8 @@ register_res = api.model("Admin Register Reponse", {
 # and approval needed attributes (only for driver and restaurant) need admin approval.
 
 # for restaurant:
-# non approval needed: email, password, phone, url_img1, url_img2, url_img3, description
+# non approval needed: email, password, phone, url_img1, url_img2, url_img3, description,
+#                      opening_time, closing_time
 # approval needed: name, address, suburb, state, postcode, abn
 
 # The request parse for the non-approval and approval needed attributes are grouped together. 
@@ -54,6 +55,8 @@ update_req_parser.add_argument('state', type=str, required=False, help="State (A
 update_req_parser.add_argument('postcode', type=str, required=False, help="Postcode (4 digits)")
 update_req_parser.add_argument('abn', type=str, required=False, help="ABN (11 digits)")
 update_req_parser.add_argument('description', type=str, required=False, help="Restaurant description")
+update_req_parser.add_argument('opening_time', type=str, required=False, help="Opening time (HH:MM), empty for always open")
+update_req_parser.add_argument('closing_time', type=str, required=False, help="Closing time (HH:MM), empty for always open")
 update_req_parser.add_argument('image1', type=FileStorage, location='files', required=False, help="First image")
 update_req_parser.add_argument('image2', type=FileStorage, location='files', required=False, help="Second image")
 update_req_parser.add_argument('image3', type=FileStorage, location='files', required=False, help="Third image")
@@ -1,4 +1,5 @@
 """Restaurant APIs"""
+from datetime import time
 from flask_restx import Resource
 from flask import request
 
@@ -7,7 +8,11 @@ from utils.file import save_image
 from utils.header import auth_header, tokenize
 from utils.response import res_error
 from db_model import Restaurant
-from db_model.db_query import filter_restaurants, get_restaurant_by_token
+from db_model.db_query import (
+    filter_restaurants,
+    get_restaurant_by_token,
+    invalidate_user_sessions
+)
 from db_model.db_enum import State, RegistrationStatus
 from routes.restaurant.models import (
     api,
@@ -92,7 +97,8 @@ class RestaurantUpdate(Resource):
         the backend may change registration status to PENDING
         """
 
-        restaurant = get_restaurant_by_token(tokenize(request.headers))
+        token = tokenize(request.headers)
+        restaurant = get_restaurant_by_token(token)
         if not restaurant:
             return res_error(401)
 
@@ -118,6 +124,8 @@ class RestaurantUpdate(Resource):
 
         if args.get('password'):
             restaurant.password = args['password']
+            # log out every other device
+            invalidate_user_sessions(restaurant, keep_token=token)
 
         if args.get('phone') and args.get('phone') != restaurant.phone:
             restaurant.phone = args['phone']
@@ -147,6 +155,13 @@ class RestaurantUpdate(Resource):
         if args.get('description') and args.get('description') != restaurant.description:
             restaurant.description = args['description']
 
+        # checked above: both times, or both empty
+        if args.get('opening_time') is not None:
+            restaurant.opening_time = time.fromisoformat(args['opening_time']) \
+                if args['opening_time'] else None
+            restaurant.closing_time = time.fromisoformat(args['closing_time']) \
+                if args['closing_time'] else None
+
         # process images if given
         if args.get('image1'):
             url = save_image(args['image1'])
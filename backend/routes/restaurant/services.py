@@ -9,13 +9,15 @@ from routes.restaurant.models import *
 def is_valid_restaurant_info(args) -> Tuple[bool, str]:
     """
     Check fields of args which is a dictionary of restaurant's information.
-    Password, Phone, State, Postcode, ABN is checked.
+    Password, Phone, State, Postcode, ABN, Opening Hours is checked.
     """
     password = args.get('password')
     phone = args.get('phone')
     state = args.get('state')
     postcode = args.get('postcode')
     abn = args.get('abn')
+    opening_time = args.get('opening_time')
+    closing_time = args.get('closing_time')
 
     if password:
         is_safe, msg = is_password_safe(password)
@@ -33,5 +35,13 @@ def is_valid_restaurant_info(args) -> Tuple[bool, str]:
     if abn:
         if not is_valid_abn(abn):
             return False, 'Invalid Phone Number'
-        
+    if opening_time is not None or closing_time is not None:
+        # both times, or both empty for always open
+        if opening_time is None or closing_time is None or bool(opening_time) != bool(closing_time):
+            return False, 'Both Opening and Closing Time Are Needed'
+        if opening_time and not (
+            is_valid_time_of_day(opening_time) and is_valid_time_of_day(closing_time)
+        ):
+            return False, 'Invalid Opening Hours'
+
     return True, 'Valid Information'
\ No newline at end of file
@@ -1,12 +1,12 @@
 """APIs for Restaurant Menu Related"""
 from flask_restx import Resource
-from flask import request
+from flask import request, Response
 
 from utils.db import db
 from utils.file import save_image
 from utils.header import auth_header, tokenize
 from utils.response import res_error
-from db_model import MenuCategory, MenuItem, Restaurant
+from db_model import MenuCategory, MenuItem
 from db_model.db_query import (
     get_restaurant_by_token,
     filter_menu_categories,
@@ -23,6 +23,9 @@ from routes.restaurant_menu.models import (
     menu_category_model,
     menu_item_model
 )
+from routes.restaurant_menu.services import (
+    bump_menu_version, forget_menu_version, get_full_menu_snapshot, remove_menu_items
+)
 
 # A restaurant can create a new menu category,
 # or update the existing menu category name
@@ -73,7 +76,9 @@ class NewMenuCategory(Resource):
             name=name
         )
         db.session.add(category)
+        bump_menu_version(restaurant)
         db.session.commit()
+        forget_menu_version(restaurant.id)
         return category.dict(), 200
 
 @api.route('/category/<int:category_id>')
@@ -128,7 +133,9 @@ class MenuCategoryUpdate(Resource):
 
         # Update and commit
         category.name = new_name
+        bump_menu_version(restaurant)
         db.session.commit()
+        forget_menu_version(restaurant.id)
 
         return category.dict(), 200
 
@@ -149,9 +156,16 @@ class MenuCategoryUpdate(Resource):
         if not categories:
             return res_error(404, "Category not found")
 
-        # Update and commit
-        db.session.delete(categories[0])
+        # Delete its items with it and commit
+        category = categories[0]
+        item_ids = [item.id for item in filter_menus(category_id = category.id)]
+        if remove_menu_items(item_ids):
+            category.is_deleted = True
+        else:
+            db.session.delete(category)
+        bump_menu_version(restaurant)
         db.session.commit()
+        forget_menu_version(restaurant.id)
 
         return {'message': 'Category deleted successfully'}, 200
 
@@ -261,7 +275,9 @@ class NewMenuItem(Resource):
 
         # Push and commit
         db.session.add(new_item)
+        bump_menu_version(restaurant)
         db.session.commit()
+        forget_menu_version(restaurant.id)
 
         return new_item.dict(), 200
 
@@ -305,7 +321,8 @@ class ManageMenuItem(Resource):
             is_exist = MenuItem.query.join(MenuCategory).filter(
                 MenuCategory.restaurant_id == restaurant.id,
                 MenuItem.name == args['name'],
-                MenuItem.id != menu_id
+                MenuItem.id != menu_id,
+                MenuItem.is_deleted.is_(False)
             ).first()
 
             if is_exist:
@@ -324,7 +341,9 @@ class ManageMenuItem(Resource):
                 return res_error(400, "Availability Must be 'true' or 'false'")
             item.is_available=True if str(args['is_available']) == 'true' else False
 
+        bump_menu_version(restaurant)
         db.session.commit()
+        forget_menu_version(restaurant.id)
         return item.dict(), 200
 
     @api.expect(auth_header)
@@ -333,7 +352,7 @@ class ManageMenuItem(Resource):
     @api.response(401, "Unauthorised", message_res)
     @api.response(404, "Not Found", message_res)
     def delete(self, menu_id: int):
-        """Delete a menu item permenantly"""
+        """Delete a menu item, kept hidden for the past orders of it"""
         # Authenticate
         restaurant = get_restaurant_by_token(tokenize(request.headers))
         if not restaurant:
@@ -348,9 +367,11 @@ class ManageMenuItem(Resource):
         if not item:
             return res_error(404, 'Menu item not found')
 
-        # Delete and commit
-        db.session.delete(item)
+        # Delete and commit, the item leaves the carts with it
+        remove_menu_items([item.id])
+        bump_menu_version(restaurant)
         db.session.commit()
+        forget_menu_version(restaurant.id)
 
         return {'message': 'Menu item deleted successfully'}, 200
 
@@ -359,28 +380,23 @@ class ManageMenuItem(Resource):
 # no need to authenticate
 @api.route("/<int:restaurant_id>")
 class FullMenu(Resource):
-    @api.response(200, "Success, return the full menu")
+    @api.response(200, "Success, return the full menu with its ETag")
+    @api.response(304, "Not modified, the menu of the If-None-Match ETag is current")
     @api.response(400, "Bad request, invalid restaurant id")
     def get(self, restaurant_id):
         """Obtain the full menu of a restuarnat using the id"""
 
-        restaurant = Restaurant.query.get(restaurant_id)
-        if not restaurant:
+        # the menu is served from the cache until the restaurant changes it
+        snapshot = get_full_menu_snapshot(restaurant_id)
+        if not snapshot:
             return res_error(400, "Invalid Restaurant ID")
 
-        # get all the categories, order by the id
-        categories = MenuCategory.query.filter_by(restaurant_id=restaurant_id).order_by(MenuCategory.id).all()
-
-        # for each category, get all the items in that category
-        response = []
-
-        for category in categories:
-            items = MenuItem.query.filter_by(category_id=category.id).all()
-            items_dicts = [item.dict() for item in items]
-            category_dict = category.dict()
+        if request.if_none_match.contains(snapshot.etag):
+            response = Response(status=304)
+        else:
+            response = Response(snapshot.body, mimetype='application/json')
 
-            # add to the items
-            category_dict['items'] = items_dicts
-            response.append(category_dict)
-        
-        return response, 200
+        # the client may keep the menu, but must check the ETag before using it
+        response.set_etag(snapshot.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
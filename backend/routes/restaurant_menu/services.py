@@ -0,0 +1,106 @@
+"""Helper functions for Restaurant Menu API"""
+import hashlib
+import json
+from typing import Dict, List, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import and_
+from utils.cache import TTLCache
+from utils.db import db
+from db_model import CartItem, MenuCategory, MenuItem, OrderItem, Restaurant
+
+class MenuSnapshot(NamedTuple):
+    """The serialised full menu of a restaurant and its strong ETag"""
+    body: bytes
+    etag: str
+
+# restaurant_id -> menu_version, kept MENU_VERSION_CACHE_TTL seconds (settings.py).
+# Another worker's update is picked up once the entry expires,
+# the worker doing the update drops its entry once committed.
+menu_versions = TTLCache(maxsize=4096)
+
+# (restaurant_id, menu_version) -> MenuSnapshot, a new version is a new key
+menu_snapshots = TTLCache(maxsize=1024, ttl=24 * 60 * 60)
+
+def bump_menu_version(restaurant: Restaurant) -> None:
+    """
+    Mark the menu of the restaurant as changed. The caller commits, then calls
+    forget_menu_version: dropped before, the old version could be cached again.
+    """
+    # increment in SQL so concurrent updates are not lost
+    restaurant.menu_version = Restaurant.menu_version + 1
+
+def forget_menu_version(restaurant_id: int) -> None:
+    """Drop the cached menu version of the restaurant, after a change is committed"""
+    menu_versions.pop(restaurant_id)
+
+def get_menu_version(restaurant_id: int) -> Optional[int]:
+    """Current menu version of the restaurant, None if the restaurant does not exist"""
+    version = menu_versions.get(restaurant_id)
+    if version is None:
+        version = db.session.query(Restaurant.menu_version)\
+            .filter(Restaurant.id == restaurant_id).scalar()
+        if version is None:
+            return None
+        ttl = current_app.config['MENU_VERSION_CACHE_TTL']
+        if ttl > 0:
+            menu_versions.set(restaurant_id, version, ttl)
+    return version
+
+def build_full_menu(restaurant_id: int) -> List[Dict]:
+    """Categories ordered by id, each with its items, read with one query"""
+    rows = (
+        db.session.query(MenuCategory, MenuItem)
+        .outerjoin(MenuItem, and_(
+            MenuItem.category_id == MenuCategory.id, MenuItem.is_deleted.is_(False)
+        ))
+        .filter(MenuCategory.restaurant_id == restaurant_id, MenuCategory.is_deleted.is_(False))
+        .order_by(MenuCategory.id, MenuItem.id)
+        .all()
+    )
+
+    menu: Dict[int, Dict] = {}
+    for category, item in rows:
+        if category.id not in menu:
+            menu[category.id] = {**category.dict(), 'items': []}
+        if item is not None:
+            menu[category.id]['items'].append(item.dict())
+    return list(menu.values())
+
+def get_full_menu_snapshot(restaurant_id: int) -> Optional[MenuSnapshot]:
+    """
+    The cached full menu of the restaurant, None if the restaurant does not exist.
+    A repeat view of an unchanged menu does not touch the database.
+    """
+    version = get_menu_version(restaurant_id)
+    if version is None:
+        return None
+
+    snapshot = menu_snapshots.get((restaurant_id, version))
+    if snapshot is None:
+        body = json.dumps(build_full_menu(restaurant_id)).encode()
+        # the tag follows the content, so it stays valid across db resets
+        snapshot = MenuSnapshot(body, hashlib.sha256(body).hexdigest()[:32])
+        menu_snapshots.set((restaurant_id, version), snapshot)
+    return snapshot
+
+def remove_menu_items(menu_ids: List[int]) -> bool:
+    """
+    Remove the menu items from the menu and from the carts, the caller commits.
+    The items of past orders are kept for them, only marked deleted and unavailable.
+    Return whether some items were kept.
+    """
+    if not menu_ids:
+        return False
+    CartItem.query.filter(CartItem.menu_id.in_(menu_ids)).delete(synchronize_session=False)
+    ordered = [
+        menu_id for menu_id, in db.session.query(OrderItem.menu_id)
+        .filter(OrderItem.menu_id.in_(menu_ids)).distinct()
+    ]
+    if ordered:
+        MenuItem.query.filter(MenuItem.id.in_(ordered)).update(
+            {MenuItem.is_deleted: True, MenuItem.is_available: False}, synchronize_session=False
+        )
+    MenuItem.query.filter(MenuItem.id.in_(menu_ids), MenuItem.id.notin_(ordered))\
+        .delete(synchronize_session=False)
+    return bool(ordered)
@@ -1,5 +1,6 @@
 """Flask restx models for restaurant order"""
 from flask_restx import Namespace, fields
+from utils.pagination import page_model
 
 api = Namespace('restaurant-order', description='APIs for Restaurant Order')
 
@@ -39,3 +40,6 @@ get_single_order_res = api.model("Get Single Order Response", {
 get_all_orders_res = api.model("Get All Orders Response", {
     'orders': fields.List(fields.Nested(get_single_order_res))
 })
+
+# Page of detailed orders, see utils/pagination.py
+orders_page_res = page_model(api, "Detailed Orders Page")
@@ -1,4 +1,5 @@
 """APIs for Restaurnt Order feature"""
+from datetime import datetime
 from typing import List
 from flask_restx import Resource
 from flask import request
@@ -6,20 +7,26 @@ from flask import request
 from utils.db import db
 from utils.header import auth_header, tokenize
 from utils.response import res_error
+from utils.pagination import pagination_parser, get_page_args, page_response
+from utils.prep_time import forget_prep_stats, record_prep_time
 
 from db_model import Order
 from db_model.db_query import (
+    count_accepted_orders,
     filter_orders,
     get_restaurant_by_token,
-    get_order_by_order_id
+    format_orders_with_details,
+    transition_order
 )
-from db_model.db_enum import OrderStatus
+from db_model.db_enum import DRIVER_CLAIMABLE_STATUSES, OrderStatus
 from routes.restaurant_order.models import (
     api,
     error_res,
     get_all_orders_res,
+    orders_page_res,
 )
-from routes.restaurant_order.services import is_valid_order_action
+from routes.restaurant_order.services import ORDER_ACTIONS, is_valid_order_action
+from routes.order_event.services import publish_order_event, record_order_event
 
 @api.route('/orders/pending')
 class GetPendingOrders(Resource):
@@ -34,11 +41,10 @@ class GetPendingOrders(Resource):
         if not restaurant:
             return res_error(401)
 
-        orders = filter_orders(restaurant_id = restaurant.id)
-        pending_orders: List[Order] = []
-        for order in orders:
-            if order.order_status == OrderStatus.PENDING:
-                pending_orders.append(order)
+        pending_orders: List[Order] = filter_orders(
+            restaurant_id = restaurant.id,
+            order_status = OrderStatus.PENDING
+        )
 
         return {
             'orders': [pending_order.dict() for pending_order in pending_orders]
@@ -57,15 +63,14 @@ class GetActiveOrders(Resource):
         if not restaurant:
             return res_error(401)
 
-        orders = filter_orders(restaurant_id = restaurant.id)
-
-        active_orders: List[Order] = []
-        for order in orders:
-            status = order.order_status
-            if status == OrderStatus.RESTAURANT_ACCEPTED\
-                or status == OrderStatus.READY_FOR_PICKUP\
-                or status == OrderStatus.PICKED_UP:
-                active_orders.append(order)
+        active_orders: List[Order] = filter_orders(
+            restaurant_id = restaurant.id,
+            order_status = [
+                OrderStatus.RESTAURANT_ACCEPTED,
+                OrderStatus.READY_FOR_PICKUP,
+                OrderStatus.PICKED_UP,
+            ]
+        )
 
         return {
             'orders': [active_order.dict() for active_order in active_orders]
@@ -84,14 +89,10 @@ class GetCompleteOrders(Resource):
         if not restaurant:
             return res_error(401)
 
-        orders = filter_orders(restaurant_id = restaurant.id)
-
-        complete_orders: List[Order] = []
-        for order in orders:
-            status = order.order_status
-            if status == OrderStatus.DELIVERED\
-                or status == OrderStatus.CANCELLED:
-                complete_orders.append(order)
+        complete_orders: List[Order] = filter_orders(
+            restaurant_id = restaurant.id,
+            order_status = [OrderStatus.DELIVERED, OrderStatus.CANCELLED]
+        )
 
         return {
             'orders': [complete_order.dict() for complete_order in complete_orders]
@@ -113,8 +114,8 @@ class GetCompleteOrders(Resource):
 })
 class OrderResourceVe(Resource):
     @api.doc(description="Get all orders for my restaurant via order_type, orders are sorted reverse time order")
-    @api.expect(auth_header)
-    @api.response(200, 'Success')
+    @api.expect(auth_header, pagination_parser)
+    @api.response(200, 'Success. A page envelope when after / limit is given', orders_page_res)
     @api.response(400, 'Bad Request', error_res)
     @api.response(401, 'Unauthorised', error_res)
     def get(self, order_type):
@@ -124,23 +125,22 @@ class OrderResourceVe(Resource):
         if not restaurant:
             return res_error(401)
         
+        page = get_page_args(pagination_parser.parse_args())
         if order_type == 'pending':
-            orders = filter_orders(restaurant_id = restaurant.id, order_status = OrderStatus.PENDING)
+            order_status = OrderStatus.PENDING
         elif order_type == 'accepted':
-            orders = filter_orders(restaurant_id = restaurant.id, order_status = OrderStatus.RESTAURANT_ACCEPTED)
+            order_status = OrderStatus.RESTAURANT_ACCEPTED
         elif order_type == 'ready_for_pickup':
-            orders = filter_orders(restaurant_id = restaurant.id, order_status = OrderStatus.READY_FOR_PICKUP)
+            order_status = OrderStatus.READY_FOR_PICKUP
         elif order_type == 'all':
-            orders = filter_orders(restaurant_id = restaurant.id)
+            order_status = None
         else:
             return res_error(400, 'Invalid Order Type')
-        
+
+        orders = filter_orders(restaurant_id = restaurant.id, order_status = order_status, page = page)
+
         # format the result
-        results = []
-        for order in orders:
-            results.append(get_order_by_order_id(order.id))
-        
-        return results, 200
+        return page_response(orders, format_orders_with_details), 200
 
 
 # for a restaurant, get a single order
@@ -166,7 +166,7 @@ class SingleOrder(Resource):
         if not order:
             return res_error(400, 'Invalid Order ID')
 
-        return get_order_by_order_id(order.id), 200
+        return format_orders_with_details([order])[0], 200
 
 @api.route('/orders/<string:action>/<int:order_id>')
 @api.doc(params={
@@ -189,8 +189,8 @@ class OrderActions(Resource):
         restaurant = get_restaurant_by_token(tokenize(request.headers))
         if not restaurant:
             return res_error(401)
-        # Get the Order
-        orders = filter_orders(id = order_id)
+        # Get the Order, only of this restaurant
+        orders = filter_orders(id = order_id, restaurant_id = restaurant.id)
         if not orders:
             return res_error(400, 'Invalid Order ID')
         order = orders[0]
@@ -199,16 +199,31 @@ class OrderActions(Resource):
         if not is_valid_order_action(action):
             return res_error(400, 'Invalid Action for Order')
 
-        msg: str = ''
-        if action == 'accept':
-            order.order_status = OrderStatus.RESTAURANT_ACCEPTED
-            msg = 'Order Accepted'
-        elif action == 'reject':
-            order.order_status = OrderStatus.CANCELLED
-            msg = 'Order Cancelled'
-        elif action == 'ready':
-            order.order_status = OrderStatus.READY_FOR_PICKUP
-            msg = 'Order Ready for Pickup'
-
+        new_status, msg = ORDER_ACTIONS[action]
+        old_status = order.order_status
+        if not old_status.can_move_to(new_status):
+            return res_error(400, f'Cannot {action} an order {old_status.value}')
+
+        # the kitchen queue it joins, and when it is ready, for the preparation times
+        values = {}
+        if new_status == OrderStatus.RESTAURANT_ACCEPTED:
+            values['kitchen_queue'] = count_accepted_orders(restaurant.id)
+        elif new_status == OrderStatus.READY_FOR_PICKUP:
+            values['ready_time'] = datetime.now()
+
+        # change it only if nobody changed it since it was read
+        if not transition_order(order, new_status, Order.restaurant_id == restaurant.id, **values):
+            db.session.rollback()
+            return res_error(409, 'Order Changed, Please Reload')
+        if new_status == OrderStatus.READY_FOR_PICKUP:
+            record_prep_time(order, values['ready_time'])
+        # drivers see it from its acceptance until a driver takes it or it is cancelled
+        in_pool = order.driver_id is None and (
+            old_status in DRIVER_CLAIMABLE_STATUSES or new_status in DRIVER_CLAIMABLE_STATUSES
+        )
+        event = record_order_event(order, old_status, in_pool=in_pool)
         db.session.commit()
+        if new_status == OrderStatus.READY_FOR_PICKUP:
+            forget_prep_stats(restaurant.id)
+        publish_order_event(event)
         return {'message': msg}, 200
\ No newline at end of file
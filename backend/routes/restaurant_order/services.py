@@ -1,5 +1,12 @@
 from db_model import *
 from db_model.db_query import *
 
+# action -> (new order status, response message)
+ORDER_ACTIONS = {
+    'accept': (OrderStatus.RESTAURANT_ACCEPTED, 'Order Accepted'),
+    'reject': (OrderStatus.CANCELLED, 'Order Cancelled'),
+    'ready': (OrderStatus.READY_FOR_PICKUP, 'Order Ready for Pickup'),
+}
+
 def is_valid_order_action(action: str) -> bool:
-    return action in ['accept', 'reject', 'ready']
\ No newline at end of file
+    return action in ORDER_ACTIONS
\ No newline at end of file
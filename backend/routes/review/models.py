@@ -1,6 +1,7 @@
 """Flask Restx model for Review APIs"""
 from flask_restx import Namespace, reqparse, fields
 from werkzeug.datastructures import FileStorage
+from utils.pagination import page_model
 
 api = Namespace('review', description='APIs for Rating Restaurant/Driver')
 
@@ -31,9 +32,15 @@ review_model = api.model('Individual Review', {
 get_reviews_reponse = api.model('Get ratings response', {
     'avg_rating': fields.Float(),
     'n_reviews': fields.Integer(),
-    'reviews': fields.List(fields.Nested(review_model))
+    'reviews': fields.List(fields.Nested(review_model)),
+    'next_cursor': fields.String(
+        description='Only when after / limit is given. Pass as `after` to get the next page'
+    )
 })
 
+# Page of reviews with the reviewed restaurant / driver, see utils/pagination.py
+reviews_page_res = page_model(api, 'Reviews Page')
+
 reply_req = api.model('Reply to Customer Review', {
     'reply': fields.String(required=True)
 })
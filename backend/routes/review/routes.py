@@ -7,7 +7,8 @@ from utils.header import auth_header, tokenize
 from utils.response import res_error
 from utils.db import db
 from utils.file import save_image
-from db_model import RestaurantReview, DriverReview
+from utils.pagination import pagination_parser, get_page_args, page_response, Page
+from db_model import RestaurantReview, DriverReview, Restaurant, Driver
 from db_model.db_query import (
     get_customer_by_token, get_driver_by_token, get_restaurant_by_token,
     filter_restaurants, filter_drivers,
@@ -17,8 +18,10 @@ from db_model.db_query import (
 from db_model.db_enum import OrderStatus
 from routes.review.models import (
     api, message_res, rating_req_parser, 
-    get_reviews_reponse, reply_req, review_model
+    get_reviews_reponse, reply_req, review_model,
+    reviews_page_res
 )
+from routes.review.services import update_rating_totals, format_reviews
 
 @api.route('/restaurant/<int:restaurant_id>/order/<int:order_id>')
 class RateRestaurant(Resource):
@@ -39,8 +42,10 @@ class RateRestaurant(Resource):
         if not customer:
             return res_error(401, 'Customer Not Found')
         # Find the restaurant
-        if not filter_restaurants(id=restaurant_id):
+        restaurants = filter_restaurants(id=restaurant_id)
+        if not restaurants:
             return res_error(400, 'Given Restaurant ID Is Not Valid')
+        restaurant = restaurants[0]
         # Check the argument
         args = rating_req_parser.parse_args()
         if not args.get('rating') or not 1 <= args.get('rating') <= 5:
@@ -76,10 +81,12 @@ class RateRestaurant(Resource):
             )
 
             db.session.add(review)
+            update_rating_totals(restaurant, new_rating=review.rating)
             db.session.commit()
         
         # now update the review
         if args.get('rating'):
+            update_rating_totals(restaurant, review.rating, args.get('rating'))
             review.rating = args.get('rating')
 
         if args.get('review_text'):
@@ -116,8 +123,10 @@ class RateDriver(Resource):
         if not customer:
             return res_error(401, 'Customer Not Found')
         # Find the driver
-        if not filter_drivers(id=driver_id):
+        drivers = filter_drivers(id=driver_id)
+        if not drivers:
             return res_error(400, 'Given Driver ID Is Not Valid')
+        driver = drivers[0]
         # Check the argument
         args = rating_req_parser.parse_args()
         if not args.get('rating') or not 1 <= args.get('rating') <= 5:
@@ -153,10 +162,12 @@ class RateDriver(Resource):
             )
 
             db.session.add(review)
+            update_rating_totals(driver, new_rating=review.rating)
             db.session.commit()
         
         # now update the review
         if args.get('rating'):
+            update_rating_totals(driver, review.rating, args.get('rating'))
             review.rating = args.get('rating')
 
         if args.get('review_text'):
@@ -185,34 +196,34 @@ class RateDriver(Resource):
 })
 class GetReviewsOf(Resource):
     '''Get All Reviews Of Restaurant/Driver Without Token'''
-    @api.response(200, 'Success', get_reviews_reponse)
+    @api.expect(pagination_parser)
+    @api.response(200, 'Success. next_cursor is given when after / limit is given', get_reviews_reponse)
     def get(self, user_type: str, user_id: int):
         '''Get all reviews of a restaurant / driver without token'''
+        page = get_page_args(pagination_parser.parse_args())
         if user_type == 'driver':
-            if not filter_drivers(id=user_id):
+            targets = filter_drivers(id=user_id)
+            if not targets:
                 return res_error(400, 'Driver ID Invalid')
-            reviews = filter_driver_reviews(driver_id=user_id)
+            reviews = filter_driver_reviews(driver_id=user_id, page=page)
         elif user_type == 'restaurant':
-            if not filter_restaurants(id=user_id):
+            targets = filter_restaurants(id=user_id)
+            if not targets:
                 return res_error(400, 'Restaurant ID Invalid')
-            reviews = filter_restaurant_reviews(restaurant_id=user_id)
+            reviews = filter_restaurant_reviews(restaurant_id=user_id, page=page)
         else:
             return res_error(400, 'Invalid User Type')
-        
-        review_list = []
-        total = 0
-        for review in reviews:
-            total += review.rating
-            review_list.append(review.format())
 
         # return the average rating, number of reviews, and the reviews
-        avg_rating = 0 if len(reviews) == 0 else total / len(reviews)
-
         response = {
-            'avg_rating': avg_rating,
-            'n_reviews': len(reviews),
-            'reviews': review_list
+            'avg_rating': targets[0].get_avg_rating(),
+            'n_reviews': targets[0].rating_count,
         }
+        if isinstance(reviews, Page):
+            response['reviews'] = format_reviews(reviews.items)
+            response['next_cursor'] = reviews.next_cursor
+        else:
+            response['reviews'] = format_reviews(reviews)
 
         return response, 200
 
@@ -279,11 +290,15 @@ class DeleteReview(Resource):
         # both reviews are together
         if restaurant_reviews:
             review = restaurant_reviews[0]
+            restaurant = db.session.get(Restaurant, review.restaurant_id)
+            update_rating_totals(restaurant, old_rating=review.rating)
             db.session.delete(review)
             db.session.commit()
         
         if driver_reviews:
             review = driver_reviews[0]
+            driver = db.session.get(Driver, review.driver_id)
+            update_rating_totals(driver, old_rating=review.rating)
             db.session.delete(review)
             db.session.commit()
 
@@ -292,8 +307,8 @@ class DeleteReview(Resource):
 @api.route('/about-me')
 class GetMyReviewByCustomer(Resource):
     '''Get all customer reviews about me'''
-    @api.expect(auth_header)
-    @api.response(200, 'Successful Deletion', message_res)
+    @api.expect(auth_header, pagination_parser)
+    @api.response(200, 'Success. A page envelope when after / limit is given', reviews_page_res)
     @api.response(400, 'Invalid Review Type', message_res)
     @api.response(404, 'Review Not Found', message_res)
     def get(self):
@@ -307,13 +322,16 @@ class GetMyReviewByCustomer(Resource):
             return res_error(401, 'Invalid Token')
 
         # filter out all the reviews about me
+        page = get_page_args(pagination_parser.parse_args())
         if driver:
-            reviews = filter_driver_reviews(driver_id=driver.id)
+            reviews = filter_driver_reviews(driver_id=driver.id, page=page)
         elif restaurant:
-            reviews = filter_restaurant_reviews(restaurant_id=restaurant.id)
+            reviews = filter_restaurant_reviews(restaurant_id=restaurant.id, page=page)
 
         # return all the reviews
-        response = [r.format_with_target_profile() for r in reviews]
+        response = page_response(
+            reviews, lambda rows: [r.format_with_target_profile() for r in rows]
+        )
         return response, 200
 
 @api.route('/order/<int:order_id>')
@@ -1 +1,63 @@
-"""Helper functions for Review API"""
\ No newline at end of file
+"""Helper functions for Review API"""
+from typing import Dict, List, Optional, Union
+from sqlalchemy import func
+from utils.db import db
+from db_model import Customer, Driver, Restaurant, DriverReview, RestaurantReview
+from db_model.order.review import BaseReviewFormat
+
+def update_rating_totals(
+    target: Union[Driver, Restaurant],
+    old_rating: Optional[float] = None,
+    new_rating: Optional[float] = None
+) -> None:
+    """
+    Apply a review change to the rating totals of the reviewed restaurant / driver.
+    old_rating is None for a new review, new_rating is None for a deleted review.
+    The caller commits.
+    """
+    delta_sum = (new_rating or 0) - (old_rating or 0)
+    delta_count = (new_rating is not None) - (old_rating is not None)
+    if not delta_sum and not delta_count:
+        return
+
+    # update in SQL (rating_sum = rating_sum + ?) so concurrent reviews are not lost
+    model = type(target)
+    target.rating_sum = model.rating_sum + delta_sum
+    target.rating_count = model.rating_count + delta_count
+
+def format_reviews(reviews: List[Union[DriverReview, RestaurantReview]]) -> List[BaseReviewFormat]:
+    """Format the reviews, loading all the reviewers with one query"""
+    customer_ids = {review.customer_id for review in reviews}
+    customers: Dict[int, Customer] = {
+        customer.id: customer
+        for customer in Customer.query.filter(Customer.id.in_(customer_ids)).all()
+    } if customer_ids else {}
+
+    return [review.format(customers.get(review.customer_id)) for review in reviews]
+
+def reconcile_ratings() -> int:
+    """
+    Recompute the rating totals of every restaurant and driver from the reviews.
+    Return the number of users whose totals were wrong.
+    """
+    fixed = 0
+    for model, review_model, target_id in [
+        (Restaurant, RestaurantReview, RestaurantReview.restaurant_id),
+        (Driver, DriverReview, DriverReview.driver_id),
+    ]:
+        totals = {
+            user_id: (rating_sum, rating_count)
+            for user_id, rating_sum, rating_count in db.session.query(
+                target_id, func.sum(review_model.rating), func.count(review_model.id)
+            ).group_by(target_id).all()
+        }
+
+        for user in model.query.all():
+            rating_sum, rating_count = totals.get(user.id, (0, 0))
+            if user.rating_sum != rating_sum or user.rating_count != rating_count:
+                user.rating_sum = rating_sum
+                user.rating_count = rating_count
+                fixed += 1
+
+    db.session.commit()
+    return fixed
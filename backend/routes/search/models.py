@@ -1,16 +1,45 @@
 """Flask-restx model for Search APIs"""
-from flask_restx import Namespace, reqparse
+from flask_restx import Namespace, inputs
+from utils.pagination import page_model, pagination_parser
 
 api = Namespace(
     'search', 
     description='APIs for search DB for General Info. This does not require token'
 )
 
-# ADD MORE FILTER
-search_menu_req_parser = reqparse.RequestParser()
+# The words are matched as prefixes, e.g. 'piz' finds 'Pizza'
+search_menu_req_parser = pagination_parser.copy()
+search_menu_req_parser.add_argument(
+    'q', type=str, required=False, help='Words in the menu name or description'
+)
 search_menu_req_parser.add_argument('restaurant_name', type=str, required=False)
 search_menu_req_parser.add_argument('menu_name', type=str, required=False)
+search_menu_req_parser.add_argument(
+    'suburb', type=str, required=False, help='Suburb of the restaurant'
+)
+search_menu_req_parser.add_argument('is_available', type=inputs.boolean, required=False)
 
-# ADD MORE FILTER: Rating, Distance
-search_restaurant_req_parser = reqparse.RequestParser()
+# With a postcode, only the restaurants around it are found, the nearest first
+search_restaurant_req_parser = pagination_parser.copy()
+search_restaurant_req_parser.add_argument(
+    'q', type=str, required=False, help='Words in the name, suburb or description'
+)
 search_restaurant_req_parser.add_argument('restaurant_name', type=str, required=False)
+search_restaurant_req_parser.add_argument('suburb', type=str, required=False)
+search_restaurant_req_parser.add_argument(
+    'postcode', type=str, required=False, help='Postcode of the delivery address'
+)
+search_restaurant_req_parser.add_argument(
+    'radius_km', type=float, required=False,
+    help='Radius around the postcode, at most 50 km (default 15), needs postcode'
+)
+search_restaurant_req_parser.add_argument(
+    'min_rating', type=float, required=False, help='Lowest average rating, 0 to 5'
+)
+search_restaurant_req_parser.add_argument(
+    'open_now', type=inputs.boolean, required=False, help='Only the restaurants open now'
+)
+
+# Pages of the search results, see utils/pagination.py
+menus_page_res = page_model(api, 'Menu Items Page')
+restaurants_page_res = page_model(api, 'Restaurants Page')
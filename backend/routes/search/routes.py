@@ -1,52 +1,91 @@
 """General Search APIs"""
+from datetime import datetime
 from flask_restx import Resource
+from utils.geo import postcodes_within
 from utils.response import res_error
-from db_model import Restaurant, MenuItem, MenuCategory, Order
-from db_model.db_query import get_order_by_order_id
+from utils.pagination import get_page_args, page_response
+from db_model import Order
+from db_model.db_query import get_order_by_order_id, search_menu_items, search_restaurants
 from routes.search.models import (
     api,
     search_menu_req_parser,
-    search_restaurant_req_parser
+    search_restaurant_req_parser,
+    menus_page_res,
+    restaurants_page_res
 )
 
+# radius of the restaurant search around a postcode
+DEFAULT_SEARCH_RADIUS_KM = 15
+MAX_SEARCH_RADIUS_KM = 50
+
 @api.route('/menu')
 class SearchMenu(Resource):
     """Route: /search/menu"""
     @api.expect(search_menu_req_parser)
+    @api.response(200, 'Success. A page envelope when after / limit is given', menus_page_res)
     def get(self):
-        """Get the Full Menu list of a given Restaurant"""
+        """Search the menu items of all restaurants, the most relevant first"""
         # Get the search filter
         args = search_menu_req_parser.parse_args()
-        restaurant_name = args.get('restaurant_name')
-        menu_name = args.get('menu_name')
-
-        query = MenuItem.query.join(MenuCategory).join(Restaurant)
-
-        if restaurant_name:
-            query = query.filter(Restaurant.name.ilike(f"%{restaurant_name}%"))
-        if menu_name:
-            query = query.filter(MenuItem.name.ilike(f"%{menu_name}%"))
 
-        menus = query.all()
-        return [menu.dict() for menu in menus], 200
+        menus = search_menu_items(
+            text = args.get('q'),
+            name = args.get('menu_name'),
+            restaurant_name = args.get('restaurant_name'),
+            suburb = args.get('suburb'),
+            is_available = args.get('is_available'),
+            page = get_page_args(args)
+        )
+        return page_response(menus, lambda rows: [menu.dict() for menu in rows]), 200
 
 @api.route('/restaurant')
 class SearchRestaurant(Resource):
-    """Route: /search/menu"""
+    """Route: /search/restaurant"""
     @api.expect(search_restaurant_req_parser)
+    @api.response(200, 'Success. A page envelope when after / limit is given', restaurants_page_res)
+    @api.response(400, 'Bad Request')
     def get(self):
-        """Get the Full List of matching restaurant"""
+        """
+        Get the Full List of matching restaurant, the most relevant first.
+        With a postcode: the restaurants within radius_km of it, the nearest first,
+        each with its distance_km (between the postcode centres).
+        """
         # Get the search filter
         args = search_restaurant_req_parser.parse_args()
-        restaurant_name = args.get('restaurant_name')
 
-        query = Restaurant.query
+        near = None
+        if args.get('postcode'):
+            radius_km = args.get('radius_km')
+            if radius_km is None:
+                radius_km = DEFAULT_SEARCH_RADIUS_KM
+            # 0 keeps the restaurants of the postcode itself
+            if not 0 <= radius_km <= MAX_SEARCH_RADIUS_KM:
+                return res_error(
+                    400, f'radius_km must be between 0 and {MAX_SEARCH_RADIUS_KM}'
+                )
+            near = postcodes_within(args['postcode'], radius_km)
+            if near is None:
+                return res_error(400, 'Unknown Postcode')
+
+        min_rating = args.get('min_rating')
+        if min_rating is not None and not 0 <= min_rating <= 5:
+            return res_error(400, 'min_rating must be between 0 and 5')
 
-        if restaurant_name:
-            query = query.filter(Restaurant.name.ilike(f"%{restaurant_name}%"))
+        restaurants = search_restaurants(
+            text = args.get('q'),
+            name = args.get('restaurant_name'),
+            suburb = args.get('suburb'),
+            page = get_page_args(args),
+            near = near,
+            min_rating = min_rating,
+            open_at = datetime.now().time() if args.get('open_now') else None
+        )
 
-        restaurants = query.all()
-        return [restaurant.dict() for restaurant in restaurants], 200
+        def format_rows(rows):
+            if near is None:
+                return [r.dict() for r in rows]
+            return [dict(r.dict(), distance_km=near[r.postcode]) for r in rows]
+        return page_response(restaurants, format_rows), 200
 
 @api.route('/order/<int:order_id>')
 class SearchOrderGeneral(Resource):
@@ -0,0 +1,26 @@
+"""Flask-Restx Models for Upload Job APIs"""
+from flask_restx import Namespace, fields, reqparse
+
+api = Namespace('upload', description='APIs for the Status of Uploaded Files')
+
+"""General Message Response"""
+message_res = api.model('Message', {
+    'message': fields.String(description='Descriptive message', example='Some Description')
+})
+
+"""Status of an upload job"""
+upload_job_model = api.model('Upload Job Model', {
+    'id': fields.String(description='Job ID, from the X-Upload-Jobs response header'),
+    'status': fields.String(
+        description='PENDING, PROCESSING, DONE or FAILED', example='DONE'
+    ),
+    'url': fields.String(description='URL of the file once DONE', example='uploads/abc.png'),
+    'error': fields.String(description='Why the file was rejected, when FAILED'),
+})
+
+"""Job Status Request"""
+upload_job_parser = reqparse.RequestParser()
+upload_job_parser.add_argument(
+    'wait', type=int, location='args', required=False,
+    help='Seconds (at most 30) to wait for the job to finish before answering'
+)
@@ -0,0 +1,43 @@
+"""APIs for the Status of Uploaded Files"""
+import time
+from flask_restx import Resource
+
+from utils.db import db
+from utils.response import res_error
+from db_model.db_enum import UploadJobStatus
+from db_model.db_query import get_upload_job
+from routes.upload.models import api, message_res, upload_job_model, upload_job_parser
+
+# the longest wait of a request, and the time between two reads of the job
+MAX_WAIT = 30
+POLL_INTERVAL = 0.2
+
+@api.route('/job/<string:job_id>')
+class UploadJobState(Resource):
+    """Route: /job/<job_id>"""
+    @api.expect(upload_job_parser)
+    @api.response(200, 'Success', upload_job_model)
+    @api.response(400, 'Bad Request', message_res)
+    @api.response(404, 'Not Found', message_res)
+    def get(self, job_id: str):
+        """
+        Status of the processing of an uploaded file. The ids of the jobs started by a
+        request are in its X-Upload-Jobs header. The file is served at `url` once DONE.
+        With `wait`, the answer is sent when the job finishes, or after `wait` seconds.
+        """
+        args = upload_job_parser.parse_args()
+        wait = args['wait'] or 0
+        if not 0 <= wait <= MAX_WAIT:
+            return res_error(400, f'wait must be between 0 and {MAX_WAIT}')
+
+        deadline = time.monotonic() + wait
+        while True:
+            job = get_upload_job(job_id)
+            if not job:
+                return res_error(404, 'Upload job not found')
+            finished = job.status in (UploadJobStatus.DONE, UploadJobStatus.FAILED)
+            if finished or time.monotonic() >= deadline:
+                return job.format(), 200
+            # read the job again, as the worker thread changed it
+            db.session.rollback()
+            time.sleep(POLL_INTERVAL)
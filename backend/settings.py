@@ -1,13 +1,100 @@
 import os 
+from datetime import timedelta
 
 # use absolute path for the project.db file
 directory = os.path.abspath(os.path.dirname(__file__))
 db_path = os.path.join(directory, 'project.db')
 
+def database_url() -> str:
+    """The DATABASE_URL environment variable, or the project.db file for development"""
+    url = os.environ.get('DATABASE_URL') or f'sqlite:///{db_path}'
+    # SQLAlchemy does not accept the 'postgres://' scheme given by some hosts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url: str) -> dict:
+    """
+    Connection pool of a server database (e.g. PostgreSQL), sized by environment variables.
+    SQLite is a local file, it keeps the default pool of SQLAlchemy.
+    """
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        # connections kept open, and opened on top of them under load
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        # seconds to wait for a free connection before failing the request
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        # replace connections older than this (seconds), before the server or a proxy drops them
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        # check the connection before using it, a restarted database is then not an error
+        'pool_pre_ping': True,
+    }
+
 class Config:
-    DEBUG = True
-    SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    # Debug mode (reloader, debugger, tracebacks in responses) of the development server only
+    DEBUG = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true')
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Seconds between the `PRAGMA optimize` and WAL checkpoint runs of a SQLite database,
+    # 0 disables them. The pragmas set on connect are in utils/sqlite.py.
+    SQLITE_MAINTENANCE_INTERVAL = int(os.environ.get('SQLITE_MAINTENANCE_INTERVAL', 600))
+
+    # Signs the order quotes, see routes/customer_order/services.py. Set it in production,
+    # the same for every worker: without it the quotes are disabled, except in debug mode
+    SECRET_KEY = os.environ.get('SECRET_KEY') or ('dev-secret-key' if DEBUG else None)
+    # seconds a quote can be redeemed at checkout
+    QUOTE_LIFETIME = int(os.environ.get('QUOTE_LIFETIME', 600))
+
+    # How long a login token stays valid
+    SESSION_LIFETIME = timedelta(days=7)
+
+    # Worker processes serving the app, set by gunicorn.conf.py. The in-process caches of
+    # a worker do not see the changes made through the others until their entries expire.
+    WORKERS = int(os.environ.get('GUNICORN_WORKERS', 1))
+    # Seconds a worker may keep serving a menu version (ETag, 304) after another worker
+    # changed the menu, 0 reads the version every time. A single worker drops it at once.
+    MENU_VERSION_CACHE_TTL = float(
+        os.environ.get('MENU_VERSION_CACHE_TTL', 30 if WORKERS == 1 else 2)
+    )
+
     # This should be the location of upload folder in docker environment. Not local location.
-    UPLOAD_FOLDER = 'uploads'
\ No newline at end of file
+    UPLOAD_FOLDER = 'uploads'
+
+    # Browser cache lifetime (seconds) of uploads not named by uuid, e.g. the seeded images.
+    # Uploads named by uuid never change and are cached as immutable.
+    UPLOAD_MAX_AGE = 3600
+
+    # Let the front proxy send the uploads: None, 'x-sendfile' or 'x-accel-redirect'.
+    # With 'x-accel-redirect', nginx must serve UPLOAD_ACCEL_PREFIX as an internal
+    # location aliased to the upload folder.
+    UPLOAD_SENDFILE = os.environ.get('UPLOAD_SENDFILE') or None
+    UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+
+    # Check and process the uploads (resized copies, gzip copies) in background threads,
+    # the request returns once the file is written. See utils/upload_jobs.py.
+    UPLOAD_ASYNC = os.environ.get('UPLOAD_ASYNC', '1').lower() in ('1', 'true')
+    # threads processing the uploads, per worker process
+    UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 2))
+
+    # Offer the orders to the best drivers nearby instead of showing them to every driver,
+    # see routes/dispatch/services.py. The offers are made by utils/dispatcher.py.
+    DISPATCH_ENABLED = os.environ.get('DISPATCH_ENABLED', '').lower() in ('1', 'true')
+    # seconds between two rounds of the dispatcher
+    DISPATCH_INTERVAL = float(os.environ.get('DISPATCH_INTERVAL', 5))
+    # seconds a driver has to accept an offer before it goes to other drivers
+    DISPATCH_OFFER_TIMEOUT = int(os.environ.get('DISPATCH_OFFER_TIMEOUT', 30))
+    # drivers offered an order in the first round, doubled in every next round
+    DISPATCH_OFFER_SIZE = int(os.environ.get('DISPATCH_OFFER_SIZE', 3))
+    # rounds of offers before the order is shown to every driver
+    DISPATCH_MAX_ROUNDS = int(os.environ.get('DISPATCH_MAX_ROUNDS', 3))
+    # seconds before the food of an accepted order is expected ready (utils/prep_time.py)
+    # that its offers start, about the time for a driver to get to the restaurant
+    DISPATCH_PICKUP_LEAD = int(os.environ.get('DISPATCH_PICKUP_LEAD', 600))
+
+    # Seconds between two saves of the driver location pings kept in memory,
+    # see utils/locations.py. 0 disables the saves (the pings are then only in memory).
+    LOCATION_SYNC_INTERVAL = float(os.environ.get('LOCATION_SYNC_INTERVAL', 2))
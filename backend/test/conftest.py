@@ -1,15 +1,32 @@
 """Pytest Configuration File"""
 import os
 import shutil
+import tempfile
 import pytest
+
+# the tests reset the database, so they never run on the DATABASE_URL of the app.
+# TEST_DATABASE_URL selects the engine, e.g. the PostgreSQL of docker-compose
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or (
+    'sqlite:///' + os.path.join(tempfile.gettempdir(), 'food_delivery_test.db')
+)
+# signs the order quotes (test_25)
+os.environ['SECRET_KEY'] = 'test-secret-key'
+# the location pings are saved by the tests themselves (test_23), not by a thread
+os.environ['LOCATION_SYNC_INTERVAL'] = '0'
+
+# pylint: disable=wrong-import-position
 from app import app, db
+from utils.image import DERIVED_FOLDER
 
 UPLOAD_FOLDER = app.config['UPLOAD_FOLDER']
+DERIVED_UPLOAD_FOLDER = os.path.join(UPLOAD_FOLDER, DERIVED_FOLDER)
 
 @pytest.fixture(scope="session")
 def client():
     """Test Client Generator"""
     app.config['TESTING'] = True
+    # the uploads are checked in the request, test_21 turns the jobs on
+    app.config['UPLOAD_ASYNC'] = False
 
     with app.app_context():  # Create an application context
         db.drop_all()  # Ensure a fresh database
@@ -20,20 +37,30 @@ def client():
 
 @pytest.fixture(scope="session", autouse=True)
 def cleanup_new_uploads():
-    """Remove only new files added to uploads/ during tests."""
+    """Remove only new files added to uploads/ (and its resized copies) during tests."""
+    folders = [UPLOAD_FOLDER, DERIVED_UPLOAD_FOLDER]
     # Snapshot the files BEFORE tests run
-    existing_files = set(os.listdir(UPLOAD_FOLDER)) if os.path.exists(UPLOAD_FOLDER) else set()
+    existing_files = {
+        os.path.join(folder, filename)
+        for folder in folders if os.path.exists(folder)
+        for filename in os.listdir(folder)
+    }
 
     yield  # Run all tests
 
     # Snapshot after tests
-    all_files = set(os.listdir(UPLOAD_FOLDER)) if os.path.exists(UPLOAD_FOLDER) else set()
+    all_files = {
+        os.path.join(folder, filename)
+        for folder in folders if os.path.exists(folder)
+        for filename in os.listdir(folder)
+    }
 
-    # Determine newly added files
-    new_files = all_files - existing_files
+    # Determine newly added files, a new folder is removed with its content
+    new_files = sorted(all_files - existing_files)
 
-    for filename in new_files:
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
+    for file_path in new_files:
+        if not os.path.lexists(file_path):
+            continue
         try:
             if os.path.isfile(file_path) or os.path.islink(file_path):
                 os.unlink(file_path)
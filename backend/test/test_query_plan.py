@@ -0,0 +1,164 @@
+"""Test that the queries in db_query.py are served by an index"""
+from datetime import datetime, time
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from db_model import Customer, Order
+from db_model.db_enum import ChatSupportUserType, OrderStatus, RegistrationStatus
+from db_model import db_query
+from utils.query_plan import record_statements, explain_query_plan, full_table_scans
+from utils.pagination import PageArgs
+
+# a page after (time, id) of a seen row
+PAGE_AFTER = PageArgs((datetime(2025, 1, 1), 10), 20)
+NOW = datetime(2025, 1, 1)
+# postcodes around the delivery address, see utils.geo.postcodes_within
+NEAR = {'2000': 0.0, '2010': 1.6, '2011': 2.1}
+
+def new_orders_with_dispatch(driver_id: int):
+    """The new orders of the driver when the dispatch is on"""
+    app.config['DISPATCH_ENABLED'] = True
+    try:
+        return db_query.get_orders_of_driver_from_order_type(driver_id, 'new', PAGE_AFTER)
+    finally:
+        app.config['DISPATCH_ENABLED'] = False
+
+def save_positions_of_new_drivers(positions):
+    """save_driver_positions, refused at the INSERT as the drivers do not exist"""
+    try:
+        db_query.save_driver_positions(positions)
+    except IntegrityError:
+        pass
+
+# every query function with the arguments the routes use
+QUERY_CASES = [
+    (db_query.resolve_session, ('some-token',), {}),
+    (db_query.resolve_session, ('some-token',), {'cached': False}),
+    (db_query.invalidate_user_sessions, (Customer(id=1),), {}),
+    (db_query.get_user_by_type_and_id, ('restaurant', 1), {}),
+    (db_query.filter_admins, (), {'email': 'admin@example.com'}),
+    (db_query.filter_restaurants, (), {'id': 1}),
+    (db_query.filter_restaurants, (), {'email': 'a@example.com'}),
+    (db_query.filter_restaurants, (), {'abn': '12345678901'}),
+    (db_query.filter_restaurants, (), {'registration_status': RegistrationStatus.PENDING}),
+    (db_query.get_restaurant_by_menu, (1,), {}),
+    (db_query.filter_customers, (), {'email': 'a@example.com'}),
+    (db_query.filter_customers, (), {'username': 'someone'}),
+    (db_query.filter_drivers, (), {'email': 'a@example.com'}),
+    (db_query.filter_drivers, (), {'registration_status': RegistrationStatus.PENDING}),
+    (db_query.filter_cart_items, (), {'customer_id': 1}),
+    (db_query.filter_cart_items, (), {'customer_id': 1, 'menu_id': 1}),
+    (db_query.get_cart_lines, (1,), {}),
+    (db_query.get_cart_lines, (1, 1), {}),
+    (db_query.delete_cart_items, (1,), {'restaurant_id': 1}),
+    (db_query.delete_cart_items, (1,), {'menu_ids': [1, 2]}),
+    (db_query.filter_orders, (), {'id': 1}),
+    (db_query.filter_orders, (), {'customer_id': 1}),
+    (db_query.filter_orders, (), {'restaurant_id': 1}),
+    (db_query.filter_orders, (), {'restaurant_id': 1, 'order_status': OrderStatus.PENDING}),
+    (db_query.transition_order, (
+        Order(id=1, order_status=OrderStatus.PENDING), OrderStatus.RESTAURANT_ACCEPTED
+    ), {}),
+    (db_query.claim_order, (Order(id=1), 1), {}),
+    (db_query.get_orders_waiting_driver, (), {}),
+    (db_query.get_orders_of_driver_from_order_type, (1, 'new'), {}),
+    (db_query.get_orders_of_driver_from_order_type, (1, 'to_pickup'), {}),
+    (db_query.get_orders_of_driver_from_order_type, (1, 'delivering'), {}),
+    (db_query.get_orders_of_driver_from_order_type, (1, 'completed'), {}),
+    (db_query.get_orders_of_driver_from_order_type, (1, 'all'), {}),
+    (db_query.get_orders_by_order_ids, ([1, 2, 3],), {}),
+    (db_query.get_recent_order_times, (1, NOW, 50), {}),
+    (db_query.count_accepted_orders, (1,), {}),
+    (db_query.get_prep_time_stats, (1,), {}),
+    (db_query.update_prep_time_stat, (1, 12, 0, 15.0, NOW), {}),
+    (db_query.replace_prep_time_stats, ([],), {}),
+    (db_query.get_prep_time_history, (NOW,), {}),
+    (db_query.get_order_events_since, (10,), {'customer_id': 1}),
+    (db_query.get_order_events_since, (10,), {'restaurant_id': 1}),
+    (db_query.get_order_events_since, (10,), {'driver_id': 1, 'in_pool': True}),
+    (db_query.get_last_order_event_id, (), {}),
+    (db_query.filter_menus, (), {'id': 1}),
+    (db_query.filter_menus, (), {'category_id': 1}),
+    (db_query.filter_menu_from_restaurant, (1,), {'name': 'menu'}),
+    (db_query.filter_menu_categories, (), {'restaurant_id': 1, 'name': 'category'}),
+    (db_query.get_chats_by_user, (ChatSupportUserType.CUSTOMER, 1), {}),
+    (db_query.get_chats_by_user, (ChatSupportUserType.CUSTOMER, 1), {'since': 10}),
+    (db_query.get_chats_of_user_since, (ChatSupportUserType.CUSTOMER, 1, 10), {}),
+    (db_query.get_last_chat_id, (), {}),
+    (db_query.reset_conversation_unread, (
+        ChatSupportUserType.RESTAURANT, 1, ChatSupportUserType.CUSTOMER, 1, 10
+    ), {}),
+    (db_query.get_conversations_of_user, (ChatSupportUserType.CUSTOMER, 1), {}),
+    (db_query.get_conversations_of_user, (ChatSupportUserType.CUSTOMER, 1, PAGE_AFTER), {}),
+    (db_query.get_chat_users, ([(ChatSupportUserType.DRIVER, 1)],), {}),
+    (db_query.get_chats_between_users, (
+        ChatSupportUserType.CUSTOMER, 1, ChatSupportUserType.RESTAURANT, 1
+    ), {}),
+    (db_query.filter_favourites, (), {'customer_id': 1}),
+    (db_query.filter_restaurant_reviews, (), {'restaurant_id': 1}),
+    (db_query.filter_restaurant_reviews, (), {'order_id': 1}),
+    (db_query.filter_driver_reviews, (), {'driver_id': 1}),
+    (db_query.filter_driver_reviews, (), {'id': 1, 'customer_id': 1}),
+    # pages of the list APIs
+    (db_query.filter_customers, (), {'page': PageArgs((1,), 20)}),
+    (db_query.filter_orders, (), {'customer_id': 1, 'page': PAGE_AFTER}),
+    (db_query.filter_orders, (), {'restaurant_id': 1, 'page': PAGE_AFTER}),
+    (db_query.filter_orders, (), {
+        'restaurant_id': 1, 'order_status': OrderStatus.PENDING, 'page': PAGE_AFTER
+    }),
+    (db_query.get_orders_of_driver_from_order_type, (1, 'all', PAGE_AFTER), {}),
+    (db_query.get_orders_of_driver_from_order_type, (1, 'new', PAGE_AFTER), {}),
+    (db_query.filter_restaurant_reviews, (), {'restaurant_id': 1, 'page': PAGE_AFTER}),
+    (db_query.filter_driver_reviews, (), {'driver_id': 1, 'page': PAGE_AFTER}),
+    (db_query.get_chats_between_users, (
+        ChatSupportUserType.CUSTOMER, 1, ChatSupportUserType.RESTAURANT, 1,
+        PAGE_AFTER
+    ), {}),
+    (db_query.filter_favourites, (), {'customer_id': 1, 'page': PageArgs((10,), 20)}),
+    # upload jobs
+    (db_query.get_upload_job, ('0' * 32,), {}),
+    (db_query.claim_upload_job, ('0' * 32,), {}),
+    (db_query.reclaim_stale_upload_jobs, (NOW,), {}),
+    (db_query.get_pending_upload_jobs, (), {}),
+    # dispatch
+    (new_orders_with_dispatch, (1,), {}),
+    (db_query.get_driver_state, (1,), {}),
+    (db_query.get_available_drivers, (NOW,), {}),
+    (db_query.get_driver_loads, ([1, 2],), {}),
+    (db_query.get_orders_to_dispatch, (NOW,), {}),
+    (db_query.get_offer_history, ([1, 2],), {}),
+    (db_query.get_live_offer_counts, (NOW,), {}),
+    (db_query.expire_offers, (NOW,), {}),
+    (db_query.get_live_offers_of_driver, (1, NOW), {}),
+    (db_query.has_live_offer, (1, 1, NOW), {}),
+    (db_query.decline_offer, (1, 1, NOW), {}),
+    (db_query.close_offers, (1, 1), {}),
+    (db_query.get_driver_states_since, (NOW,), {}),
+    (save_positions_of_new_drivers, ({1: (-33.87, 151.21, NOW), 2: (-33.9, 151.2, NOW)},), {}),
+    # search
+    (db_query.search_restaurants, ('thai food',), {}),
+    (db_query.search_restaurants, (), {'suburb': 'Bondi Beach', 'page': PageArgs(None, 20)}),
+    (db_query.search_restaurants, (), {'near': NEAR, 'min_rating': 4, 'open_at': time(12)}),
+    (db_query.search_restaurants, ('thai',), {'near': NEAR, 'page': PageArgs((1.5, 10), 20)}),
+    (db_query.search_menu_items, ('chick',), {'is_available': True}),
+    (db_query.search_menu_items, (), {'restaurant_name': 'bondi', 'suburb': 'Bondi Beach'}),
+    (db_query.search_menu_items, ('pizza',), {'page': PageArgs((-1.5, 10), 20)}),
+]
+
+def test_00_no_full_table_scan(client): # pylint: disable=unused-argument
+    """Every query in db_query.py must use an index"""
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            pytest.skip('EXPLAIN QUERY PLAN is SQLite only')
+        failures = []
+        for func, args, kwargs in QUERY_CASES:
+            with record_statements(db.engine) as statements:
+                func(*args, **kwargs)
+            db.session.rollback()
+
+            for statement, parameters in statements:
+                scans = full_table_scans(explain_query_plan(db.engine, statement, parameters))
+                if scans:
+                    failures.append(f'{func.__name__}{args}{kwargs}: {scans}')
+
+        assert not failures, '\n'.join(failures)
@@ -1,5 +1,29 @@
 """Test for APIs"""
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
+from threading import Barrier
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from db_model import DriverState, MenuItem, Order, OrderItem, PrepTimeStat, UploadJob, UserSession
+from db_model.db_enum import ChatSupportUserType, OrderStatus, UploadJobStatus, UploadKind
+from db_model.db_query import get_available_drivers, reset_conversation_unread
+from routes.dispatch.services import run_dispatch_tick
+from utils.event_hub import EventHub, event_stream
+from utils.locations import location_store, sync_locations
+from utils.pagination import encode_cursor
+from utils.prep_time import (
+    estimate_prep_minutes, forget_prep_stats, record_prep_time, refit_prep_times
+)
+from utils.process_uploads import process_pending_uploads
+from utils.upload_jobs import INCOMING_FOLDER, process_upload
 
 from .test_data.admin import (
     admin1, admin_same_email, admin_weak_password
@@ -170,7 +194,8 @@ def test_04_customer_order(client):
     assert len(response.get_json()) == 0
 
     # Get the first item from the restaurant
-    menu_id = restaurant1.items_get(client).get_json()[0]['id']
+    menu_item = restaurant1.items_get(client).get_json()[0]
+    menu_id = menu_item['id']
 
     # Add to the cart
     response = customer1.cart_update(client, menu_id, 4)
@@ -215,10 +240,14 @@ def test_04_customer_order(client):
         customer_notes='Hello this is note',
         card_number='1234-1234-4567-7890',
         order_price=10.0,
-        delivery_fee=2.0,
+        delivery_fee=-2.0,
         total_price=12.0
     )
     assert response.status_code == 200
+    # The prices are computed from the menu, the delivery fee from the distance
+    assert response.get_json()['order_price'] == round(4 * menu_item['price'], 2)
+    assert response.get_json()['delivery_fee'] == 5
+    assert response.get_json()['total_price'] == round(4 * menu_item['price'] + 5, 2)
 
     # Cart should be empty now
     response = customer1.cart_get(client)
@@ -352,3 +381,818 @@ def test_06_chat(client):
     # 6. Chat between Drivers is not allowed.
     response = driver1.chat_send(client, 'driver', driver2.get_id(), 'Failed Message')
     assert response.status_code == 400
+
+def test_07_logout(client):
+    """Test for Logout Invalidating the Token"""
+    response = customer2.get_me(client)
+    assert response.status_code == 200
+    # Logout, the same token cannot be used again
+    response = customer2.logout(client)
+    assert response.status_code == 200
+    response = customer2.get_me(client)
+    assert response.status_code == 401
+    # Login again issues a new working token
+    response = customer2.login(client)
+    assert response.status_code == 200
+    response = customer2.get_me(client)
+    assert response.status_code == 200
+
+    # Logged out through another worker: the session row is gone, this worker's cache
+    # still has it, only the location pings trust the cache
+    with app.app_context():
+        UserSession.query.filter_by(token=customer2.token).delete()
+        db.session.commit()
+    assert customer2.get_me(client).status_code == 401
+    response = customer2.login(client)
+    assert response.status_code == 200
+
+def test_08_review_rating_totals(client):
+    """Test for the Rating Totals Following Review Create, Update and Delete"""
+    order_id = customer1.orders_get(client).get_json()[0]['id']
+
+    response = customer1.review_restaurant(client, restaurant1.get_id(), order_id, 4)
+    assert response.status_code == 200
+    review_id = response.get_json()['id']
+    response = customer1.reviews_of(client, 'restaurant', restaurant1.get_id()).get_json()
+    assert response['n_reviews'] == 1
+    assert response['avg_rating'] == 4
+    assert response['reviews'][0]['customer_id'] == customer1.get_id()
+
+    # Update the same review
+    response = customer1.review_restaurant(client, restaurant1.get_id(), order_id, 2)
+    assert response.status_code == 200
+    response = customer1.reviews_of(client, 'restaurant', restaurant1.get_id()).get_json()
+    assert response['n_reviews'] == 1
+    assert response['avg_rating'] == 2
+
+    # Delete the review
+    response = customer1.review_delete(client, review_id)
+    assert response.status_code == 200
+    response = customer1.reviews_of(client, 'restaurant', restaurant1.get_id()).get_json()
+    assert response['n_reviews'] == 0
+    assert response['avg_rating'] == 0
+
+def test_09_chat_pagination(client):
+    """Test for Reading the Chat in Pages, Newest Page First"""
+    response = customer1.chat_get(client, 'restaurant', restaurant1.get_id(), limit=1)
+    assert response.status_code == 200
+    response = response.get_json()
+    assert [chat['message'] for chat in response['chats']] == ['restaurant to customer']
+    assert response['next_cursor']
+
+    response = customer1.chat_get(
+        client, 'restaurant', restaurant1.get_id(), limit=1, after=response['next_cursor']
+    ).get_json()
+    assert [chat['message'] for chat in response['chats']] == ['customer to restaurant']
+    assert response['next_cursor'] is None
+
+    # Invalid cursor, or values of the wrong type for the (time, id) sort key
+    response = customer1.chat_get(client, 'restaurant', restaurant1.get_id(), after='invalid')
+    assert response.status_code == 400
+    response = customer1.chat_get(
+        client, 'restaurant', restaurant1.get_id(), after=encode_cursor(['notadate', 1])
+    )
+    assert response.status_code == 400
+    assert response.get_json()['message'].endswith('Invalid Cursor')
+
+def test_10_search(client):
+    """Test for Searching Menu Items by Word Prefix"""
+    response = customer1.search_menu(client, q='men')
+    assert response.status_code == 200
+    assert [menu['name'] for menu in response.get_json()] == ['menu1']
+
+    # Filter by the suburb of the restaurant
+    response = customer1.search_menu(client, q='menu1', suburb='sydney')
+    assert len(response.get_json()) == 1
+    response = customer1.search_menu(client, q='menu1', suburb='Parramatta')
+    assert len(response.get_json()) == 0
+
+    # Middle of a word does not match
+    response = customer1.search_menu(client, q='enu')
+    assert len(response.get_json()) == 0
+
+def test_11_full_menu_etag(client):
+    """Test for the Full Menu Answering a Repeat View with 304"""
+    response = customer1.menu_get(client, restaurant1.get_id())
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.get_json()[0]['items'][0]['name'] == 'menu1'
+
+    # Unchanged menu
+    response = customer1.menu_get(client, restaurant1.get_id(), etag)
+    assert response.status_code == 304
+
+    # The restaurant changes the menu, the old ETag is stale
+    category_id = customer1.menu_get(
+        client, restaurant1.get_id()
+    ).get_json()[0]['id']
+    response = restaurant1.item_create(
+        client, 'menu2', 'description', 12.0, True,
+        (resources / "test.png").open("rb"), category_id
+    )
+    assert response.status_code == 200
+    response = customer1.menu_get(client, restaurant1.get_id(), etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()[0]['items']) == 2
+
+def test_12_image_sizes(client):
+    """Test for the Resized Copies of an Uploaded Image"""
+    item = customer1.menu_get(client, restaurant1.get_id()).get_json()[0]['items'][-1]
+    url = '/' + item['url_img']
+
+    # WebP for browsers that accept it, JPEG otherwise
+    response = client.get(url, query_string={'size': 'thumb'}, headers={'Accept': 'image/webp'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert 'Accept' in response.headers['Vary']
+    response = client.get(url, query_string={'size': 'thumb'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.cache_control.immutable
+    original = client.get(url)
+    assert len(response.data) < len(original.data)
+
+    # No resized copy yet, the original is sent without being cached for good
+    copy = f'{app.config["UPLOAD_FOLDER"]}/{uuid.uuid4().hex}.png'
+    shutil.copyfile(item['url_img'], copy)
+    try:
+        response = client.get(f'/{copy}', query_string={'size': 'thumb'})
+        assert response.status_code == 200
+        assert response.data == original.data
+        assert not response.cache_control.immutable
+        assert response.cache_control.max_age == app.config['UPLOAD_MAX_AGE']
+    finally:
+        os.remove(copy)
+
+    # Unknown size
+    response = client.get(url, query_string={'size': 'huge'})
+    assert response.status_code == 400
+
+def test_13_upload_caching(client):
+    """Test for Cache Headers, 304 and Byte Ranges of Uploads"""
+    url = '/' + driver1.get_me(client).get_json()['url_license_image']
+
+    # Named by uuid, never changes
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+    last_modified = response.headers['Last-Modified']
+
+    # Repeat view
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    response = client.get(url, headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    # Resume a download
+    response = client.get(url, headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert len(response.data) == 100
+
+    # Seeded file, revalidated after max-age
+    response = client.get('/uploads/Placeholder.png')
+    assert response.status_code == 200
+    assert not response.cache_control.immutable
+
+def test_14_chat_stream(client):
+    """Test for Pushing New Chats to the Open Stream, and Catching Up With since"""
+    last_id = customer1.chat_get(
+        client, 'restaurant', restaurant1.get_id()
+    ).get_json()['chats'][-1]['id']
+
+    # Restaurant opens the stream, the customer sends a chat
+    response = restaurant1.chat_stream(client)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+    assert next(events).startswith(b'retry:')
+    customer1.chat_send(client, 'restaurant', restaurant1.get_id(), 'pushed')
+    event = next(events).decode()
+    assert 'event: chat' in event and '"pushed"' in event and '"received"' in event
+    pushed_id = int(event.split('\n')[0][len('id: '):])
+    response.close()
+
+    # Reconnect with only the missed chats
+    response = restaurant1.chat_get(
+        client, 'customer', customer1.get_id(), since=last_id
+    ).get_json()
+    assert [chat['message'] for chat in response['chats']] == ['pushed']
+    response = customer1.chat_stream(client, since=pushed_id - 1)
+    events = iter(response.response)
+    next(events)
+    assert '"pushed"' in next(events).decode()
+    response.close()
+
+    # Without a token
+    response = client.get('/chat/stream')
+    assert response.status_code == 401
+
+def test_15_chat_inbox(client):
+    """Test for the Conversation Summaries and Unread Counts"""
+    for message in ['first', 'second']:
+        response = customer1.chat_send(client, 'restaurant', restaurant2.get_id(), message)
+        assert response.status_code == 200
+
+    # Newest conversation first, with the unread count of the receiver
+    inbox = restaurant2.chat_inbox(client).get_json()
+    assert len(inbox) == 1
+    assert inbox[0]['user']['id'] == customer1.get_id()
+    assert inbox[0]['last_chat']['message'] == 'second'
+    assert inbox[0]['last_chat']['message_type'] == 'received'
+    assert inbox[0]['unread'] == 2
+
+    inbox = customer1.chat_inbox(client).get_json()
+    assert inbox[0]['user']['id'] == restaurant2.get_id()
+    assert inbox[0]['last_chat']['message_type'] == 'sent'
+    assert inbox[0]['unread'] == 0
+    assert len(inbox) == len(customer1.chat_get_all(client).get_json())
+
+    # Reading the chats marks them read
+    restaurant2.chat_get(client, 'customer', customer1.get_id())
+    assert restaurant2.chat_inbox(client).get_json()[0]['unread'] == 0
+
+    # A chat sent after the newest one read stays unread
+    customer1.chat_send(client, 'restaurant', restaurant2.get_id(), 'third')
+    third_id = restaurant2.chat_get(
+        client, 'customer', customer1.get_id(), limit=1
+    ).get_json()['chats'][-1]['id']
+    customer1.chat_send(client, 'restaurant', restaurant2.get_id(), 'fourth')
+    with app.app_context():
+        assert not reset_conversation_unread(
+            ChatSupportUserType.RESTAURANT, restaurant2.get_id(),
+            ChatSupportUserType.CUSTOMER, customer1.get_id(), third_id
+        )
+    assert restaurant2.chat_inbox(client).get_json()[0]['unread'] == 1
+    restaurant2.chat_get(client, 'customer', customer1.get_id(), since=third_id)
+    assert restaurant2.chat_inbox(client).get_json()[0]['unread'] == 0
+
+    # Paged
+    response = customer1.chat_inbox(client, limit=1).get_json()
+    assert len(response['items']) == 1 and response['next_cursor']
+
+def test_16_order_event_stream(client):
+    """Test for Pushing Order Changes to the Customer, Restaurant and Drivers"""
+    streams = {
+        'customer': customer1.order_stream(client),
+        'restaurant': restaurant1.order_stream(client),
+        # the order waits for a driver once accepted
+        'driver': driver2.order_stream(client, token=driver2.token),
+    }
+    events = {role: iter(response.response) for role, response in streams.items()}
+    for role, stream in streams.items():
+        assert stream.mimetype == 'text/event-stream'
+        assert next(events[role]).startswith(b'retry:')
+
+    # New order, not offered to the drivers yet
+    menu_id = restaurant1.items_get(client).get_json()[0]['id']
+    customer1.cart_update(client, menu_id, 1)
+    response = customer1.order_new(
+        client=client, restaurant_id=restaurant1.get_id(), address='someaddree',
+        suburb='some suburb', state='NSW', postcode='2000', customer_notes='',
+        card_number='1234-1234-4567-7890', order_price=10.0, delivery_fee=2.0,
+        total_price=12.0
+    )
+    order_id = response.get_json()['id']
+    for role in ['customer', 'restaurant']:
+        event = next(events[role]).decode()
+        assert 'event: order' in event
+        assert f'"order_id": {order_id}' in event
+        assert '"old_status": null' in event and '"new_status": "PENDING"' in event
+
+    # Accepted by the restaurant, the order enters the pool
+    restaurant1.order_action(client, 'accept', order_id)
+    event = next(events['driver']).decode()
+    assert f'"order_id": {order_id}' in event
+    assert '"old_status": "PENDING"' in event and '"new_status": "RESTAURANT_ACCEPTED"' in event
+
+    # Rejected by the restaurant, the order leaves the pool
+    restaurant1.order_action(client, 'reject', order_id)
+    event = next(events['driver']).decode()
+    assert '"old_status": "RESTAURANT_ACCEPTED"' in event and '"new_status": "CANCELLED"' in event
+    event_id = int(event.split('\n')[0][len('id: '):])
+    for stream in streams.values():
+        stream.close()
+
+    # Reconnect after the first event, the missed one is sent
+    response = customer1.order_stream(client, since=event_id - 1)
+    stream = iter(response.response)
+    next(stream)
+    assert '"new_status": "CANCELLED"' in next(stream).decode()
+    response.close()
+
+    # Admin has no orders
+    response = admin1.order_stream(client)
+    assert response.status_code == 400
+
+def test_17_concurrent_order_claims(client):
+    """Test for Many Drivers Accepting the Same Order at Once, Only One Gets It"""
+    menu_id = restaurant1.items_get(client).get_json()[0]['id']
+    customer1.cart_update(client, menu_id, 1)
+    order_id = customer1.order_new(
+        client=client, restaurant_id=restaurant1.get_id(), address='someaddree',
+        suburb='some suburb', state='NSW', postcode='2000', customer_notes='',
+        card_number='1234-1234-4567-7890', order_price=10.0, delivery_fee=2.0,
+        total_price=12.0
+    ).get_json()['id']
+
+    # The state machine: not ready before accepted, no accept twice
+    response = restaurant1.order_action(client, 'ready', order_id)
+    assert response.status_code == 400
+    response = restaurant1.order_action(client, 'accept', order_id)
+    assert response.status_code == 200
+    response = restaurant1.order_action(client, 'accept', order_id)
+    assert response.status_code == 400
+    # Not an order of this restaurant
+    response = restaurant2.order_action(client, 'reject', order_id)
+    assert response.status_code == 400
+
+    # Parallel claims, each with its own client (connection)
+    drivers = [driver1, driver2] * 8
+    barrier = Barrier(len(drivers))
+
+    def claim(driver):
+        with app.test_client() as own_client:
+            barrier.wait()
+            return driver.accept_order(own_client, order_id).status_code
+
+    with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
+        status_codes = list(executor.map(claim, drivers))
+    assert sorted(status_codes).count(200) == 1
+    assert set(status_codes) <= {200, 404}
+
+    winner = drivers[status_codes.index(200)]
+    loser = driver2 if winner is driver1 else driver1
+    response = loser.pickup_order(client, order_id)
+    assert response.status_code == 404
+
+def test_18_cart_batch_update(client):
+    """Test for Several Cart Changes in One Request"""
+    menu_ids = [item['id'] for item in restaurant1.items_get(client).get_json()[:2]]
+
+    response = customer1.cart_batch_update(client, [
+        {'menu_id': menu_ids[0], 'quantity': 2},
+        {'menu_id': menu_ids[1], 'quantity': 3},
+    ])
+    assert response.status_code == 200
+    cart = response.get_json()['cart']
+    assert len(cart) == 1 and cart[0]['restaurant_id'] == restaurant1.get_id()
+    assert {item['menu_id']: item['quantity'] for item in cart[0]['items']} == {
+        menu_ids[0]: 2, menu_ids[1]: 3
+    }
+
+    # One invalid change, nothing is changed
+    response = customer1.cart_batch_update(client, [
+        {'menu_id': menu_ids[0], 'quantity': 0},
+        {'menu_id': 99999, 'quantity': 1},
+    ])
+    assert response.status_code == 400
+    assert len(customer1.cart_get(client).get_json()) == 2
+
+    # Remove both
+    response = customer1.cart_batch_update(client, [
+        {'menu_id': menu_id, 'quantity': 0} for menu_id in menu_ids
+    ])
+    assert response.get_json()['cart'] == []
+
+    # The same item twice (added then removed), nothing is changed
+    response = customer1.cart_batch_update(client, [
+        {'menu_id': menu_ids[0], 'quantity': 2},
+        {'menu_id': menu_ids[0], 'quantity': 0},
+    ])
+    assert response.status_code == 400
+    assert response.get_json()['message'].endswith('Duplicate Item ID')
+    assert customer1.cart_get(client).get_json() == []
+
+def test_19_enum_check_constraint(client): # pylint: disable=unused-argument
+    """Test that the enum columns only take the enum values, on every engine"""
+    with app.app_context():
+        assert db.session.execute(text("SELECT COUNT(*) FROM orders")).scalar() > 0
+        with pytest.raises(IntegrityError):
+            db.session.execute(text("UPDATE orders SET order_status = 'LOST'"))
+            db.session.flush()
+        db.session.rollback()
+
+def test_20_delete_referenced_menu(client):
+    """Test that the deleted menu items of past orders are kept hidden for the orders"""
+    category = customer1.menu_get(client, restaurant1.get_id()).get_json()[0]
+
+    # menu1 was ordered, it leaves the menu but stays in the database
+    ordered = category['items'][0]
+    assert ordered['name'] == 'menu1'
+    response = restaurant1.item_delete(client, ordered['id'])
+    assert response.status_code == 200
+    menu = customer1.menu_get(client, restaurant1.get_id()).get_json()
+    assert ordered['id'] not in [item['id'] for item in menu[0]['items']]
+    assert db.session.get(MenuItem, ordered['id']).is_deleted
+    assert restaurant1.item_delete(client, ordered['id']).status_code == 404
+
+    # a menu item never ordered is deleted, also from the carts
+    never_ordered = category['items'][-1]
+    assert customer1.cart_batch_update(client, [
+        {'menu_id': never_ordered['id'], 'quantity': 1}
+    ]).status_code == 200
+    response = restaurant1.item_delete(client, never_ordered['id'])
+    assert response.status_code == 200
+    assert customer1.cart_get(client).get_json() == []
+    assert db.session.get(MenuItem, never_ordered['id']) is None
+
+    # a category is deleted with all its items
+    response = restaurant1.category_create(client, 'category_deleted')
+    assert response.status_code == 200
+    category_id = response.get_json()['id']
+    item_ids = []
+    for name in ['menu_deleted1', 'menu_deleted2']:
+        response = restaurant1.item_create(
+            client, name, 'description', 5.0, True,
+            (resources / "test.png").open("rb"), category_id
+        )
+        assert response.status_code == 200
+        item_ids.append(response.get_json()['id'])
+    # the first one was ordered
+    order = Order.query.first()
+    db.session.add(OrderItem(order_id=order.id, menu_id=item_ids[0], price=5.0, quantity=1))
+    db.session.commit()
+
+    response = restaurant1.category_delete(client, category_id)
+    assert response.status_code == 200
+    menu = customer1.menu_get(client, restaurant1.get_id()).get_json()
+    assert category_id not in [category['id'] for category in menu]
+    categories = client.get('/restaurant-menu/categories', headers=restaurant1.headers).get_json()
+    assert category_id not in [category['id'] for category in categories]
+    assert db.session.get(MenuItem, item_ids[0]).is_deleted
+    assert db.session.get(MenuItem, item_ids[1]) is None
+
+def test_21_async_upload(client):
+    """Test for Uploads Processed by Background Jobs"""
+    category_id = customer1.menu_get(client, restaurant1.get_id()).get_json()[0]['id']
+    app.config['UPLOAD_ASYNC'] = True
+    try:
+        response = restaurant1.item_create(
+            client, 'menu3', 'description', 9.0, True,
+            (resources / "test.png").open("rb"), category_id
+        )
+        assert response.status_code == 200
+        url = response.get_json()['url_img']
+        job_id = response.headers['X-Upload-Jobs']
+
+        response = client.get(f'/upload/job/{job_id}', query_string={'wait': 10})
+        assert response.status_code == 200
+        assert response.get_json()['status'] == 'DONE'
+        assert response.get_json()['url'] == url
+        assert client.get(f'/{url}').status_code == 200
+        assert client.get(f'/{url}', query_string={'size': 'thumb'}).status_code == 200
+
+        # Not an image, checked by the request: no item refers to a missing file
+        response = restaurant1.item_create(
+            client, 'menu4', 'description', 9.0, True,
+            (resources / "not_an_image.png").open("rb"), category_id
+        )
+        assert response.status_code == 400
+        assert 'X-Upload-Jobs' not in response.headers
+    finally:
+        app.config['UPLOAD_ASYNC'] = False
+
+    # The copies fail, the file is still moved: the rows of the request refer to it
+    upload_folder = app.config['UPLOAD_FOLDER']
+    name = uuid.uuid4().hex
+    staged_path = os.path.join(upload_folder, INCOMING_FOLDER, f'{name}.png')
+    url = f'{upload_folder}/{name}.png'
+    shutil.copyfile(resources / "not_an_image.png", staged_path)
+    with pytest.raises(ValueError):
+        process_upload(UploadKind.IMAGE, upload_folder, staged_path, url)
+    assert not os.path.exists(staged_path)
+    os.remove(url)
+
+    # A job left processing by a crashed worker is run again
+    staged_path = Path(app.config['UPLOAD_FOLDER']) / INCOMING_FOLDER / 'stale.png'
+    staged_path.write_bytes((resources / "test.png").read_bytes())
+    url = f"{app.config['UPLOAD_FOLDER']}/stale.png"
+    with app.app_context():
+        db.session.add(UploadJob(
+            id='stale', kind=UploadKind.IMAGE, staged_path=str(staged_path), url=url,
+            status=UploadJobStatus.PROCESSING, created_at=datetime.now() - timedelta(hours=1)
+        ))
+        db.session.commit()
+    assert process_pending_uploads() == 1
+    assert client.get('/upload/job/stale').get_json()['status'] == 'DONE'
+    assert client.get(f'/{url}').status_code == 200
+
+    assert client.get('/upload/job/unknown').status_code == 404
+
+def test_22_dispatch_offers(client):
+    """Test for Orders Offered to the Nearest Drivers, then to More Drivers"""
+    menu_id = restaurant1.items_get(client).get_json()[0]['id']
+    customer1.cart_update(client, menu_id, 1)
+    order_id = customer1.order_new(
+        client=client, restaurant_id=restaurant1.get_id(), address='someaddree',
+        suburb='some suburb', state='NSW', postcode='2000', customer_notes='',
+        card_number='1234-1234-4567-7890', order_price=10.0, delivery_fee=2.0,
+        total_price=12.0
+    ).get_json()['id']
+    assert restaurant1.order_action(client, 'accept', order_id).status_code == 200
+
+    # driver1 in the city, driver2 in Randwick (6 km)
+    assert driver1.dispatch_status(client, True, postcode='2000').status_code == 200
+    response = driver2.dispatch_status(client, True, lat=-33.9140, lon=151.2410)
+    assert response.get_json()['available'] is True
+    assert driver2.dispatch_status(client, True, postcode='9999').status_code == 400
+
+    app.config['DISPATCH_ENABLED'] = True
+    try:
+        with app.app_context():
+            run_dispatch_tick()
+
+        # first round: only the driver within 5 km
+        def offered(driver):
+            return [offer['order_id'] for offer in driver.dispatch_offers(client).get_json()]
+        assert order_id in offered(driver1)
+        assert order_id not in offered(driver2)
+        available = driver2.get_available_orders(client).get_json()
+        assert order_id not in [order['id'] for order in available]
+        assert driver2.accept_order(client, order_id).status_code == 404
+
+        # declined, the next round reaches driver2
+        assert driver1.decline_offer(client, order_id).status_code == 200
+        assert driver1.decline_offer(client, order_id).status_code == 404
+        with app.app_context():
+            run_dispatch_tick()
+        assert driver1.accept_order(client, order_id).status_code == 404
+        offers = driver2.dispatch_offers(client).get_json()
+        assert [offer['round'] for offer in offers if offer['order_id'] == order_id] == [2]
+        assert driver2.accept_order(client, order_id).status_code == 200
+        assert order_id not in offered(driver2)
+    finally:
+        app.config['DISPATCH_ENABLED'] = False
+
+def test_23_location_pings(client):
+    """Test for Location Pings Kept in Memory and Saved in Batches"""
+    assert driver1.dispatch_status(client, True, postcode='2000').status_code == 200
+    assert driver2.dispatch_status(client, True, postcode='2031').status_code == 200
+
+    assert driver1.send_location(client, -33.8700, 151.2100).status_code == 200
+    assert driver1.send_location(client, 100, 151.2100).status_code == 400
+    response = client.post(
+        '/dispatch/driver/location', headers=customer1.headers,
+        json={'lat': -33.8700, 'lon': 151.2100}
+    )
+    assert response.status_code == 401
+
+    # answered from memory: driver1 in the city, driver2 in Randwick (6 km)
+    response = restaurant1.drivers_nearby(client, 2)
+    assert response.get_json()['count'] == 1
+    assert response.get_json()['nearest_km'] < 1
+    assert restaurant1.drivers_nearby(client, 10).get_json()['count'] == 2
+    assert restaurant1.drivers_nearby(client, 500).status_code == 400
+
+    # saved at the next sync only
+    assert driver1.get_dispatch_status(client).get_json()['lat'] == -33.8688
+    with app.app_context():
+        sync_locations(location_store, datetime.now() - timedelta(minutes=5))
+    assert driver1.get_dispatch_status(client).get_json()['lat'] == -33.87
+
+    # unavailable drivers are not counted
+    assert driver2.dispatch_status(client, False).status_code == 200
+    assert restaurant1.drivers_nearby(client, 10).get_json()['count'] == 1
+
+    # a status without position keeps the time of the last position
+    seen_at = driver2.get_dispatch_status(client).get_json()['updated_at']
+    with app.app_context():
+        DriverState.query.filter_by(driver_id=driver2.get_id()).update(
+            {'updated_at': datetime.now() - timedelta(hours=2)}
+        )
+        db.session.commit()
+    assert driver2.dispatch_status(client, True).status_code == 200
+    assert driver2.get_dispatch_status(client).get_json()['updated_at'] < seen_at
+    with app.app_context():
+        seen_since = datetime.now() - timedelta(minutes=5)
+        available = [state.driver_id for state, _ in get_available_drivers(seen_since)]
+        assert driver2.get_id() not in available
+
+def test_24_search_restaurants_near(client):
+    """Test for Searching the Restaurants around the Delivery Postcode"""
+    # both restaurants are in the city, about 6 km from Randwick
+    response = customer1.search_restaurant(client, postcode='2031')
+    assert response.status_code == 200
+    restaurants = response.get_json()
+    assert [r['name'] for r in restaurants] == [restaurant1.name, restaurant2.name]
+    assert 5 < restaurants[0]['distance_km'] < 7
+    assert customer1.search_restaurant(client, postcode='2031', radius_km=3).get_json() == []
+    assert customer1.search_restaurant(client, postcode='9999').status_code == 400
+    assert customer1.search_restaurant(client, postcode='2031', radius_km=100).status_code == 400
+    assert customer1.search_restaurant(client, postcode='2031', radius_km=-1).status_code == 400
+    # 0 is not the default radius: only the postcode itself
+    assert customer1.search_restaurant(client, postcode='2031', radius_km=0).get_json() == []
+
+    # one page at a time, by distance
+    response = customer1.search_restaurant(client, postcode='2031', limit=1).get_json()
+    assert [r['name'] for r in response['items']] == [restaurant1.name]
+    response = customer1.search_restaurant(
+        client, postcode='2031', limit=1, after=response['next_cursor']
+    ).get_json()
+    assert [r['name'] for r in response['items']] == [restaurant2.name]
+
+    # a restaurant without review has no rating
+    response = customer1.search_restaurant(client, postcode='2031', min_rating=0)
+    assert response.get_json() == []
+    assert customer1.search_restaurant(client, min_rating=6).status_code == 400
+
+    # restaurant1 opens in an hour
+    now = datetime.now()
+    in_1_hour = (now + timedelta(hours=1)).strftime('%H:%M')
+    in_2_hours = (now + timedelta(hours=2)).strftime('%H:%M')
+    assert restaurant1.set_opening_hours(client, in_1_hour, '').status_code == 400
+    assert restaurant1.set_opening_hours(client, in_1_hour, '25:00').status_code == 400
+    assert restaurant1.set_opening_hours(client, in_1_hour, in_2_hours).status_code == 200
+    response = customer1.search_restaurant(client, postcode='2031', open_now=True)
+    assert [r['name'] for r in response.get_json()] == [restaurant2.name]
+
+    # closed for an hour only, open past midnight
+    assert restaurant1.set_opening_hours(client, in_2_hours, in_1_hour).status_code == 200
+    response = customer1.search_restaurant(client, postcode='2031', open_now=True)
+    assert len(response.get_json()) == 2
+
+    # always open again
+    assert restaurant1.set_opening_hours(client, '', '').status_code == 200
+    assert restaurant1.get_me(client).get_json()['opening_time'] is None
+
+def test_25_order_quote(client):
+    """Test for the Checkout Charged the Quote of the Server"""
+    menu_item = restaurant1.items_get(client).get_json()[0]
+    assert customer1.cart_update(client, menu_item['id'], 2).status_code == 200
+
+    response = customer1.order_quote(client, restaurant1.get_id(), '2031')
+    assert response.status_code == 200
+    quote = response.get_json()
+    assert quote['order_price'] == round(2 * menu_item['price'], 2)
+    # about 6 km from the city
+    assert quote['delivery_fee'] == 10
+    assert quote['total_price'] == round(quote['order_price'] + 10, 2)
+    # too few orders of the restaurant for its preparation time, the default 20 minutes,
+    # and the deliveries of the tests took no time
+    assert quote['eta_minutes'] == 20
+    assert customer1.order_quote(client, restaurant2.get_id(), '2031').status_code == 400
+
+    order = {
+        'restaurant_id': restaurant1.get_id(), 'address': 'someaddree', 'suburb': 'Randwick',
+        'state': 'NSW', 'postcode': '2031', 'customer_notes': '',
+        'card_number': '1234-1234-4567-7890', 'order_price': 0, 'delivery_fee': 0,
+        'total_price': 0
+    }
+    # the quote id is signed, and only valid for what was quoted
+    response = customer1.order_new(client, **order, quote_id=quote['quote_id'] + 'x')
+    assert response.get_json()['message'].endswith('Invalid Quote')
+    response = customer1.order_new(
+        client, **dict(order, postcode='2000'), quote_id=quote['quote_id']
+    )
+    assert response.get_json()['message'].endswith('Quote Does Not Match The Order')
+    customer1.cart_update(client, menu_item['id'], 3)
+    response = customer1.order_new(client, **order, quote_id=quote['quote_id'])
+    assert response.get_json()['message'].endswith('Cart Changed Since The Quote')
+    customer1.cart_update(client, menu_item['id'], 2)
+    with app.app_context():
+        db.session.get(MenuItem, menu_item['id']).price += 1
+        db.session.commit()
+    response = customer1.order_new(client, **order, quote_id=quote['quote_id'])
+    assert response.get_json()['message'].endswith('Prices Changed Since The Quote')
+    with app.app_context():
+        db.session.get(MenuItem, menu_item['id']).price -= 1
+        db.session.commit()
+
+    # without a SECRET_KEY, nothing can be signed
+    app.config['SECRET_KEY'] = None
+    try:
+        assert customer1.order_quote(
+            client, restaurant1.get_id(), '2031'
+        ).get_json()['quote_id'] is None
+        response = customer1.order_new(client, **order, quote_id=quote['quote_id'])
+        assert response.get_json()['message'].endswith('Quotes Disabled')
+    finally:
+        app.config['SECRET_KEY'] = 'test-secret-key'
+
+    # charged the quote, not the prices sent
+    response = customer1.order_new(client, **order, quote_id=quote['quote_id'])
+    assert response.status_code == 200
+    assert response.get_json()['delivery_fee'] == 10
+    assert response.get_json()['total_price'] == quote['total_price']
+
+def test_26_prep_time_model(client):
+    """Test for the Preparation Times Learnt per Restaurant, Hour and Kitchen Queue"""
+    restaurant_id = restaurant1.get_id()
+    noon = datetime(2025, 1, 1, 12)
+    with app.app_context():
+        assert estimate_prep_minutes(restaurant_id, noon, 0) is None
+        # 15 minutes with an empty kitchen at noon, 30 minutes with 4 orders ahead
+        for queue, minutes in [(0, 15)] * 5 + [(4, 30)] * 5:
+            order = Order(restaurant_id=restaurant_id, order_time=noon, kitchen_queue=queue)
+            record_prep_time(order, noon + timedelta(minutes=minutes))
+        db.session.commit()
+        forget_prep_stats(restaurant_id)
+        assert estimate_prep_minutes(restaurant_id, noon, 0) == 15
+        assert estimate_prep_minutes(restaurant_id, noon, 5) == 30
+        # no order at 8 pm yet, the same kitchen queue at other hours
+        assert estimate_prep_minutes(restaurant_id, noon.replace(hour=20), 3) == 30
+
+    # the order is expected ready in 15+ minutes, its offers wait
+    menu_id = restaurant1.items_get(client).get_json()[0]['id']
+    customer1.cart_update(client, menu_id, 1)
+    order_id = customer1.order_new(
+        client=client, restaurant_id=restaurant_id, address='someaddree',
+        suburb='some suburb', state='NSW', postcode='2000', customer_notes='',
+        card_number='1234-1234-4567-7890', order_price=10.0, delivery_fee=2.0,
+        total_price=12.0
+    ).get_json()['id']
+    assert restaurant1.order_action(client, 'accept', order_id).status_code == 200
+    app.config['DISPATCH_ENABLED'] = True
+    try:
+        with app.app_context():
+            assert run_dispatch_tick().held == 1
+        assert restaurant1.order_action(client, 'ready', order_id).status_code == 200
+        with app.app_context():
+            assert run_dispatch_tick().held == 0
+    finally:
+        app.config['DISPATCH_ENABLED'] = False
+
+    # the nightly refit keeps the orders only: those of the tests were ready at once
+    with app.app_context():
+        learnt = refit_prep_times(datetime.now() - timedelta(days=28))
+        assert learnt >= 2
+        assert sum(stat.samples for stat in PrepTimeStat.query.all()) == learnt
+        assert estimate_prep_minutes(restaurant_id, noon, 0) is None
+
+def test_27_stream_out_of_order_commits(client): # pylint: disable=unused-argument
+    """Test for a Stream Sending an Event Committed After a Newer One"""
+    # the events of the database, 11 is committed (and published) before 10
+    committed = {}
+    hub = EventHub()
+    stream = event_stream(
+        hub.subscribe('key'),
+        lambda after_id: [(event_id, committed[event_id])
+                          for event_id in sorted(committed) if event_id > after_id],
+        9, heartbeat=0.01, retry_ms=3000
+    )
+    assert next(stream).startswith('retry:')
+    assert next(stream) == ': heartbeat\n\n'
+
+    committed[11] = 'eleven'
+    hub.publish('key', 11)
+    assert next(stream) == 'eleven'
+    committed[10] = 'ten'
+    hub.publish('key', 10)
+    assert next(stream) == 'ten'
+
+    # already sent, on the heartbeats too
+    hub.publish('key', 11)
+    assert next(stream) == ': heartbeat\n\n'
+    stream.close()
+    assert hub.subscriber_count('key') == 0
+
+def test_28_order_reports(client):
+    """Test for the Report Totals and Series, by Day, Week and Month"""
+    delivered = [
+        # Monday, the first day of the report
+        (datetime(2024, 3, 4, 10), 20.0, 5.0, 'DELIVERED'),
+        (datetime(2024, 3, 6, 12), 30.0, 10.0, 'DELIVERED'),
+        # the last day of the report is included
+        (datetime(2024, 3, 10, 23, 30), 10.0, 5.0, 'DELIVERED'),
+        (datetime(2024, 3, 11), 10.0, 5.0, 'DELIVERED'),
+        (datetime(2024, 3, 5), 10.0, 5.0, 'CANCELLED'),
+    ]
+    with app.app_context():
+        for order_time, order_price, delivery_fee, status in delivered:
+            db.session.add(Order(
+                customer_id=customer1.get_id(), restaurant_id=restaurant1.get_id(),
+                driver_id=driver1.get_id(), order_status=OrderStatus(status),
+                address='someaddree', suburb='some suburb', postcode='2000',
+                order_price=order_price, delivery_fee=delivery_fee,
+                total_price=order_price + delivery_fee, order_time=order_time,
+                card_number='1234123445677890'
+            ))
+        db.session.commit()
+
+    def report(user, role, **args):
+        return client.get(f'/report/{role}', headers=user.headers, query_string={
+            'start_date': '2024-03-04', 'end_date': '2024-03-10', **args
+        }).get_json()
+
+    # the driver earns the delivery fees, every day of the range has a point
+    response = report(driver1, 'driver')
+    assert response['total_order'] == 3 and response['total_earning'] == 20
+    assert [point['date'] for point in response['data']] == [
+        f'2024-03-{day:02}' for day in range(4, 11)
+    ]
+    assert [point['earnings'] for point in response['data']] == [5, 0, 10, 0, 0, 0, 5]
+    assert [point['num_orders'] for point in response['data']] == [1, 0, 1, 0, 0, 0, 1]
+
+    response = report(driver1, 'driver', bucket='week')
+    assert response['data'] == [{'date': '2024-03-04', 'num_orders': 3, 'earnings': 20}]
+
+    # the restaurant earns the order prices
+    response = report(restaurant1, 'restaurant', end_date='2024-03-11', bucket='month')
+    assert response['total_earning'] == 70
+    assert response['data'] == [{'date': '2024-03-01', 'num_orders': 4, 'earnings': 70}]
+
+    assert report(customer1, 'customer')['total_spending'] == 60
+    assert report(customer1, 'customer', bucket='year')['message']
@@ -10,9 +10,11 @@ class CustomerTest(UserTest):
         - login
         - register
         - cart update
+        - cart batch update
         - cart get
         - order_new
         - order_get
+        - review create, delete and get
     """
     def __init__(
         self,
@@ -76,6 +78,14 @@ class CustomerTest(UserTest):
         )
         return res
 
+    def cart_batch_update(self, client, items: list):
+        """PUT /customer-order/cart/batch, items: [{menu_id, quantity}]"""
+        return client.put(
+            '/customer-order/cart/batch',
+            headers = self.headers,
+            json = {'items': items}
+        )
+
     def cart_get(self, client):
         """GET /customer-order/cart"""
         return client.get('/customer-order/cart', headers = self.headers)
@@ -92,26 +102,33 @@ class CustomerTest(UserTest):
         card_number: str,
         order_price: float,
         delivery_fee: float,
-        total_price: float
+        total_price: float,
+        quote_id: str = None
     ):
-        """POST /customer-order/order"""
-        res = client.post(
-            '/customer-order/order',
+        """POST /customer-order/order, charged the quote when quote_id is given"""
+        data = {
+            'restaurant_id': restaurant_id,
+            'address': address,
+            'suburb': suburb,
+            'state': state,
+            'postcode': postcode,
+            'customer_notes': customer_notes,
+            'card_number': card_number,
+            'order_price': order_price,
+            'delivery_fee': delivery_fee,
+            'total_price': total_price
+        }
+        if quote_id:
+            data['quote_id'] = quote_id
+        return client.post('/customer-order/order', headers = self.headers, json=data)
+
+    def order_quote(self, client, restaurant_id: int, postcode: str):
+        """GET /customer-order/quote"""
+        return client.get(
+            '/customer-order/quote',
             headers = self.headers,
-            json={
-                'restaurant_id': restaurant_id,
-                'address': address,
-                'suburb': suburb,
-                'state': state,
-                'postcode': postcode,
-                'customer_notes': customer_notes,
-                'card_number': card_number,
-                'order_price': order_price,
-                'delivery_fee': delivery_fee,
-                'total_price': total_price
-            }
+            query_string = {'restaurant_id': restaurant_id, 'postcode': postcode}
         )
-        return res
 
     def orders_get(self, client):
         """GET /customer-order/orders"""
@@ -119,3 +136,22 @@ class CustomerTest(UserTest):
             '/customer-order/orders',
             headers = self.headers
         )
+
+    def review_restaurant(self, client, restaurant_id: int, order_id: int, rating: float):
+        """PUT /review/restaurant/<restaurant_id>/order/<order_id>"""
+        return client.put(
+            f'/review/restaurant/{restaurant_id}/order/{order_id}',
+            headers = self.headers,
+            data = {'rating': rating, 'review_text': 'review'}
+        )
+
+    def review_delete(self, client, review_id: int):
+        """DELETE /review/customer-delete/<review_id>"""
+        return client.delete(
+            f'/review/customer-delete/{review_id}',
+            headers = self.headers
+        )
+
+    def reviews_of(self, client, user_type: str, user_id: int):
+        """GET /review/<user_type>/<user_id>"""
+        return client.get(f'/review/{user_type}/{user_id}')
@@ -13,6 +13,11 @@ class DriverTest(UserTest):
         - pickup_order
         - accept_order
         - complete_order
+        - dispatch_status
+        - send_location
+        - get_dispatch_status
+        - dispatch_offers
+        - decline_offer
     """
     def __init__(
         self,
@@ -86,3 +91,40 @@ class DriverTest(UserTest):
             f'/driver-order/order/complete/{order_id}',
             headers = self.headers
         )
+
+    def dispatch_status(self, client, available: bool, **position):
+        """PUT /dispatch/driver/status, position: lat and lon, or postcode"""
+        return client.put(
+            '/dispatch/driver/status',
+            headers = self.headers,
+            json = {'available': available, **position}
+        )
+
+    def send_location(self, client, lat: float, lon: float):
+        """POST /dispatch/driver/location"""
+        return client.post(
+            '/dispatch/driver/location',
+            headers = self.headers,
+            json = {'lat': lat, 'lon': lon}
+        )
+
+    def get_dispatch_status(self, client):
+        """GET /dispatch/driver/status"""
+        return client.get(
+            '/dispatch/driver/status',
+            headers = self.headers
+        )
+
+    def dispatch_offers(self, client):
+        """GET /dispatch/offers"""
+        return client.get(
+            '/dispatch/offers',
+            headers = self.headers
+        )
+
+    def decline_offer(self, client, order_id: int):
+        """POST /dispatch/offers/<int:order_id>/decline"""
+        return client.post(
+            f'/dispatch/offers/{order_id}/decline',
+            headers = self.headers
+        )
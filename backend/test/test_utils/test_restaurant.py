@@ -196,6 +196,12 @@ class RestaurantTest(UserTest):
 
         return res
 
+    def item_delete(self, client, menu_id: int):
+        """DELETE /restaurant-menu/item/{menu_id}"""
+        return client.delete(
+            f'/restaurant-menu/item/{menu_id}',
+            headers = self.headers,
+        )
 
     def items_get(self, client):
         """GET /restaurant-menu/items"""
@@ -224,3 +230,20 @@ class RestaurantTest(UserTest):
             f'/restaurant-order/orders/{action}/{order_id}',
             headers = self.headers
         )
+
+    def drivers_nearby(self, client, radius_km: float):
+        """GET /dispatch/drivers/nearby"""
+        return client.get(
+            '/dispatch/drivers/nearby',
+            headers = self.headers,
+            query_string = {'radius_km': radius_km}
+        )
+
+    def set_opening_hours(self, client, opening_time: str, closing_time: str):
+        """PUT /restaurant/update with the opening hours only"""
+        return client.put(
+            '/restaurant/update',
+            headers = self.headers,
+            content_type='multipart/form-data',
+            data={'opening_time': opening_time, 'closing_time': closing_time}
+        )
@@ -6,10 +6,14 @@ class UserTest:
     This will be parent for Admin, Customer, Driver, Restaurant
     Features:
         - login
+        - logout
         - get_me
         - chat_send
         - chat_get
+        - chat_inbox
+        - chat_stream
         - chat_get_all
+        - order_stream
     """
     def __init__(self, email: str, password: str):
         self.email = email
@@ -38,6 +42,13 @@ class UserTest:
             self.id = res.get_json()['id']
         return res
 
+    def logout(self, client):
+        """POST /auth/logout"""
+        return client.post(
+            '/auth/logout',
+            headers = self.headers
+        )
+
     def get_id(self):
         """Return ID of self"""
         return self.id
@@ -61,11 +72,56 @@ class UserTest:
             json = {'message': message}
         )
 
-    def chat_get(self, client, user_type: str, user_id: int):
-        """GET /chat/get/{user_type}/{user_id}"""
+    def chat_get(self, client, user_type: str, user_id: int, **page):
+        """GET /chat/get/{user_type}/{user_id}, page: after, limit"""
         return client.get(
             f'/chat/get/{user_type}/{user_id}',
-            headers = self.headers
+            headers = self.headers,
+            query_string = page
+        )
+
+    def chat_inbox(self, client, **page):
+        """GET /chat/inbox, page: after, limit"""
+        return client.get(
+            '/chat/inbox',
+            headers = self.headers,
+            query_string = page
+        )
+
+    def chat_stream(self, client, **args):
+        """GET /chat/stream (not buffered), args: since, token"""
+        return client.get(
+            '/chat/stream',
+            headers = self.headers,
+            query_string = args,
+            buffered = False
+        )
+
+    def order_stream(self, client, **args):
+        """GET /order-event/stream (not buffered), args: since, token"""
+        return client.get(
+            '/order-event/stream',
+            headers = self.headers,
+            query_string = args,
+            buffered = False
+        )
+
+    def search_menu(self, client, **args):
+        """GET /search/menu, args: q, menu_name, restaurant_name, suburb, is_available"""
+        return client.get('/search/menu', query_string = args)
+
+    def search_restaurant(self, client, **args):
+        """
+        GET /search/restaurant, args: q, restaurant_name, suburb, postcode, radius_km,
+        min_rating, open_now
+        """
+        return client.get('/search/restaurant', query_string = args)
+
+    def menu_get(self, client, restaurant_id: int, etag: str = None):
+        """GET /restaurant-menu/{restaurant_id}, conditional when etag is given"""
+        return client.get(
+            f'/restaurant-menu/{restaurant_id}',
+            headers = {'If-None-Match': etag} if etag else {}
         )
 
     def chat_get_all(self, client):
@@ -0,0 +1,39 @@
+"""
+Create the resized copies (thumb, card, full) of every image already in the upload folder.
+Images that already have all their copies are skipped, pass --force to recreate them.
+"""
+import os
+import sys
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import app # pylint: disable=wrong-import-position
+from utils.image import ( # pylint: disable=wrong-import-position
+    DERIVED_FOLDER, IMAGE_EXTENSIONS, create_derivatives
+)
+
+def backfill_images(upload_folder: str, force: bool = False) -> int:
+    """Create the missing copies, return the number of images processed"""
+    processed = 0
+    for root, dirs, files in os.walk(upload_folder):
+        # do not resize the resized copies
+        if root == upload_folder and DERIVED_FOLDER in dirs:
+            dirs.remove(DERIVED_FOLDER)
+
+        for filename in sorted(files):
+            if filename.rsplit('.', 1)[-1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            image_path = os.path.relpath(os.path.join(root, filename), upload_folder)
+            try:
+                if create_derivatives(upload_folder, image_path, force):
+                    processed += 1
+            except ValueError as e:
+                print(f"Skipped: {e}")
+    return processed
+
+
+if __name__ == "__main__":
+    print("Creating resized images, please wait...")
+    count = backfill_images(app.config['UPLOAD_FOLDER'], force='--force' in sys.argv)
+    print(f"Resized copies created for {count} images.")
@@ -0,0 +1,135 @@
+"""
+Simulate the dispatch without a database: drivers spread over the delivery area, new
+orders at random restaurant postcodes every tick, and offered drivers who accept,
+decline or let the offer expire. Prints the time match_orders takes per tick, and the
+time of a full scan (scoring every driver for every order) on the first tick.
+
+    python utils/benchmark_dispatch.py [--drivers 3000] [--orders 2000] [--ticks 5]
+                                       [--accept 0.5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Set
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.geo import ( # pylint: disable=wrong-import-position
+    KM_PER_DEGREE, haversine_km, load_postcodes
+)
+from routes.dispatch.services import ( # pylint: disable=wrong-import-position
+    MAX_LIVE_OFFERS, MAX_LOAD, DriverCandidate, Offer, OpenOrder, match_orders, score_driver
+)
+
+OFFER_SIZE = 3
+MAX_ROUNDS = 3
+# ticks a driver takes to deliver an order
+DELIVERY_TICKS = 3
+
+def random_position(centres: List, spread_km: float):
+    """A point within spread_km of a random postcode centre"""
+    lat, lon = random.choice(centres)
+    spread = spread_km / KM_PER_DEGREE
+    return lat + random.uniform(-spread, spread), lon + random.uniform(-spread, spread)
+
+def full_scan(orders: List[OpenOrder], drivers: List[DriverCandidate]) -> List[Offer]:
+    """Reference matching: score every driver for every order, first round only"""
+    counts: Dict[int, int] = {}
+    offers = []
+    for order in orders:
+        scored = sorted(
+            (score_driver(
+                haversine_km(order.lat, order.lon, driver.lat, driver.lon),
+                driver.load, driver.rating
+            ), driver.id)
+            for driver in drivers
+            if driver.load < MAX_LOAD and counts.get(driver.id, 0) < MAX_LIVE_OFFERS
+        )
+        for score, driver_id in scored[:OFFER_SIZE]:
+            counts[driver_id] = counts.get(driver_id, 0) + 1
+            offers.append(Offer(order.id, driver_id, 1, score, None))
+    return offers
+
+def main():
+    """Run the ticks and print their timings"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--drivers', type=int, default=3000)
+    parser.add_argument('--orders', type=int, default=2000, help='new orders per tick')
+    parser.add_argument('--ticks', type=int, default=5)
+    parser.add_argument('--accept', type=float, default=0.5,
+                        help='chance an offered driver accepts')
+    args = parser.parse_args()
+    random.seed(0)
+
+    centres = list(load_postcodes().values())
+    drivers = {
+        driver_id: DriverCandidate(
+            driver_id, *random_position(centres, 3), 0, random.uniform(3, 5)
+        )
+        for driver_id in range(1, args.drivers + 1)
+    }
+    # driver id -> ticks left of each delivery
+    deliveries: Dict[int, List[int]] = {driver_id: [] for driver_id in drivers}
+    open_orders: Dict[int, OpenOrder] = {}
+    next_order_id = 1
+
+    print(f'{args.drivers} drivers, {args.orders} new orders per tick, '
+          f'{args.accept:.0%} of the offers accepted')
+    print(f'{"tick":>4}{"open":>8}{"offers":>8}{"to all":>8}{"taken":>8}{"match ms":>10}')
+    for tick in range(1, args.ticks + 1):
+        for _ in range(args.orders):
+            lat, lon = random_position(centres, 1)
+            open_orders[next_order_id] = OpenOrder(next_order_id, lat, lon, 1, frozenset())
+            next_order_id += 1
+
+        candidates = list(drivers.values())
+        start = time.perf_counter()
+        offers = match_orders(list(open_orders.values()), candidates, {}, OFFER_SIZE, MAX_ROUNDS)
+        match_ms = (time.perf_counter() - start) * 1000
+
+        if tick == 1:
+            start = time.perf_counter()
+            full_scan(list(open_orders.values()), candidates)
+            scan_ms = (time.perf_counter() - start) * 1000
+
+        # the drivers answer: the first to accept takes the order
+        offered: Dict[int, Set[int]] = {}
+        taken, opened = set(), 0
+        for offer in offers:
+            if offer.driver_id is None:
+                # opened to every driver: taken by somebody outside the simulation
+                opened += 1
+                taken.add(offer.order_id)
+                continue
+            offered.setdefault(offer.order_id, set()).add(offer.driver_id)
+            driver = drivers[offer.driver_id]
+            if (offer.order_id not in taken and driver.load < MAX_LOAD
+                    and random.random() < args.accept):
+                taken.add(offer.order_id)
+                drivers[driver.id] = driver._replace(load=driver.load + 1)
+                deliveries[driver.id].append(DELIVERY_TICKS)
+
+        print(f'{tick:>4}{len(open_orders):>8}{len(offers) - opened:>8}{opened:>8}'
+              f'{len(taken):>8}{match_ms:>10.0f}')
+
+        for order_id in taken:
+            del open_orders[order_id]
+        rounds = {offer.order_id: offer.round for offer in offers}
+        for order_id, order in open_orders.items():
+            open_orders[order_id] = order._replace(
+                next_round=rounds.get(order_id, order.next_round - 1) + 1,
+                offered=order.offered | offered.get(order_id, set()),
+            )
+        # deliveries in progress move on a tick
+        for driver_id, left in deliveries.items():
+            left[:] = [ticks - 1 for ticks in left if ticks > 1]
+            drivers[driver_id] = drivers[driver_id]._replace(load=len(left))
+
+    print(f'full scan of the first tick: {scan_ms:.0f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Measure the location pings the app absorbs, on a new temporary SQLite database:
+- memory: POST /dispatch/driver/location (kept in memory, saved in batches by the
+  sync thread running meanwhile)
+- database: PUT /dispatch/driver/status with the position (one commit per ping)
+Then compare "drivers within 5 km" answered by the grid index with a scan of every driver.
+
+    python utils/benchmark_locations.py [--drivers 1000] [--threads 8] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from threading import Barrier, Lock, Thread
+from typing import List
+
+# find the app, on its own database
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(
+    tempfile.mkdtemp(), 'benchmark_locations.db'
+)
+
+from app import app # pylint: disable=wrong-import-position
+from utils.db import db # pylint: disable=wrong-import-position
+from utils.geo import haversine_km, load_postcodes # pylint: disable=wrong-import-position
+from utils.locations import LocationStore # pylint: disable=wrong-import-position
+from db_model import Driver # pylint: disable=wrong-import-position
+from db_model.db_query import create_session # pylint: disable=wrong-import-position
+
+def create_drivers(count: int) -> List[str]:
+    """Drivers with a session each, return their tokens"""
+    with app.app_context():
+        db.create_all()
+        drivers = [
+            Driver(
+                email=f'driver{i}@example.com', password='x', first_name='Driver',
+                last_name=str(i), phone='0400000000', license_number=str(i),
+                car_plate='ABC123', url_license_image='uploads/license.png',
+                url_registration_paper='uploads/paper.png'
+            )
+            for i in range(count)
+        ]
+        db.session.add_all(drivers)
+        db.session.flush()
+        tokens = [create_session(driver) for driver in drivers]
+        db.session.commit()
+    return tokens
+
+def random_position():
+    """A point near a random postcode centre"""
+    lat, lon = random.choice(list(load_postcodes().values()))
+    return lat + random.uniform(-0.02, 0.02), lon + random.uniform(-0.02, 0.02)
+
+def run(mode: str, tokens: List[str], threads: int, seconds: float) -> float:
+    """Pings per second sent by the threads, each with its own client and drivers"""
+    counts = [0, 0]
+    lock = Lock()
+    start = Barrier(threads)
+
+    def work(own_tokens):
+        done, failed = 0, 0
+        with app.test_client() as client:
+            start.wait()
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                token = random.choice(own_tokens)
+                lat, lon = random_position()
+                if mode == 'memory':
+                    response = client.post(
+                        '/dispatch/driver/location', headers={'Authorization': token},
+                        json={'lat': lat, 'lon': lon}
+                    )
+                else:
+                    response = client.put(
+                        '/dispatch/driver/status', headers={'Authorization': token},
+                        json={'available': True, 'lat': lat, 'lon': lon}
+                    )
+                if response.status_code == 200:
+                    done += 1
+                else:
+                    failed += 1
+        with lock:
+            counts[0] += done
+            counts[1] += failed
+
+    workers = [Thread(target=work, args=(tokens[i::threads],)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if counts[1]:
+        print(f'  {counts[1]} failed pings')
+    return counts[0] / seconds
+
+def compare_radius_queries(count: int, queries: int) -> None:
+    """Time of the radius queries with the grid index and with a scan"""
+    store = LocationStore()
+    positions = {}
+    for driver_id in range(count):
+        lat, lon = random_position()
+        positions[driver_id] = (lat, lon)
+        store.load(driver_id, lat, lon, datetime.now(), True)
+    centres = [random_position() for _ in range(queries)]
+
+    start = time.perf_counter()
+    for lat, lon in centres:
+        store.within(lat, lon, 5)
+    grid_ms = (time.perf_counter() - start) * 1000 / queries
+
+    start = time.perf_counter()
+    for lat, lon in centres:
+        sorted(
+            (distance, driver_id) for driver_id, distance in (
+                (driver_id, haversine_km(lat, lon, *position))
+                for driver_id, position in positions.items()
+            ) if distance <= 5
+        )
+    scan_ms = (time.perf_counter() - start) * 1000 / queries
+    print(f'drivers within 5 km of {count} drivers: grid {grid_ms:.2f} ms, scan {scan_ms:.2f} ms')
+
+def main():
+    """Run both modes and the radius queries, print the results"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--drivers', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    random.seed(0)
+
+    tokens = create_drivers(args.drivers)
+    print(f'{args.drivers} drivers, {args.threads} threads, {args.seconds:g}s per mode')
+    for mode in ['memory', 'database']:
+        print(f'{mode:<10}{run(mode, tokens, args.threads, args.seconds):>8.0f} pings/s')
+    compare_radius_queries(10000, 1000)
+
+
+if __name__ == "__main__":
+    main()
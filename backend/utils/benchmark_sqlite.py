@@ -0,0 +1,121 @@
+"""
+Measure the mixed read / write throughput of SQLite with the default settings and
+with the pragmas of utils/sqlite.py. Each run uses a new temporary database.
+
+Readers load the last chats of a user (like /chat/get), writers send a chat
+(one insert, one commit). A busy error (database is locked) counts as a failed operation.
+
+    python utils/benchmark_sqlite.py [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from threading import Barrier, Lock, Thread
+from typing import Dict
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, insert, or_, select # pylint: disable=wrong-import-position
+from sqlalchemy.engine import Engine # pylint: disable=wrong-import-position
+from sqlalchemy.exc import OperationalError # pylint: disable=wrong-import-position
+from utils.sqlite import SQLITE_PRAGMAS, tune_engine # pylint: disable=wrong-import-position
+from db_model import Chat # pylint: disable=wrong-import-position
+from db_model.db_enum import ChatSupportUserType # pylint: disable=wrong-import-position
+
+USERS = 50
+SEEDED_CHATS = 20000
+
+def random_chat() -> Dict:
+    """A chat between a random customer and a random restaurant"""
+    return {
+        'from_type': ChatSupportUserType.CUSTOMER,
+        'from_id': random.randint(1, USERS),
+        'to_type': ChatSupportUserType.RESTAURANT,
+        'to_id': random.randint(1, USERS),
+        'message': 'x' * random.randint(10, 200),
+        'time': datetime.now(),
+    }
+
+def make_engine(path: str, tuned: bool) -> Engine:
+    """Engine on a new database with the seeded chats"""
+    engine = create_engine(f'sqlite:///{path}')
+    if tuned:
+        tune_engine(engine, SQLITE_PRAGMAS)
+    Chat.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Chat), [random_chat() for _ in range(SEEDED_CHATS)])
+    return engine
+
+def read_chats(engine: Engine) -> None:
+    """The last chats of a random customer"""
+    user_id = random.randint(1, USERS)
+    with engine.connect() as conn:
+        conn.execute(
+            select(Chat).where(or_(
+                (Chat.from_type == ChatSupportUserType.CUSTOMER) & (Chat.from_id == user_id),
+                (Chat.to_type == ChatSupportUserType.CUSTOMER) & (Chat.to_id == user_id),
+            )).order_by(Chat.id.desc()).limit(50)
+        ).all()
+
+def write_chat(engine: Engine) -> None:
+    """Send one chat, in its own transaction"""
+    with engine.begin() as conn:
+        conn.execute(insert(Chat), random_chat())
+
+def run(engine: Engine, seconds: float, readers: int, writers: int) -> Dict[str, int]:
+    """Operations done by every thread until the time is up"""
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = Lock()
+    start = Barrier(readers + writers)
+
+    def work(operation, key):
+        done, errors = 0, 0
+        start.wait()
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            try:
+                operation(engine)
+                done += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counts[key] += done
+            counts['errors'] += errors
+
+    threads = [Thread(target=work, args=(read_chats, 'reads')) for _ in range(readers)]
+    threads += [Thread(target=work, args=(write_chat, 'writes')) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+def main():
+    """Run both profiles and print the operations per second"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile')
+    print(f'{"profile":<10}{"reads/s":>10}{"writes/s":>10}{"errors":>8}')
+    with tempfile.TemporaryDirectory() as folder:
+        for profile in ['default', 'tuned']:
+            random.seed(0)
+            engine = make_engine(os.path.join(folder, f'{profile}.db'), profile == 'tuned')
+            counts = run(engine, args.seconds, args.readers, args.writers)
+            engine.dispose()
+            print(
+                f'{profile:<10}{counts["reads"] / args.seconds:>10.0f}'
+                f'{counts["writes"] / args.seconds:>10.0f}{counts["errors"]:>8}'
+            )
+
+
+if __name__ == "__main__":
+    main()
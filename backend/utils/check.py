@@ -41,6 +41,10 @@ def is_valid_state(state: str) -> bool:
     except ValueError:
         return False
 
+def is_valid_time_of_day(value: str) -> bool:
+    """Return boolean about whether given string is a time of the day (HH:MM)"""
+    return bool(re.fullmatch(r"([01]\d|2[0-3]):[0-5]\d", value))
+
 def is_valid_license_number(license_number: str) -> bool:
     """Return boolean about whether given string is valid license number"""
     return license_number.isdigit()
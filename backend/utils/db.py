@@ -1,3 +1,20 @@
+from enum import Enum
+from typing import Type
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Enum as SQLEnum, MetaData
+from sqlalchemy.sql.schema import DEFAULT_NAMING_CONVENTION
+
+# the CHECK constraint of an enum column is named after its table and column
+db = SQLAlchemy(metadata=MetaData(naming_convention={
+    **DEFAULT_NAMING_CONVENTION,
+    'ck': 'ck_%(table_name)s_%(column_0_name)s',
+}))
 
-db = SQLAlchemy()
\ No newline at end of file
+def enum_type(enum_class: Type[Enum]) -> SQLEnum:
+    """
+    Column type of an Enum, stored the same way on SQLite and PostgreSQL:
+    a VARCHAR of the member name with a CHECK constraint on the allowed names.
+    A native PostgreSQL ENUM would need ALTER TYPE for every new member.
+    """
+    return SQLEnum(enum_class, name=None, native_enum=False, create_constraint=True)
@@ -0,0 +1,54 @@
+"""
+Run the dispatch (routes/dispatch/services.py): every DISPATCH_INTERVAL seconds, expire
+the offers not answered and offer the orders waiting for a driver to the best drivers.
+Run one dispatcher next to the server, with DISPATCH_ENABLED set for both.
+
+    python utils/dispatcher.py [--once]
+"""
+import argparse
+import os
+import sys
+import time
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy.exc import OperationalError # pylint: disable=wrong-import-position
+from app import app # pylint: disable=wrong-import-position
+from utils.db import db # pylint: disable=wrong-import-position
+from routes.dispatch.services import run_dispatch_tick # pylint: disable=wrong-import-position
+
+def main():
+    """Run the ticks until stopped"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--once', action='store_true', help='run one tick and exit')
+    args = parser.parse_args()
+
+    if not app.config['DISPATCH_ENABLED']:
+        sys.exit('DISPATCH_ENABLED is not set, the server shows the orders to every driver')
+
+    interval = app.config['DISPATCH_INTERVAL']
+    while True:
+        start = time.monotonic()
+        with app.app_context():
+            try:
+                result = run_dispatch_tick()
+            except OperationalError as e:
+                # e.g. the database is busy, try again next tick
+                db.session.rollback()
+                app.logger.warning('Dispatch tick failed: %s', e)
+                result = None
+        if result and (result.orders or result.expired):
+            print(
+                f'{result.orders} orders: {result.offers} offers, {result.opened} opened to all, '
+                f'{result.expired} expired, {result.held} held '
+                f'({(time.monotonic() - start) * 1000:.0f} ms)',
+                flush=True
+            )
+        if args.once:
+            break
+        time.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+In-process publish / subscribe hub for pushing events to open connections
+(Server-Sent Events streams).
+
+Each open stream subscribes to one or more keys (e.g. the (type, id) of the logged
+in user) and gets its own bounded queue. Publishing puts the event in the queue of
+every subscriber of the key and never blocks: a subscriber too slow to keep up is
+marked as overflowed.
+
+The hub only wakes the streams up: the events are always read from the database,
+in id order (see event_stream). The hub is local to the process, so with several
+workers a stream also reads the database on every heartbeat, for the events
+published by the other workers.
+"""
+import json
+import time
+from collections import defaultdict
+from queue import Empty, Full, Queue
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from flask import Response
+from flask_restx import reqparse
+from werkzeug.datastructures import EnvironHeaders
+
+# returned by Subscription.get when events were dropped
+OVERFLOW = object()
+
+# Ids are given on insert but committed in any order (concurrent transactions, other
+# workers): an event committed up to this many seconds after a newer one is still sent.
+SETTLE_SECONDS = 60
+
+"""Stream Request, EventSource cannot send the Authorization header"""
+stream_parser = reqparse.RequestParser()
+stream_parser.add_argument(
+    'since', type=int, location='args', required=False,
+    help='id of the last event the client has, only the newer events are sent'
+)
+stream_parser.add_argument(
+    'token', type=str, location='args', required=False,
+    help='Authorization token, when the Authorization header cannot be sent'
+)
+
+class Subscription:
+    """Events of some keys for one open connection"""
+    def __init__(self, hub: "EventHub", keys: Tuple[Hashable, ...], maxsize: int):
+        self.hub = hub
+        self.keys = keys
+        self.overflowed = False
+        self._queue: Queue = Queue(maxsize)
+
+    def put(self, event: Any) -> None:
+        """Queue the event, or mark the subscription as overflowed when full"""
+        try:
+            self._queue.put_nowait(event)
+        except Full:
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[Any]:
+        """
+        Wait for the next event. None on timeout.
+        OVERFLOW if events were dropped, the queue is emptied then.
+        """
+        if self.overflowed:
+            self.overflowed = False
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except Empty:
+                    return OVERFLOW
+        try:
+            return self._queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def drain(self) -> None:
+        """Drop the queued events, once the stream has read the database"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                return
+
+    def close(self) -> None:
+        """Stop getting events"""
+        self.hub.unsubscribe(self)
+
+class EventHub:
+    """Thread-safe fan-out of events to the subscribers of a key"""
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[Hashable, Set[Subscription]] = defaultdict(set)
+        self._lock = Lock()
+
+    def subscribe(self, *keys: Hashable) -> Subscription:
+        """Start getting the events of the keys, close the subscription when done"""
+        subscription = Subscription(self, keys, self.queue_size)
+        with self._lock:
+            for key in keys:
+                self._subscribers[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop the subscription, does nothing if already stopped"""
+        with self._lock:
+            for key in subscription.keys:
+                subscribers = self._subscribers.get(key)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def publish(self, key: Hashable, event: Any) -> int:
+        """Send the event to every subscriber of the key, return the number of subscribers"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        return len(subscribers)
+
+    def subscriber_count(self, key: Hashable) -> int:
+        """Number of open subscriptions of the key"""
+        with self._lock:
+            return len(self._subscribers.get(key, ()))
+
+def format_event(event_id: int, event: str, data: Any) -> str:
+    """Format a Server-Sent Event, the id is sent back as Last-Event-ID on reconnect"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(
+    subscription: Subscription,
+    catch_up: Callable[[int], List[Tuple[int, str]]],
+    last_id: int,
+    heartbeat: float,
+    retry_ms: int
+) -> Iterator[str]:
+    """
+    Server-Sent Events after the event of id `last_id`.
+    catch_up(after_id) reads the (event id, formatted event) after after_id from the
+    database, oldest first. It is called on connect, whenever the subscription gets an
+    event (the published event itself is not sent) and on every idle heartbeat.
+    The events sent in the last SETTLE_SECONDS are read again and skipped, so an event
+    committed after a newer one is still sent, in the order of the commits.
+    """
+    # catch_up reads after `settled`, the ids sent since are in `sent` with their time
+    settled = last_id
+    sent: Dict[int, float] = {}
+
+    def send() -> str:
+        nonlocal settled
+        now = time.monotonic()
+        texts = []
+        for event_id, text in catch_up(settled):
+            if event_id not in sent:
+                sent[event_id] = now
+                texts.append(text)
+        old = [event_id for event_id, sent_at in sent.items() if sent_at <= now - SETTLE_SECONDS]
+        if old:
+            settled = max(settled, *old)
+            for event_id in [event_id for event_id in sent if event_id <= settled]:
+                del sent[event_id]
+        return ''.join(texts)
+
+    try:
+        # the browser reconnects after this delay (ms)
+        yield f"retry: {retry_ms}\n\n"
+        caught_up = send()
+        if caught_up:
+            yield caught_up
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            subscription.drain()
+            text = send()
+            if text:
+                yield text
+            elif event is None:
+                # a comment line keeps the connection open through proxies
+                yield ": heartbeat\n\n"
+    finally:
+        subscription.close()
+
+def get_resume_id(headers: EnvironHeaders, since: Optional[int]) -> Optional[int]:
+    """
+    Id of the last event the client has: the Last-Event-ID header sent by a
+    reconnecting EventSource, else `since`. Raise ValueError if the header is invalid.
+    """
+    last_event_id = headers.get('Last-Event-ID')
+    if not last_event_id:
+        return since
+    if not last_event_id.isdigit():
+        raise ValueError('Invalid Last-Event-ID')
+    return int(last_event_id)
+
+def stream_response(stream: Iterator[str], subscription: Subscription) -> Response:
+    """Response sending the Server-Sent Events as they come"""
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # ask nginx not to buffer the events
+    response.headers['X-Accel-Buffering'] = 'no'
+    # the stream may be closed before its first read
+    response.call_on_close(subscription.close)
+    return response
@@ -4,6 +4,8 @@ from typing import Optional
 from uuid import uuid4
 from flask import current_app
 from werkzeug.datastructures import FileStorage
+from db_model.db_enum import UploadKind
+from utils.upload_jobs import finish_upload, stage_upload, validate_upload
 
 SUPPORTED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 SUPPORTED_DOCS_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
@@ -43,23 +45,43 @@ def save_file(file: FileStorage) -> Optional[str]:
         current_app.logger.error(f"Error saving file: {e}")
         return None
 
+def save_upload(file: FileStorage, kind: UploadKind) -> Optional[str]:
+    """
+    Save the checked file and create its copies, see utils/upload_jobs.py.
+    With UPLOAD_ASYNC, the file is checked and the rest is done by a background job,
+    the URL is returned right away. Returns None if the file cannot be saved or is not valid.
+    """
+    if current_app.config['UPLOAD_ASYNC']:
+        return stage_upload(file, kind, get_file_extension(file))
+
+    url = save_file(file)
+    if url is None:
+        return None
+    try:
+        validate_upload(url)
+        finish_upload(kind, current_app.config['UPLOAD_FOLDER'], url)
+    except (ValueError, OSError) as e:
+        current_app.logger.error(f"Error processing file: {e}")
+        os.remove(url)
+        return None
+    return url
+
 def save_image(file: FileStorage) -> Optional[str]:
     """
     Save image file to the server and returns the stored URL.
+    The resized copies (thumb, card, full) are created as well, see utils/image.py.
+    Returns None if the file is not a readable image.
     """
-    if get_file_extension(file) in SUPPORTED_IMAGE_EXTENSIONS:
-    # Save file after checking extension
-        return save_file(file)
-    else:
+    if get_file_extension(file) not in SUPPORTED_IMAGE_EXTENSIONS:
         return None
+    return save_upload(file, UploadKind.IMAGE)
 
 # save the new file to the current app upload folder
 def save_document(file: FileStorage) -> Optional[str]:
     """
     Save document file to the server and returns the stored URL.
+    A gzip copy is saved as well for the types that compress (PDF), see utils/static.py.
     """
-    if get_file_extension(file) in SUPPORTED_DOCS_EXTENSIONS:
-    # Save file after checking extension
-        return save_file(file)
-    else:
+    if get_file_extension(file) not in SUPPORTED_DOCS_EXTENSIONS:
         return None
+    return save_upload(file, UploadKind.DOCUMENT)
@@ -0,0 +1,112 @@
+"""
+Utility functions for the resized copies (derivatives) of uploaded images.
+
+Every image gets a fixed-width WebP and JPEG copy per size, stored as
+`<upload folder>/_derived/<image path without extension>/<size>.<webp|jpg>`.
+The copies carry no EXIF data (the orientation is applied to the pixels first).
+"""
+import os
+from typing import List, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from werkzeug.security import safe_join
+
+# size name -> width in pixels
+IMAGE_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+DERIVED_FOLDER = '_derived'
+DERIVED_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+def derived_path(upload_folder: str, image_path: str, size: str, extension: str) -> Optional[str]:
+    """
+    Path of a derivative of the image (path relative to the upload folder).
+    None if the path escapes the upload folder.
+    """
+    stem = os.path.splitext(image_path)[0]
+    return safe_join(upload_folder, DERIVED_FOLDER, stem, f'{size}.{extension}')
+
+def create_derivatives(
+    upload_folder: str,
+    image_path: str,
+    force: bool = False,
+    source: Optional[str] = None
+) -> List[str]:
+    """
+    Create the missing derivatives of the image (path relative to the upload folder).
+    The image is read from source instead when it is not stored at its path yet.
+    Return the created paths, raise ValueError if the file is not a readable image.
+    """
+    if source is None:
+        source = safe_join(upload_folder, image_path)
+    if source is None:
+        raise ValueError(f'Invalid image path: {image_path}')
+
+    targets = {
+        (size, extension): derived_path(upload_folder, image_path, size, extension)
+        for size in IMAGE_SIZES for extension in DERIVED_FORMATS
+    }
+    if not force and all(os.path.exists(path) for path in targets.values()):
+        return []
+
+    try:
+        with Image.open(source) as original:
+            # apply the EXIF orientation, the saved copies have no EXIF
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (OSError, UnidentifiedImageError) as e:
+        raise ValueError(f'Not a readable image: {image_path}') from e
+
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    created = []
+    for size, width in IMAGE_SIZES.items():
+        # never upscale
+        resized = image
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+
+        for extension, options in DERIVED_FORMATS.items():
+            path = targets[(size, extension)]
+            if not force and os.path.exists(path):
+                continue
+            if extension == 'webp':
+                converted = resized.convert('RGBA' if has_alpha else 'RGB')
+            else:
+                converted = _flatten(resized) if has_alpha else resized.convert('RGB')
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            converted.save(path, **options)
+            created.append(path)
+    return created
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Put a transparent image on a white background, JPEG has no alpha"""
+    rgba = image.convert('RGBA')
+    background = Image.new('RGB', rgba.size, (255, 255, 255))
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    return background
+
+def find_derivative(
+    upload_folder: str,
+    image_path: str,
+    size: str,
+    accept_webp: bool
+) -> Optional[str]:
+    """
+    Path of the derivative to serve (relative to the upload folder),
+    None if the size is unknown or the derivative does not exist.
+    """
+    if size not in IMAGE_SIZES:
+        return None
+    for extension in (['webp'] if accept_webp else []) + ['jpg']:
+        path = derived_path(upload_folder, image_path, size, extension)
+        if path and os.path.isfile(path):
+            return os.path.relpath(path, upload_folder)
+    return None
@@ -18,6 +18,8 @@ from db_model import ( # pylint: disable=wrong-import-position
     DriverReview, RestaurantReview
 )
 from db_model.db_enum import OrderStatus, RegistrationStatus # pylint: disable=wrong-import-position
+from routes.review.services import reconcile_ratings # pylint: disable=wrong-import-position
+from utils.prep_time import refit_prep_times # pylint: disable=wrong-import-position
 
 # Default data
 # all passwords are Abcd1234!
@@ -326,6 +328,12 @@ def initialize_database():
             db.session.add(restaurant_review)
             db.session.commit()
 
+        # the reviews are created directly, so compute the rating totals once at the end
+        reconcile_ratings()
+
+        # the preparation times of the seeded orders, however old they are
+        refit_prep_times(all_orders[0]["order_time"])
+
 
 if __name__ == "__main__":
     print("Initializing database, please wait...")
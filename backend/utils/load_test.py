@@ -0,0 +1,121 @@
+"""
+Load test of a running backend: concurrent clients request the public read APIs
+while other clients send slow uploads (a request body trickled over several seconds,
+like a phone on a bad network).
+
+    python utils/load_test.py [--url http://localhost:11000] [--clients 16]
+                              [--seconds 10] [--slow-uploads 4]
+
+Start the server to compare first, e.g. `python app.py` (development server) or
+`gunicorn -c gunicorn.conf.py wsgi:app` (production server).
+"""
+import argparse
+import http.client
+import statistics
+import time
+from threading import Event, Lock, Thread
+from typing import List
+from urllib.parse import urlsplit
+
+# public APIs read by the customer home and search screens
+READ_PATHS = [
+    '/search/restaurant?q=pizza',
+    '/search/menu?q=chicken&limit=20',
+    '/search/restaurant?limit=20',
+]
+
+def read_client(
+    host: str, port: int, until: float, latencies: List[float], errors: List[int], lock: Lock
+) -> None:
+    """Request the read paths in turn on one keep-alive connection until the time is up"""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    done, failed, index = [], 0, 0
+    while time.monotonic() < until:
+        path = READ_PATHS[index % len(READ_PATHS)]
+        index += 1
+        start = time.monotonic()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                failed += 1
+                continue
+            done.append(time.monotonic() - start)
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.close()
+    with lock:
+        latencies.extend(done)
+        errors[0] += failed
+
+def slow_upload_client(host: str, port: int, stop: Event) -> None:
+    """Send an upload of 64 KiB at 8 KiB per second, again and again"""
+    body_size, chunk = 64 * 1024, 8 * 1024
+    while not stop.is_set():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            conn.putrequest('POST', '/customer/update')
+            conn.putheader('Content-Type', 'application/octet-stream')
+            conn.putheader('Content-Length', str(body_size))
+            conn.endheaders()
+            for _ in range(body_size // chunk):
+                if stop.wait(1):
+                    break
+                conn.send(b'x' * chunk)
+            else:
+                conn.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+
+def main():
+    """Run the clients and print the throughput and latencies of the reads"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--url', default='http://localhost:11000')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--slow-uploads', type=int, default=4)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    latencies: List[float] = []
+    errors = [0]
+    lock, stop = Lock(), Event()
+
+    uploads = [
+        Thread(target=slow_upload_client, args=(host, port, stop), daemon=True)
+        for _ in range(args.slow_uploads)
+    ]
+    for thread in uploads:
+        thread.start()
+    # let the uploads take their server threads first
+    time.sleep(1)
+
+    until = time.monotonic() + args.seconds
+    readers = [
+        Thread(target=read_client, args=(host, port, until, latencies, errors, lock))
+        for _ in range(args.clients)
+    ]
+    for thread in readers:
+        thread.start()
+    for thread in readers:
+        thread.join()
+    stop.set()
+
+    print(f'{args.clients} clients, {args.slow_uploads} slow uploads, {args.seconds:g}s')
+    print(f'requests/s: {len(latencies) / args.seconds:.0f}, errors: {errors[0]}')
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(
+            f'latency ms: p50 {cuts[49] * 1000:.0f}, p95 {cuts[94] * 1000:.0f}, '
+            f'p99 {cuts[98] * 1000:.0f}, max {max(latencies) * 1000:.0f}'
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Latest positions of the drivers, kept in memory.
+
+A location ping (POST /dispatch/driver/location) only updates the LocationStore of the
+worker, no database is touched. Every LOCATION_SYNC_INTERVAL seconds the sync thread:
+1. saves the positions pinged since the last sync, one batch for all the drivers
+2. reads the driver states saved by the other workers (pings, status changes),
+   so the store of every worker knows every driver
+3. forgets the positions older than POSITION_MAX_AGE
+
+The store answers "drivers within R km" from a GridIndex (utils/geo.py). Availability
+is set by PUT /dispatch/driver/status and read from the database, a ping does not change it.
+"""
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from flask import Flask
+from sqlalchemy.exc import SQLAlchemyError
+from utils.db import db
+from utils.geo import GridIndex
+from db_model.db_query import get_driver_states_since, save_driver_positions
+
+# positions older than this (seconds) are not used
+POSITION_MAX_AGE = 300
+
+class DriverPosition(NamedTuple):
+    """Last known position of a driver"""
+    lat: float
+    lon: float
+    at: datetime
+    available: bool
+
+class LocationStore:
+    """Thread-safe latest position per driver id, with a spatial index"""
+    def __init__(self, cell_km: float = 2.0):
+        self._lock = Lock()
+        self._index = GridIndex(cell_km)
+        self._positions: Dict[int, DriverPosition] = {}
+        # positions pinged and not saved yet
+        self._dirty: Dict[int, DriverPosition] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def get(self, driver_id: int) -> Optional[DriverPosition]:
+        """Last known position of the driver, None if unknown"""
+        with self._lock:
+            return self._positions.get(driver_id)
+
+    def ping(self, driver_id: int, lat: float, lon: float, at: Optional[datetime] = None) -> None:
+        """A position sent by the driver, saved at the next sync"""
+        at = at or datetime.now()
+        with self._lock:
+            current = self._positions.get(driver_id)
+            if current and current.at >= at:
+                return
+            position = DriverPosition(lat, lon, at, current.available if current else False)
+            self._set(driver_id, position)
+            self._dirty[driver_id] = position
+
+    def load(
+        self, driver_id: int, lat: Optional[float], lon: Optional[float],
+        at: Optional[datetime], available: bool
+    ) -> None:
+        """A driver state read from the database: its availability, and its position if newer"""
+        with self._lock:
+            current = self._positions.get(driver_id)
+            if current and (at is None or current.at >= at):
+                self._positions[driver_id] = current._replace(available=available)
+            elif lat is not None and at is not None:
+                self._set(driver_id, DriverPosition(lat, lon, at, available))
+
+    def _set(self, driver_id: int, position: DriverPosition) -> None:
+        self._positions[driver_id] = position
+        self._index.update(driver_id, position.lat, position.lon)
+
+    def within(
+        self, lat: float, lon: float, radius_km: float, available_only: bool = True
+    ) -> List[Tuple[int, float]]:
+        """(driver id, distance km) of the drivers within radius_km, nearest first"""
+        with self._lock:
+            found = self._index.within(lat, lon, radius_km)
+            if available_only:
+                found = [item for item in found if self._positions[item[0]].available]
+            return found
+
+    def take_dirty(self) -> Dict[int, DriverPosition]:
+        """The positions to save, the store forgets them"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            return dirty
+
+    def requeue(self, dirty: Dict[int, DriverPosition]) -> None:
+        """Positions that could not be saved, unless newer ones were pinged since"""
+        with self._lock:
+            for driver_id, position in dirty.items():
+                self._dirty.setdefault(driver_id, position)
+
+    def expire(self, before: datetime) -> int:
+        """Forget the positions older than before, return their number"""
+        with self._lock:
+            old = [
+                driver_id for driver_id, position in self._positions.items()
+                if position.at < before and driver_id not in self._dirty
+            ]
+            for driver_id in old:
+                del self._positions[driver_id]
+                self._index.remove(driver_id)
+            return len(old)
+
+# the store of this worker process
+location_store = LocationStore()
+
+def sync_locations(store: LocationStore, since: datetime) -> datetime:
+    """
+    Save the pinged positions and read the states changed since `since` (app context
+    needed). Return the time to pass as `since` next time.
+    """
+    started = datetime.now()
+    dirty = store.take_dirty()
+    try:
+        save_driver_positions({
+            driver_id: (position.lat, position.lon, position.at)
+            for driver_id, position in dirty.items()
+        })
+        db.session.commit()
+        states = get_driver_states_since(since)
+        db.session.rollback()
+    except SQLAlchemyError:
+        db.session.rollback()
+        store.requeue(dirty)
+        raise
+
+    for state in states:
+        store.load(state.driver_id, state.lat, state.lon, state.updated_at, state.available)
+    store.expire(started - timedelta(seconds=POSITION_MAX_AGE))
+    return started
+
+class LocationSyncThread(Thread):
+    """Daemon thread running sync_locations every `interval` seconds until stopped"""
+    def __init__(self, app: Flask, store: LocationStore, interval: float):
+        super().__init__(name='location-sync', daemon=True)
+        self.app = app
+        self.store = store
+        self.interval = interval
+        self._stopped = Event()
+
+    def run(self) -> None:
+        # the states saved by the other workers before this one started
+        since = datetime.now() - timedelta(seconds=POSITION_MAX_AGE)
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    # a ping saved by another worker commits up to an interval after its
+                    # time, read again the last two intervals so it is not missed
+                    # (positions not newer than the known ones are ignored)
+                    since = sync_locations(self.store, since) - timedelta(
+                        seconds=2 * self.interval
+                    )
+            except Exception as e: # pylint: disable=broad-exception-caught
+                # the positions are saved next time
+                self.app.logger.warning('Location sync failed: %s', e)
+
+    def stop(self) -> None:
+        """Stop after the current run"""
+        self._stopped.set()
+
+def init_locations(app: Flask) -> Optional[LocationSyncThread]:
+    """Start the sync thread of the location store. Return it, None if disabled"""
+    interval = app.config.get('LOCATION_SYNC_INTERVAL', 0)
+    if not interval:
+        return None
+    thread = LocationSyncThread(app, location_store, interval)
+    thread.start()
+    return thread
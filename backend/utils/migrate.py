@@ -0,0 +1,108 @@
+"""
+Bring an existing database up to the current models without resetting it.
+Creates the missing tables, adds the missing columns and creates the missing indexes.
+Unlike init_db.py, the existing data is kept.
+"""
+import os
+import sys
+from datetime import datetime
+from typing import List
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import inspect, text # pylint: disable=wrong-import-position
+from app import app # pylint: disable=wrong-import-position
+from utils.db import db # pylint: disable=wrong-import-position
+from db_model import ( # pylint: disable=wrong-import-position
+    Admin, Conversation, Customer, Driver, Restaurant, UserSession
+)
+from db_model.db_enum import UserType # pylint: disable=wrong-import-position
+from db_model.search_index import create_search_indexes # pylint: disable=wrong-import-position
+from routes.chat.services import rebuild_conversations # pylint: disable=wrong-import-position
+
+def add_missing_columns() -> List[str]:
+    """
+    ALTER TABLE ADD COLUMN for every model column missing in the database.
+    A NOT NULL column can only be added when it has a server default.
+    """
+    inspector = inspect(db.engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+
+            col_type = column.type.compile(dialect=db.engine.dialect)
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'
+            if column.server_default is not None:
+                default = column.server_default.arg
+                default = default.text if hasattr(default, 'text') else f"'{default}'"
+                ddl += f' DEFAULT {default}'
+                if not column.nullable:
+                    ddl += ' NOT NULL'
+
+            with db.engine.begin() as conn:
+                conn.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+def create_missing_indexes() -> List[str]:
+    """Create the declared indexes that do not exist yet"""
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            index.create(db.engine, checkfirst=True)
+            created.append(index.name)
+    return created
+
+def backfill_sessions() -> int:
+    """Copy the tokens still stored on the user rows into the session table"""
+    count = 0
+    for user_type, model in [
+        (UserType.ADMIN, Admin),
+        (UserType.CUSTOMER, Customer),
+        (UserType.DRIVER, Driver),
+        (UserType.RESTAURANT, Restaurant),
+    ]:
+        for user in model.query.filter(model.token.isnot(None)).all():
+            if db.session.get(UserSession, user.token):
+                continue
+            db.session.add(UserSession(
+                token=user.token,
+                user_type=user_type,
+                user_id=user.id,
+                expires_at=datetime.now() + app.config['SESSION_LIFETIME'],
+            ))
+            count += 1
+    db.session.commit()
+    return count
+
+def migrate_database():
+    """Apply every migration step, each step is safe to run again"""
+    with app.app_context():
+        # new tables are created together with their indexes
+        db.create_all()
+        print("Added columns:", ", ".join(add_missing_columns()) or "none")
+        print("Created indexes:", ", ".join(create_missing_indexes()) or "none")
+        print("Sessions copied from user tokens:", backfill_sessions())
+        # only once, the unread counts would be lost
+        if Conversation.query.first() is None:
+            print("Conversations built from chats:", rebuild_conversations())
+        # the search indexes are rebuilt from their tables
+        with db.engine.begin() as conn:
+            create_search_indexes(conn)
+        print("Search indexes rebuilt")
+
+
+if __name__ == "__main__":
+    print("Migrating database, please wait...")
+    migrate_database()
+    print("Database migrated successfully.")
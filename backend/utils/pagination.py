@@ -0,0 +1,141 @@
+"""
+Utility functions for the keyset (cursor) pagination of list APIs.
+
+A page is requested with the `after` and `limit` query parameters. `after` is the
+opaque `next_cursor` of the previous page, it holds the sort key of the last row
+(e.g. (order_time, id)), so every page costs one index range read however long
+the history is. Without `after` and `limit` the list APIs return the full list.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+
+from flask_restx import Namespace, abort, fields, inputs, reqparse
+from sqlalchemy import literal, tuple_
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import ColumnElement
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+class PageArgs(NamedTuple):
+    """Requested page: sort key of the last seen row and the page size"""
+    after: Optional[tuple]
+    limit: int
+
+class Page(NamedTuple):
+    """One page of rows, next_cursor is None on the last page"""
+    items: list
+    next_cursor: Optional[str]
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Make an opaque cursor of the sort key values"""
+    payload = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    """Get the sort key values back from the cursor, raise ValueError if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        return tuple(
+            datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v
+            for v in payload
+        )
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError('Invalid Cursor') from e
+
+def matches_key(value: Any, key: ColumnElement) -> bool:
+    """Whether the cursor value can be compared to the key, e.g. a datetime to a DateTime"""
+    if value is None or isinstance(value, bool):
+        return False
+    try:
+        python_type = key.type.python_type
+    except NotImplementedError:
+        # untyped key, e.g. a relevance score
+        return isinstance(value, (int, float, str, datetime))
+    if python_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, python_type)
+
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument(
+    'after', type=decode_cursor, location='args', required=False,
+    help='next_cursor of the previous page'
+)
+pagination_parser.add_argument(
+    'limit', type=inputs.int_range(1, MAX_PAGE_SIZE), location='args', required=False,
+    help=f'Page size, {DEFAULT_PAGE_SIZE} by default and at most {MAX_PAGE_SIZE}'
+)
+
+def get_page_args(args: Dict) -> Optional[PageArgs]:
+    """The page requested in the parsed args, None when the full list is requested"""
+    if args.get('after') is None and args.get('limit') is None:
+        return None
+    return PageArgs(args.get('after'), args.get('limit') or DEFAULT_PAGE_SIZE)
+
+def keyset_paginate(
+    query: Query,
+    keys: Sequence[ColumnElement],
+    page: PageArgs,
+    descending: bool = True
+) -> Page:
+    """
+    Get one page of the query (of one model) sorted by the keys.
+    The last key must be unique (usually the id), so the order is total.
+    A key may be any column of the query, e.g. a relevance score.
+    """
+    query = query.order_by(None).order_by(
+        *[key.desc() if descending else key.asc() for key in keys]
+    )
+
+    if page.after is not None:
+        # the cursor is sent by the client, its values are checked before being bound
+        if len(page.after) != len(keys) or not all(
+            matches_key(value, key) for key, value in zip(keys, page.after)
+        ):
+            abort(400, '400 Bad Request: Invalid Cursor')
+        last_seen = tuple_(*[literal(value, key.type) for key, value in zip(keys, page.after)])
+        query = query.filter(
+            tuple_(*keys) < last_seen if descending else tuple_(*keys) > last_seen
+        )
+
+    # read the key values along with the rows, and one more row to know
+    # if there is a next page
+    rows = query.add_columns(*keys).limit(page.limit + 1).all()
+    items = [row[0] for row in rows[:page.limit]]
+    if len(rows) <= page.limit:
+        return Page(items, None)
+
+    return Page(items, encode_cursor(tuple(rows[page.limit - 1])[1:]))
+
+def fetch(
+    query: Query,
+    keys: Sequence[ColumnElement],
+    page: Optional[PageArgs] = None,
+    descending: bool = True
+) -> Union[list, Page]:
+    """All the rows of the query, or one page of them when a page is requested"""
+    if page is None:
+        return query.all()
+    return keyset_paginate(query, keys, page, descending)
+
+def page_response(
+    result: Union[list, Page],
+    formatter: Callable[[list], List]
+) -> Union[List, Dict]:
+    """Format the rows, wrapped in the page envelope when the result is a page"""
+    if isinstance(result, Page):
+        return {'items': formatter(result.items), 'next_cursor': result.next_cursor}
+    return formatter(result)
+
+def page_model(api: Namespace, name: str, item_model=None):
+    """Document the page envelope of a list API, item_model None for undocumented items"""
+    return api.model(name, {
+        'items': fields.List(fields.Nested(item_model) if item_model else fields.Raw()),
+        'next_cursor': fields.String(
+            description='Pass as `after` to get the next page, null on the last page'
+        ),
+    })
@@ -0,0 +1,161 @@
+"""
+Preparation time of the orders of each restaurant, learnt from the order history.
+
+The time from an order to its food being ready (ready_time - order_time) depends on the
+restaurant, the hour of the day and how busy the kitchen is: the orders accepted before
+it and not ready yet (Order.kitchen_queue, in QUEUE_BUCKETS). The prep_time_stats table
+keeps the count, mean and M2 of these times per (restaurant, hour, queue bucket):
+- record_prep_time adds an order when it is ready, or when it is picked up if it was
+  marked ready before ready_time was recorded, in the transaction of the status change
+  (forget_prep_stats once committed)
+- refit_prep_times rebuilds the table from the orders, nightly (utils/refit_prep_times.py)
+- estimate_prep_minutes reads the statistics of a restaurant, cached per worker, for the
+  quotes (routes/customer_order/services.py) and the dispatch (routes/dispatch/services.py)
+"""
+import bisect
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from utils.cache import TTLCache
+from utils.db import db
+from db_model import Order, PrepTimeStat
+from db_model.db_query import (
+    get_prep_time_history,
+    get_prep_time_stats,
+    replace_prep_time_stats,
+    update_prep_time_stat,
+)
+
+# lower bounds of the kitchen queue buckets: 0, 1-2, 3-5, 6 or more orders
+QUEUE_BUCKETS = (0, 1, 3, 6)
+# a statistic is used once it has this many orders, otherwise a wider one
+MIN_SAMPLES = 5
+# longer preparations (e.g. an order marked ready the next day) are not learnt
+MAX_PREP_MINUTES = 180
+
+class PrepStat(NamedTuple):
+    """Number of orders and mean preparation minutes of a statistic"""
+    samples: int
+    mean_minutes: float
+
+# restaurant_id -> {(hour, queue bucket): PrepStat}
+# The orders added by other workers are seen once the entry expires.
+prep_stats_cache = TTLCache(maxsize=4096, ttl=300)
+
+def queue_bucket(queue: Optional[int]) -> int:
+    """Bucket of a kitchen queue, unknown queues (older orders) count as empty"""
+    return bisect.bisect_right(QUEUE_BUCKETS, queue or 0) - 1
+
+def prep_minutes(order_time: datetime, ready_time: datetime) -> Optional[float]:
+    """Preparation minutes of an order, None if not plausible"""
+    minutes = (ready_time - order_time).total_seconds() / 60
+    return minutes if 0 <= minutes <= MAX_PREP_MINUTES else None
+
+def record_prep_time(order: Order, ready_time: datetime) -> None:
+    """
+    Add the preparation time of the order to its statistic. The caller commits, then
+    calls forget_prep_stats: dropped before, the old statistics could be cached again.
+    """
+    minutes = prep_minutes(order.order_time, ready_time)
+    if minutes is None:
+        return
+    key = (order.restaurant_id, order.order_time.hour, queue_bucket(order.kitchen_queue))
+    now = datetime.now()
+
+    if not update_prep_time_stat(*key, minutes, now):
+        try:
+            # first order of the statistic
+            with db.session.begin_nested():
+                db.session.add(PrepTimeStat(
+                    restaurant_id=key[0], hour=key[1], queue_bucket=key[2],
+                    samples=1, mean_minutes=minutes, m2=0, updated_at=now
+                ))
+        except IntegrityError:
+            # added by a concurrent order
+            update_prep_time_stat(*key, minutes, now)
+
+def forget_prep_stats(restaurant_id: int) -> None:
+    """Drop the cached statistics of the restaurant, after an order is recorded and committed"""
+    prep_stats_cache.pop(restaurant_id)
+
+def get_prep_stats(restaurant_id: int) -> Dict[Tuple[int, int], PrepStat]:
+    """The statistics of the restaurant by (hour, queue bucket), cached"""
+    stats = prep_stats_cache.get(restaurant_id)
+    if stats is None:
+        stats = {
+            (stat.hour, stat.queue_bucket): PrepStat(stat.samples, stat.mean_minutes)
+            for stat in get_prep_time_stats(restaurant_id)
+        }
+        prep_stats_cache.set(restaurant_id, stats)
+    return stats
+
+def pooled(stats: List[PrepStat]) -> Optional[PrepStat]:
+    """The statistics merged, None if empty"""
+    samples = sum(stat.samples for stat in stats)
+    if not samples:
+        return None
+    return PrepStat(samples, sum(stat.samples * stat.mean_minutes for stat in stats) / samples)
+
+def estimate_prep_minutes(
+    restaurant_id: int, order_time: datetime, queue: Optional[int]
+) -> Optional[float]:
+    """
+    Expected preparation minutes of an order of the restaurant at order_time with the
+    kitchen queue. The first statistic with MIN_SAMPLES orders of: the same hour and
+    queue bucket, the same queue bucket at any hour, any order of the restaurant.
+    None when the restaurant has fewer orders.
+    """
+    stats = get_prep_stats(restaurant_id)
+    bucket = queue_bucket(queue)
+    for candidates in (
+        [stats.get((order_time.hour, bucket))],
+        [stat for (_, stat_bucket), stat in stats.items() if stat_bucket == bucket],
+        list(stats.values()),
+    ):
+        stat = pooled([stat for stat in candidates if stat is not None])
+        if stat and stat.samples >= MIN_SAMPLES:
+            return stat.mean_minutes
+    return None
+
+def expected_ready_time(order: Order) -> Optional[datetime]:
+    """When the food of the order should be ready, None if the restaurant is not known yet"""
+    if order.ready_time is not None:
+        return order.ready_time
+    minutes = estimate_prep_minutes(order.restaurant_id, order.order_time, order.kitchen_queue)
+    if minutes is None:
+        return None
+    return order.order_time + timedelta(minutes=minutes)
+
+def refit_prep_times(since: datetime) -> int:
+    """
+    Rebuild every statistic from the orders placed since `since` (app context needed),
+    in one transaction. Return the number of orders learnt.
+    """
+    # (restaurant_id, hour, queue bucket) -> [samples, mean, m2]
+    fitted: Dict[Tuple[int, int, int], List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+    learnt = 0
+    for restaurant_id, order_time, ready_time, pickup_time, queue in get_prep_time_history(since):
+        minutes = prep_minutes(order_time, ready_time or pickup_time)
+        if minutes is None:
+            continue
+        stat = fitted[(restaurant_id, order_time.hour, queue_bucket(queue))]
+        # Welford's update, as update_prep_time_stat
+        stat[0] += 1
+        delta = minutes - stat[1]
+        stat[1] += delta / stat[0]
+        stat[2] += delta * (minutes - stat[1])
+        learnt += 1
+
+    now = datetime.now()
+    replace_prep_time_stats([
+        {
+            'restaurant_id': restaurant_id, 'hour': hour, 'queue_bucket': bucket,
+            'samples': samples, 'mean_minutes': mean, 'm2': m2, 'updated_at': now,
+        }
+        for (restaurant_id, hour, bucket), (samples, mean, m2) in fitted.items()
+    ])
+    db.session.commit()
+    prep_stats_cache.clear()
+    return learnt
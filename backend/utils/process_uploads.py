@@ -0,0 +1,58 @@
+"""
+Run the upload jobs left pending or processing (e.g. the server stopped before running
+them, or while running them) and delete the incoming files no job refers to.
+Run it before starting the workers.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import app # pylint: disable=wrong-import-position
+from utils.db import db # pylint: disable=wrong-import-position
+from db_model.db_query import ( # pylint: disable=wrong-import-position
+    get_pending_upload_jobs, get_upload_job, reclaim_stale_upload_jobs
+)
+from utils.upload_jobs import INCOMING_FOLDER, run_upload_job # pylint: disable=wrong-import-position
+
+# an incoming file without job is only deleted after this long (seconds),
+# its request may still be running
+ABANDONED_AFTER = 3600
+# a job processing for this long (seconds) was stopped with its worker, a job takes seconds
+STALE_AFTER = 600
+
+def process_pending_uploads() -> int:
+    """Run the pending jobs, and the stale processing ones, one by one, return their number"""
+    with app.app_context():
+        reclaim_stale_upload_jobs(datetime.now() - timedelta(seconds=STALE_AFTER))
+        db.session.commit()
+        jobs = [(job.id, job.kind, job.staged_path, job.url) for job in get_pending_upload_jobs()]
+    for job in jobs:
+        run_upload_job(app, *job)
+    return len(jobs)
+
+def remove_abandoned_uploads() -> int:
+    """Delete the old incoming files without job, return their number"""
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], INCOMING_FOLDER)
+    if not os.path.isdir(folder):
+        return 0
+
+    removed = 0
+    with app.app_context():
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            if time.time() - os.path.getmtime(path) < ABANDONED_AFTER:
+                continue
+            if get_upload_job(os.path.splitext(filename)[0]) is None:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    print("Processing pending uploads, please wait...")
+    print(f"Upload jobs run: {process_pending_uploads()}")
+    print(f"Abandoned incoming files removed: {remove_abandoned_uploads()}")
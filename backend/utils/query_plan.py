@@ -0,0 +1,58 @@
+"""Utility functions to inspect the SQLite query plan of the executed queries"""
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple, Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# (sql statement, parameters)
+Statement = Tuple[str, Any]
+# the statements that read rows, and so have a query plan worth checking
+PLANNED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+def is_truncate(statement: str) -> bool:
+    """
+    A DELETE of every row (no WHERE): SQLite drops the pages of the table
+    at once (the truncate optimization), no row is read.
+    """
+    words = statement.upper().split()
+    return words[:1] == ['DELETE'] and 'WHERE' not in words
+
+@contextmanager
+def record_statements(engine: Engine) -> Iterator[List[Statement]]:
+    """Collect every SELECT, UPDATE and DELETE statement executed on the engine inside the block"""
+    statements: List[Statement] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=unused-argument, too-many-arguments
+        if statement.lstrip().upper().startswith(PLANNED_STATEMENTS) and not is_truncate(statement):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def explain_query_plan(engine: Engine, statement: str, parameters: Any = ()) -> List[str]:
+    """Return the detail lines of EXPLAIN QUERY PLAN for the statement"""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        # each row is (id, parent, notused, detail)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+def full_table_scans(plan: List[str]) -> List[str]:
+    """
+    The plan lines that read a whole table.
+    'SEARCH' lines use an index, a 'SCAN' line without an index is a full table scan.
+    A virtual table (the full-text search index) is read through its own index.
+    """
+    return [
+        line for line in plan
+        if line.startswith('SCAN ') and 'USING' not in line
+        and 'CONSTANT ROW' not in line and 'VIRTUAL TABLE' not in line
+    ]
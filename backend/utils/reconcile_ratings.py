@@ -0,0 +1,19 @@
+"""
+Recompute the rating totals (rating_sum, rating_count) of every restaurant and driver
+from their reviews. Use it after editing reviews outside the review APIs.
+"""
+import os
+import sys
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import app # pylint: disable=wrong-import-position
+from routes.review.services import reconcile_ratings # pylint: disable=wrong-import-position
+
+
+if __name__ == "__main__":
+    print("Reconciling ratings, please wait...")
+    with app.app_context():
+        fixed = reconcile_ratings()
+    print(f"Rating totals fixed for {fixed} restaurants / drivers.")
@@ -0,0 +1,34 @@
+"""
+Rebuild the preparation time statistics (utils/prep_time.py) from the orders of the last
+days, e.g. nightly from cron. The servers keep adding the new orders in between; the
+refit drops the old orders and corrects the statistics of orders changed afterwards.
+
+    python utils/refit_prep_times.py [--days 28]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# find the app
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from app import app # pylint: disable=wrong-import-position
+from utils.prep_time import refit_prep_times # pylint: disable=wrong-import-position
+
+def main():
+    """Refit once, print the number of orders learnt"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--days', type=int, default=28, help='orders of the last days learnt')
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    with app.app_context():
+        learnt = refit_prep_times(datetime.now() - timedelta(days=args.days))
+    print(f'Preparation times refitted from {learnt} orders '
+          f'({(time.monotonic() - start) * 1000:.0f} ms)')
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,8 @@ def res_error(status_code: int, error_message: Optional[str] = None) -> Tuple[Di
         error_message = '401 Unauthorised: ' + error_message
     elif status_code == 404:
         error_message = '404 Not Found: ' + error_message
+    elif status_code == 409:
+        error_message = '409 Conflict: ' + error_message
     else:
         error_message = 'Unknown Error: ' + error_message
     return {"message": error_message}, status_code
@@ -0,0 +1,100 @@
+"""
+Tuning of the SQLite database, used when DATABASE_URL is not a server database.
+
+Every new connection gets the SQLITE_PRAGMAS of the config. The defaults:
+- busy_timeout: a writer waits (ms) for the other writer instead of failing
+- journal_mode=WAL: readers do not wait for the writer, and the writer does not
+  wait for the readers (only writers wait for each other)
+- synchronous=NORMAL: with WAL, a commit is only synced at checkpoints; a power
+  loss may lose the last commits but never corrupts the database
+- cache_size (negative: KiB), mmap_size (bytes), temp_store=MEMORY
+- foreign_keys=ON: checked like on PostgreSQL
+- journal_size_limit (bytes): the WAL file is truncated to it after a checkpoint
+
+The maintenance thread runs `PRAGMA optimize` (refreshes the planner statistics
+of the tables that need it) and a passive WAL checkpoint every
+SQLITE_MAINTENANCE_INTERVAL seconds.
+"""
+import sqlite3
+from threading import Event, Thread
+from typing import Dict, Optional, Union
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.db import db
+
+SQLITE_PRAGMAS: Dict[str, Union[int, str]] = {
+    # first, the workers starting together wait for each other to switch to WAL
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+def apply_pragmas(connection: sqlite3.Connection, pragmas: Dict[str, Union[int, str]]) -> None:
+    """Set the pragmas on a new connection, before it starts a transaction"""
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def tune_engine(engine: Engine, pragmas: Dict[str, Union[int, str]]) -> None:
+    """Apply the pragmas to every connection the engine opens, if it is SQLite"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, _connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+def run_maintenance(engine: Engine) -> None:
+    """Refresh the planner statistics and checkpoint the WAL without blocking anyone"""
+    with engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA optimize')
+        conn.exec_driver_sql('PRAGMA wal_checkpoint(PASSIVE)')
+
+class MaintenanceThread(Thread):
+    """Daemon thread running run_maintenance every `interval` seconds until stopped"""
+    def __init__(self, app: Flask, interval: float):
+        super().__init__(name='sqlite-maintenance', daemon=True)
+        self.app = app
+        self.interval = interval
+        self._stopped = Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    run_maintenance(db.engine)
+            except Exception as e: # pylint: disable=broad-exception-caught
+                # a busy database is maintained next time
+                self.app.logger.warning('SQLite maintenance failed: %s', e)
+
+    def stop(self) -> None:
+        """Stop after the current run"""
+        self._stopped.set()
+
+def init_sqlite(app: Flask) -> Optional[MaintenanceThread]:
+    """
+    Tune the SQLite engine of the app (after db.init_app) and start its maintenance thread.
+    Does nothing for other databases. Return the thread, None if not started.
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return None
+
+    tune_engine(engine, app.config.get('SQLITE_PRAGMAS', SQLITE_PRAGMAS))
+    interval = app.config.get('SQLITE_MAINTENANCE_INTERVAL', 0)
+    if not interval:
+        return None
+    thread = MaintenanceThread(app, interval)
+    thread.start()
+    return thread
@@ -0,0 +1,114 @@
+"""
+Utility functions for serving the uploaded files.
+
+Every upload response is conditional (strong ETag, Last-Modified, 304) and supports
+byte ranges (206), so large documents can be resumed. Uploads are stored under a
+uuid name (see utils/file.py) and never rewritten, so they are cached as immutable.
+Compressible files get a gzip copy next to them (`<file>.gz`) which is sent to
+clients accepting gzip.
+
+With UPLOAD_SENDFILE set, the front proxy copies the bytes instead of the app:
+- 'x-sendfile': X-Sendfile header with the absolute path (Apache, lighttpd)
+- 'x-accel-redirect': X-Accel-Redirect to UPLOAD_ACCEL_PREFIX + path (nginx)
+"""
+import gzip
+import mimetypes
+import os
+import re
+import shutil
+from typing import Optional
+from urllib.parse import quote
+
+from flask import Response, current_app, request
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+# files not compressed already (images and zips are)
+COMPRESSIBLE_EXTENSIONS = {'pdf', 'json', 'txt', 'csv', 'svg'}
+# keep the gzip copy only if it saves at least 10%
+MIN_COMPRESSION_RATIO = 0.9
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# uuid4().hex, the name given by save_file
+UUID_NAME = re.compile(r'^[0-9a-f]{32}$')
+
+def is_compressible(path: str) -> bool:
+    """Whether the file type is worth a gzip copy"""
+    return path.rsplit('.', 1)[-1].lower() in COMPRESSIBLE_EXTENSIONS
+
+def precompress(path: str, source: Optional[str] = None) -> bool:
+    """
+    Write the gzip copy of a compressible file next to it, read from source
+    instead when the file is not stored at its path yet.
+    Return False if the file type is not compressible or it does not compress well.
+    """
+    if not is_compressible(path):
+        return False
+
+    source = source or path
+    gzip_path = f'{path}.gz'
+    with open(source, 'rb') as file, gzip.open(gzip_path, 'wb', compresslevel=9) as target:
+        shutil.copyfileobj(file, target)
+
+    if os.path.getsize(gzip_path) > os.path.getsize(source) * MIN_COMPRESSION_RATIO:
+        os.remove(gzip_path)
+        return False
+    return True
+
+def is_immutable(filename: str) -> bool:
+    """
+    Whether the upload never changes: its name (or for a resized copy, its folder)
+    is a uuid given by save_file. Seeded files may be replaced on a redeploy.
+    """
+    parts = filename.replace('\\', '/').split('/')
+    return any(UUID_NAME.match(os.path.splitext(part)[0]) for part in parts)
+
+def send_upload(filename: str, immutable: bool = True) -> Response:
+    """
+    Send a file of the upload folder (path relative to it), raise NotFound if missing.
+    immutable=False keeps the short UPLOAD_MAX_AGE, for a response that may change later.
+    """
+    upload_folder = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+    path = safe_join(upload_folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = current_app.config.get('UPLOAD_SENDFILE')
+
+    if mode == 'x-accel-redirect':
+        # nginx reads the file, and handles the conditional and range headers itself
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = (
+            current_app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + quote(filename)
+        )
+    else:
+        encoding = None
+        if is_compressible(filename):
+            accept_gzip = request.accept_encodings['gzip'] > 0
+            if accept_gzip and os.path.isfile(f'{path}.gz'):
+                path, encoding = f'{path}.gz', 'gzip'
+
+        response = send_file(
+            os.path.abspath(path),
+            request.environ,
+            mimetype=mimetype,
+            use_x_sendfile=mode == 'x-sendfile',
+            response_class=current_app.response_class,
+            conditional=True,
+            etag=True,
+            max_age=None,
+        )
+        if is_compressible(filename):
+            response.content_encoding = encoding
+            response.vary.add('Accept-Encoding')
+
+    # send_file sets no-cache when given no max_age
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    if immutable and is_immutable(filename):
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = current_app.config['UPLOAD_MAX_AGE']
+    return response
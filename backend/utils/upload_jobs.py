@@ -0,0 +1,183 @@
+"""
+Processing of the uploaded files in background threads (upload jobs).
+
+With UPLOAD_ASYNC, the request only writes the file to `<upload folder>/_incoming/`,
+checks it (a readable image, a PDF; an invalid file fails the request), adds an
+UploadJob row to its session and returns the final url of the file. When the request
+ends, the job is given to a thread pool of UPLOAD_WORKERS threads which:
+1. claims the job (PENDING -> PROCESSING), so it runs once
+2. creates the resized copies (images) or gzip copy (PDF), then moves the file to its url
+3. marks the job DONE, or FAILED with the reason (the original is still served then)
+
+The job row is committed with the rows of the request (e.g. the new restaurant). If
+the request did not commit, the job row does not exist and the file is deleted.
+The ids of the jobs of a request are sent in the X-Upload-Jobs response header,
+their status is read with GET /upload/job/<id>. Jobs left pending or processing by a
+restart are run by utils/process_uploads.py.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+from typing import NamedTuple, Optional
+from uuid import uuid4
+
+from flask import Flask, Response, current_app, g
+from PIL import Image, UnidentifiedImageError
+from werkzeug.datastructures import FileStorage
+from utils.db import db
+from utils.image import create_derivatives
+from utils.static import precompress
+from db_model import UploadJob
+from db_model.db_enum import UploadJobStatus, UploadKind
+from db_model.db_query import claim_upload_job, get_upload_job
+
+INCOMING_FOLDER = '_incoming'
+UPLOAD_JOBS_HEADER = 'X-Upload-Jobs'
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = Lock()
+
+class StagedUpload(NamedTuple):
+    """A job staged by the request, the values are kept apart from its (expiring) row"""
+    id: str
+    kind: UploadKind
+    staged_path: str
+    url: str
+
+def validate_upload(path: str) -> None:
+    """Raise ValueError if the file is not what its extension says: a PDF or an image"""
+    if path.lower().endswith('.pdf'):
+        with open(path, 'rb') as file:
+            if file.read(5) != b'%PDF-':
+                raise ValueError('Not a PDF file')
+        return
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise ValueError('Not a readable image') from e
+
+def finish_upload(
+    kind: UploadKind, upload_folder: str, url: str, source: Optional[str] = None
+) -> None:
+    """
+    Create the copies of the file stored at url (read from source when not moved there
+    yet): the resized copies of an image, the gzip copy of a document.
+    Raise ValueError if the image cannot be read.
+    """
+    if kind == UploadKind.IMAGE:
+        create_derivatives(upload_folder, os.path.relpath(url, upload_folder), source=source)
+        return
+    try:
+        precompress(url, source)
+    except OSError as e:
+        # the original is still served
+        current_app.logger.error(f"Error compressing file: {e}")
+
+def process_upload(kind: UploadKind, upload_folder: str, staged_path: str, url: str) -> None:
+    """
+    Create the copies of the staged file (checked by the request), then move it to its url.
+    Raise ValueError if the copies cannot be created, the original is kept: it is
+    referred to by the rows of the request.
+    """
+    # already moved when the job is run again after a crash
+    if not os.path.exists(staged_path) and os.path.exists(url):
+        finish_upload(kind, upload_folder, url)
+        return
+    # the copies first, so the url is never served without them
+    try:
+        finish_upload(kind, upload_folder, url, source=staged_path)
+    finally:
+        os.replace(staged_path, url)
+
+def stage_upload(file: FileStorage, kind: UploadKind, extension: str) -> Optional[str]:
+    """
+    Write the file to the incoming folder, check it and add its job to the session.
+    Return the url the file will have once processed, None if it cannot be written
+    or is not valid.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    name = uuid4().hex
+    staged = StagedUpload(
+        id=name,
+        kind=kind,
+        staged_path=os.path.join(upload_folder, INCOMING_FOLDER, f"{name}.{extension}"),
+        url=f"{upload_folder}/{name}.{extension}",
+    )
+    try:
+        os.makedirs(os.path.dirname(staged.staged_path), exist_ok=True)
+        file.save(staged.staged_path)
+    except (OSError, IOError, AttributeError) as e:
+        current_app.logger.error(f"Error saving file: {e}")
+        return None
+    # cheap (the header, no decoding), so the request fails rather than refer to no file
+    try:
+        validate_upload(staged.staged_path)
+    except ValueError as e:
+        current_app.logger.error(f"Error processing file: {e}")
+        os.remove(staged.staged_path)
+        return None
+
+    db.session.add(UploadJob(status=UploadJobStatus.PENDING, **staged._asdict()))
+    g.setdefault('upload_jobs', []).append(staged)
+    return staged.url
+
+def run_upload_job(app: Flask, job_id: str, kind: UploadKind, staged_path: str, url: str) -> None:
+    """Run one job (see the module doc), in its own app context"""
+    with app.app_context():
+        try:
+            if not claim_upload_job(job_id):
+                db.session.rollback()
+                # the request did not commit: nobody refers to the file
+                if get_upload_job(job_id) is None and os.path.exists(staged_path):
+                    os.remove(staged_path)
+                return
+            db.session.commit()
+
+            values = {UploadJob.status: UploadJobStatus.DONE}
+            try:
+                process_upload(kind, app.config['UPLOAD_FOLDER'], staged_path, url)
+            except (ValueError, OSError) as e:
+                app.logger.error(f"Upload job {job_id} failed: {e}")
+                values = {UploadJob.status: UploadJobStatus.FAILED, UploadJob.error: str(e)[:255]}
+            values[UploadJob.finished_at] = datetime.now()
+            UploadJob.query.filter(UploadJob.id == job_id).update(values)
+            db.session.commit()
+        except Exception as e: # pylint: disable=broad-exception-caught
+            # left PROCESSING, the thread pool must keep running
+            db.session.rollback()
+            app.logger.exception(f"Upload job {job_id} crashed: {e}")
+
+def get_executor(app: Flask) -> ThreadPoolExecutor:
+    """The thread pool of this process, created on first use (after the worker fork)"""
+    global _executor # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config['UPLOAD_WORKERS'], thread_name_prefix='upload'
+            )
+        return _executor
+
+def submit_upload_jobs(_exception: Optional[BaseException] = None) -> None:
+    """Give the jobs staged by the request to the thread pool, once the request is done"""
+    jobs = g.pop('upload_jobs', [])
+    if not jobs:
+        return
+    app = current_app._get_current_object() # pylint: disable=protected-access
+    executor = get_executor(app)
+    for job in jobs:
+        executor.submit(run_upload_job, app, *job)
+
+def add_upload_jobs_header(response: Response) -> Response:
+    """Send the ids of the jobs staged by the request, if it succeeded (the others are dropped)"""
+    jobs = g.get('upload_jobs')
+    if jobs and response.status_code < 400:
+        response.headers[UPLOAD_JOBS_HEADER] = ','.join(job.id for job in jobs)
+    return response
+
+def init_upload_jobs(app: Flask) -> None:
+    """Register the request hooks of the upload jobs"""
+    app.after_request(add_upload_jobs_header)
+    app.teardown_request(submit_upload_jobs)
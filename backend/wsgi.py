@@ -0,0 +1,13 @@
+"""
+Production entry point, served by a WSGI server with several workers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+or on Windows, where gunicorn does not run:
+
+    waitress-serve --port 11000 --threads 16 wsgi:app
+
+Every worker imports this module and creates its own app, so the database must be
+created beforehand (utils/init_db.py or utils/migrate.py), never by a worker.
+"""
+from app import app